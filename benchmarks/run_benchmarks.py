@@ -0,0 +1,663 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Run benchmarks of datatest's hot paths and save results as JSON.
+
+Synthetic data is generated deterministically from the --rows,
+--width, --cardinality and --seed options and written to a CSV file
+in --data-dir (it is reused by later runs with the same options).
+In-memory inputs (dictionaries, DataFrames, and sequence
+requirements) use at most --memory-rows rows so that large row
+counts only affect the CSV file and the Selector built from it.
+
+Compare results across commits with --compare:
+
+    python benchmarks/run_benchmarks.py -o new.json --compare old.json
+"""
+from __future__ import print_function
+import argparse
+import json
+import os
+import platform
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import timeit
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)  # <- Benchmark the working tree.
+
+import datatest
+from datatest import Selector
+from datatest import Query
+from datatest import ValidationError
+from datatest import validate
+from datatest import allowed_missing
+from datatest import allowed_extra
+from datatest import allowed_invalid
+from datatest import allowed_keys
+from datatest import allowed_args
+from datatest import allowed_deviation
+from datatest import allowed_percent
+from datatest import allowed_specific
+from datatest import allowed_baseline
+from datatest import allowed_limit
+from datatest import Extra
+from datatest._load.temptable import drop_table
+from datatest._query.query import Result
+
+try:
+    import pandas
+except ImportError:
+    pandas = None
+
+try:
+    text_type = unicode  # Python 2 reads CSV values as unicode.
+except NameError:
+    text_type = str
+
+
+FORMAT_NAME = 'datatest-benchmark'
+FORMAT_VERSION = 1
+
+
+########################################################################
+# Synthetic data.
+########################################################################
+def _mix(row, column, seed):
+    """Return a well-mixed 32-bit integer for the given cell (the
+    same on every platform and Python version).
+    """
+    x = (row * 0x9E3779B1 + (column + 1) * 0x85EBCA77 + seed * 0xC2B2AE3D)
+    x &= 0xFFFFFFFF
+    x ^= x >> 16
+    x = (x * 0x7FEB352D) & 0xFFFFFFFF
+    x ^= x >> 15
+    return x
+
+
+def generate_rows(rows, width, cardinality, seed=0):
+    """Generate a header row followed by *rows* rows of *width*
+    values. Even numbered columns hold text labels ('x0', 'x1',
+    etc.) and odd numbered columns hold integers. Each column has
+    at most *cardinality* distinct values.
+    """
+    yield ['c{0}'.format(column) for column in range(width)]
+    for row in range(rows):
+        values = []
+        for column in range(width):
+            n = _mix(row, column, seed) % cardinality
+            values.append('x{0}'.format(n) if column % 2 == 0 else n)
+        yield values
+
+
+def generate_dicts(rows, width, cardinality, seed=0):
+    """Generate dictionary rows with the same values as
+    generate_rows().
+    """
+    iterator = generate_rows(rows, width, cardinality, seed)
+    fieldnames = next(iterator)
+    for values in iterator:
+        yield dict(zip(fieldnames, values))
+
+
+def write_csv(path, rows, width, cardinality, seed=0):
+    """Write generated data to a CSV file at *path*."""
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w') as fh:
+        for values in generate_rows(rows, width, cardinality, seed):
+            fh.write(','.join(str(x) for x in values))
+            fh.write('\n')
+    os.rename(temp_path, path)  # <- Incomplete files are never reused.
+
+
+########################################################################
+# Benchmark context and helpers.
+########################################################################
+class Context(object):
+    """Holds the options and shared data used by benchmarks."""
+    def __init__(self, rows, width, cardinality, seed, memory_rows, data_dir):
+        self.rows = rows
+        self.width = width
+        self.cardinality = cardinality
+        self.seed = seed
+        self.memory_rows = min(rows, memory_rows)
+        self.data_dir = data_dir
+        self.labels = ['x{0}'.format(n) for n in range(cardinality)]
+        self._selector = None
+        self._disposable = []
+
+    @property
+    def csv_path(self):
+        """Path of the generated CSV file (written when first used)."""
+        name = 'synthetic-r{0}-w{1}-c{2}-s{3}.csv'.format(
+            self.rows, self.width, self.cardinality, self.seed)
+        path = os.path.join(self.data_dir, name)
+        if not os.path.exists(path):
+            print('generating {0}'.format(path), file=sys.stderr)
+            write_csv(path, self.rows, self.width, self.cardinality, self.seed)
+        return path
+
+    @property
+    def select(self):
+        """A Selector, shared by query and validation benchmarks,
+        loaded from the generated CSV file.
+        """
+        if self._selector is None:
+            self._selector = Selector(self.csv_path)
+        return self._selector
+
+    def dispose(self, selector):
+        """Mark *selector*'s table to be dropped by cleanup()."""
+        self._disposable.append(selector)
+        return selector
+
+    def cleanup(self):
+        while self._disposable:
+            selector = self._disposable.pop()
+            if selector._table:
+                drop_table(selector._connection.cursor(), selector._table)
+
+    def memory_rows_list(self):
+        return list(generate_rows(self.memory_rows, self.width,
+                                  self.cardinality, self.seed))
+
+    def memory_dicts(self):
+        return list(generate_dicts(self.memory_rows, self.width,
+                                   self.cardinality, self.seed))
+
+
+def _exhaust(result):
+    """Evaluate *result* if it is lazy (a Result or a Query)."""
+    if isinstance(result, Result):
+        return result.fetch()
+    if isinstance(result, Query):
+        return result.fetch()
+    return result
+
+
+def _validate(data, requirement, **kwds):
+    """Call validate() and return the error, if any, unformatted."""
+    try:
+        validate(data, requirement, **kwds)
+    except ValidationError as err:
+        return err
+    return None
+
+
+def _isdigit(x):
+    return x.isdigit()
+
+
+def _lower_half(ctx):
+    """Predicate that fails for about half of the integer values."""
+    half = ctx.cardinality // 2
+    return lambda x: int(x) < half
+
+
+########################################################################
+# Benchmarks (each takes a Context, performs any setup, and returns
+# a function to time).
+########################################################################
+BENCHMARKS = []  # <- List of (name, group, function) tuples.
+
+
+def benchmark(group, name=None):
+    def decorator(function):
+        bench_name = name or function.__name__[len('bench_'):]
+        BENCHMARKS.append((bench_name, group, function))
+        return function
+    return decorator
+
+
+# Selector loading.
+@benchmark('load')
+def bench_load_csv(ctx):
+    path = ctx.csv_path
+    return lambda: ctx.dispose(Selector(path))
+
+
+@benchmark('load')
+def bench_load_dicts(ctx):
+    dicts = ctx.memory_dicts()
+    return lambda: ctx.dispose(Selector(dicts))
+
+
+@benchmark('load')
+def bench_load_pandas(ctx):
+    if pandas is None:
+        raise SkipBenchmark('pandas not installed')
+    rows = ctx.memory_rows_list()
+    df = pandas.DataFrame(rows[1:], columns=rows[0])
+    return lambda: ctx.dispose(Selector(df))
+
+
+# Query execution (with and without optimization).
+def _make_query_benchmarks():
+    queries = [
+        ('select', lambda s: s('c0')),
+        ('select_grouped', lambda s: s({'c0': 'c1'})),
+        ('distinct', lambda s: s('c0').distinct()),
+        ('sum_grouped', lambda s: s({'c0': 'c1'}).sum()),
+        ('count_grouped', lambda s: s({'c0': 'c1'}).count()),
+        ('avg', lambda s: s('c1').avg()),
+        ('max_grouped', lambda s: s({'c0': 'c1'}).max()),
+        ('map_filter', lambda s: s('c1').map(int).filter(lambda x: x % 2)),
+    ]
+    for query_name, make_query in queries:
+        for optimize in (True, False):
+            name = 'query_{0}_{1}'.format(
+                query_name, 'optimized' if optimize else 'unoptimized')
+
+            def bench(ctx, make_query=make_query, optimize=optimize):
+                query = make_query(ctx.select)
+                return lambda: _exhaust(query.execute(optimize=optimize))
+            benchmark('query', name)(bench)
+
+_make_query_benchmarks()
+
+
+# Validation by requirement type.
+@benchmark('validate')
+def bench_validate_set(ctx):
+    data, requirement = ctx.select('c0'), set(ctx.labels)
+    return lambda: _validate(data, requirement)
+
+
+@benchmark('validate')
+def bench_validate_function(ctx):
+    data = ctx.select('c1')
+    return lambda: _validate(data, _isdigit)
+
+
+@benchmark('validate')
+def bench_validate_regex(ctx):
+    data, requirement = ctx.select('c0'), re.compile(r'^x\d+$')
+    return lambda: _validate(data, requirement)
+
+
+@benchmark('validate')
+def bench_validate_type(ctx):
+    data = ctx.select('c0')
+    return lambda: _validate(data, text_type)
+
+
+@benchmark('validate')
+def bench_validate_tuple(ctx):
+    data = ctx.select(('c0', 'c1'))
+    requirement = (re.compile(r'^x\d+$'), _isdigit)
+    return lambda: _validate(data, requirement)
+
+
+@benchmark('validate')
+def bench_validate_value(ctx):
+    label = ctx.labels[0]
+    data = ctx.select('c0', c0=label)
+    return lambda: _validate(data, label)
+
+
+@benchmark('validate')
+def bench_validate_mapping(ctx):
+    data = ctx.select({'c0': 'c1'}).count()
+    requirement = data.fetch()
+    return lambda: _validate(data, requirement)
+
+
+@benchmark('validate')
+def bench_validate_mapping_of_sets(ctx):
+    data = ctx.select({'c0': 'c1'})
+    requirement = dict((k, set(v)) for k, v in data.fetch().items())
+    return lambda: _validate(data, requirement)
+
+
+@benchmark('validate')
+def bench_validate_mapping_of_predicates(ctx):
+    data = ctx.select({'c0': ('c0', 'c1')})
+    predicate = (re.compile(r'^x\d+$'), _isdigit)  # <- Shared by all keys.
+    requirement = dict((label, predicate) for label in ctx.labels)
+    return lambda: _validate(data, requirement)
+
+
+@benchmark('validate')
+def bench_validate_mapping_of_regexes(ctx):
+    data = ctx.select({'c0': 'c1'}).max()  # <- A single value per key.
+    regex = re.compile(r'^\d+$')
+    requirement = dict((key, regex) for key in data.fetch())
+    return lambda: _validate(data, requirement)
+
+
+@benchmark('validate')
+def bench_validate_sequence(ctx):
+    values = [row[0] for row in ctx.memory_rows_list()[1:]]
+    data, requirement = list(values), values
+    return lambda: _validate(data, requirement)
+
+
+# Allowances (each validation produces many differences that are
+# allowed; the allowance is passed with the "allow" argument).
+def _extra_case(ctx):
+    """Data and requirement that produce Extra differences for
+    about half of the rows.
+    """
+    return ctx.select('c0'), set(ctx.labels[:len(ctx.labels) // 2])
+
+
+def _invalid_case(ctx):
+    """Data and requirement that produce keyed Invalid differences
+    for about half of the rows.
+    """
+    return ctx.select({'c0': 'c1'}), _lower_half(ctx)
+
+
+def _deviation_case(ctx):
+    """Data and requirement that produce a Deviation for each row."""
+    return ctx.select('c1').map(int), ctx.cardinality
+
+
+@benchmark('allowance')
+def bench_allowed_missing(ctx):
+    data = ctx.select({'c0'})
+    missing = ['y{0}'.format(n) for n in range(ctx.memory_rows)]
+    requirement = set(ctx.labels + missing)
+    return lambda: _validate(data, requirement, allow=allowed_missing())
+
+
+@benchmark('allowance')
+def bench_allowed_extra(ctx):
+    data, requirement = _extra_case(ctx)
+    return lambda: _validate(data, requirement, allow=allowed_extra())
+
+
+@benchmark('allowance')
+def bench_allowed_invalid(ctx):
+    data, requirement = _invalid_case(ctx)
+    return lambda: _validate(data, requirement, allow=allowed_invalid())
+
+
+@benchmark('allowance')
+def bench_allowed_keys(ctx):
+    data, requirement = _invalid_case(ctx)
+    allowance = allowed_keys(re.compile(r'^x'))
+    return lambda: _validate(data, requirement, allow=allowance)
+
+
+@benchmark('allowance')
+def bench_allowed_args(ctx):
+    data, requirement = _invalid_case(ctx)
+    allowance = allowed_args(_isdigit)
+    return lambda: _validate(data, requirement, allow=allowance)
+
+
+@benchmark('allowance')
+def bench_allowed_deviation(ctx):
+    data, requirement = _deviation_case(ctx)
+    allowance = allowed_deviation(ctx.cardinality)
+    return lambda: _validate(data, requirement, allow=allowance)
+
+
+@benchmark('allowance')
+def bench_allowed_percent(ctx):
+    data, requirement = _deviation_case(ctx)
+    allowance = allowed_percent(1.0)
+    return lambda: _validate(data, requirement, allow=allowance)
+
+
+@benchmark('allowance')
+def bench_allowed_specific(ctx):
+    data, requirement = _extra_case(ctx)
+    counts = ctx.select({'c0': 'c0'}).count().fetch()
+    differences = []
+    for label in ctx.labels[len(ctx.labels) // 2:]:
+        differences.extend([Extra(label)] * counts.get(label, 0))
+    allowance = allowed_specific(differences)
+    return lambda: _validate(data, requirement, allow=allowance)
+
+
+@benchmark('allowance')
+def bench_allowed_baseline(ctx):
+    data, requirement = _extra_case(ctx)
+    path = os.path.join(ctx.data_dir, 'baseline-{0}.jsonl'.format(os.getpid()))
+    _validate(data, requirement, allow=allowed_baseline(path, update=True))
+    allowance = allowed_baseline(path)
+    return lambda: _validate(data, requirement, allow=allowance)
+
+
+@benchmark('allowance')
+def bench_allowed_limit(ctx):
+    data, requirement = _extra_case(ctx)
+    allowance = allowed_limit(ctx.rows)
+    return lambda: _validate(data, requirement, allow=allowance)
+
+
+@benchmark('allowance')
+def bench_allowed_union(ctx):
+    data, requirement = _extra_case(ctx)
+    allowance = allowed_missing() | allowed_extra()
+    return lambda: _validate(data, requirement, allow=allowance)
+
+
+@benchmark('allowance')
+def bench_allowed_intersection(ctx):
+    data, requirement = _invalid_case(ctx)
+    allowance = allowed_invalid() & allowed_keys(re.compile(r'^x'))
+    return lambda: _validate(data, requirement, allow=allowance)
+
+
+# ValidationError formatting.
+@benchmark('format')
+def bench_format_list(ctx):
+    data, requirement = ctx.select('c1'), _lower_half(ctx)
+    error = _validate(data, requirement)
+    return lambda: str(error)
+
+
+@benchmark('format')
+def bench_format_mapping(ctx):
+    data, requirement = _invalid_case(ctx)
+    error = _validate(data, requirement)
+    return lambda: str(error)
+
+
+# Import time (measured in a new interpreter, excluding its startup).
+class Elapsed(float):
+    """Seconds returned by a benchmark that times itself."""
+
+
+def _time_import(statement):
+    code = ('import timeit\n'
+            'start = timeit.default_timer()\n'
+            '{0}\n'
+            'print(timeit.default_timer() - start)').format(statement)
+    env = dict(os.environ, PYTHONPATH=REPO_DIR)
+    output = subprocess.check_output([sys.executable, '-c', code], env=env)
+    return Elapsed(output.decode('ascii').strip())
+
+
+@benchmark('import')
+def bench_import_datatest(ctx):
+    return lambda: _time_import('import datatest')
+
+
+@benchmark('import')
+def bench_import_pytest_plugin_modules(ctx):
+    return lambda: _time_import('import datatest._cache, datatest._profile')
+
+
+@benchmark('import')
+def bench_import_validate(ctx):
+    return lambda: _time_import('import datatest; datatest.validate')
+
+
+@benchmark('import')
+def bench_import_unittest_api(ctx):
+    return lambda: _time_import('import datatest; datatest.DataTestCase; datatest.main')
+
+
+########################################################################
+# Running and reporting.
+########################################################################
+class SkipBenchmark(Exception):
+    """Raised by a benchmark's setup to skip it."""
+
+
+def run_benchmarks(ctx, names, repeat=3, stream=sys.stderr):
+    """Run the named benchmarks and return a dictionary of results.
+    Each benchmark's setup runs before every repetition (outside of
+    the timed section) and its result records the seconds for each
+    repetition and the best (minimum) time. Benchmarks that time
+    themselves return an Elapsed value.
+    """
+    results = {}
+    for name, group, function in BENCHMARKS:
+        if name not in names:
+            continue
+
+        seconds = []
+        try:
+            for _ in range(repeat):
+                func = function(ctx)
+                start = timeit.default_timer()
+                value = func()
+                elapsed = timeit.default_timer() - start
+                if isinstance(value, Elapsed):
+                    elapsed = float(value)
+                seconds.append(elapsed)
+                ctx.cleanup()
+        except SkipBenchmark as err:
+            results[name] = {'group': group, 'skipped': str(err)}
+            print('{0:<40} skipped ({1})'.format(name, err), file=stream)
+            continue
+
+        results[name] = {'group': group, 'seconds': seconds, 'best': min(seconds)}
+        print('{0:<40} {1:10.4f}s'.format(name, min(seconds)), file=stream)
+    return results
+
+
+def _get_commit():
+    """Return the current git commit of the repository or None."""
+    try:
+        output = subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'],
+            cwd=REPO_DIR,
+            stderr=open(os.devnull, 'w'),
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.decode('ascii').strip()
+
+
+def compare(old, new, threshold=0.1, stream=sys.stdout):
+    """Print a comparison of two result dictionaries (as loaded from
+    JSON files) and return a list of names of benchmarks that are
+    slower by more than *threshold* (a fraction of the old time).
+    """
+    if old.get('params') != new.get('params'):
+        print('warning: benchmark parameters differ', file=stream)
+
+    regressions = []
+    print('{0:<40} {1:>10} {2:>10} {3:>8}'.format('benchmark', 'old', 'new', 'ratio'),
+          file=stream)
+    for name in sorted(new['benchmarks']):
+        old_best = old['benchmarks'].get(name, {}).get('best')
+        new_best = new['benchmarks'][name].get('best')
+        if not old_best or new_best is None:
+            continue
+        ratio = new_best / old_best
+        flag = ''
+        if ratio > 1 + threshold:
+            regressions.append(name)
+            flag = '  <- slower'
+        print('{0:<40} {1:10.4f} {2:10.4f} {3:8.2f}{4}'.format(
+            name, old_best, new_best, ratio, flag), file=stream)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--rows', type=int, default=1000000,
+                        help='rows of synthetic data (default: %(default)s)')
+    parser.add_argument('--width', type=int, default=6,
+                        help='number of columns, at least 2 (default: %(default)s)')
+    parser.add_argument('--cardinality', type=int, default=1000,
+                        help='distinct values per column (default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='seed for data generation (default: %(default)s)')
+    parser.add_argument('--memory-rows', type=int, default=1000000,
+                        help='maximum rows for in-memory inputs (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='repetitions of each benchmark (default: %(default)s)')
+    parser.add_argument('--data-dir', default=None,
+                        help=('directory to keep generated data in (default: '
+                              'a temporary directory that is removed)'))
+    parser.add_argument('-k', dest='patterns', action='append', default=[],
+                        help='only run benchmarks whose names contain PATTERN')
+    parser.add_argument('--list', action='store_true',
+                        help='list benchmarks and exit')
+    parser.add_argument('-o', '--output', metavar='FILE',
+                        help='save results as JSON')
+    parser.add_argument('--compare', metavar='FILE',
+                        help='compare results to an earlier JSON file')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help=('fraction by which a benchmark can be slower '
+                              'before --compare reports it (default: %(default)s)'))
+    args = parser.parse_args(argv)
+
+    names = [name for name, _, _ in BENCHMARKS
+             if not args.patterns or any(p in name for p in args.patterns)]
+    if args.list:
+        for name, group, _ in BENCHMARKS:
+            if name in names:
+                print('{0:<12} {1}'.format(group, name))
+        return 0  # <- EXIT!
+
+    if args.width < 2:
+        parser.error('--width must be at least 2')
+
+    if args.data_dir:
+        data_dir = args.data_dir
+        if not os.path.isdir(data_dir):
+            os.makedirs(data_dir)
+    else:
+        data_dir = tempfile.mkdtemp(prefix='datatest-bench-')
+    ctx = Context(args.rows, args.width, args.cardinality, args.seed,
+                  args.memory_rows, data_dir)
+    try:
+        benchmarks = run_benchmarks(ctx, names, args.repeat)
+    finally:
+        if not args.data_dir:
+            shutil.rmtree(data_dir)  # <- Remove generated data.
+
+    results = {
+        'format': FORMAT_NAME,
+        'version': FORMAT_VERSION,
+        'datatest': datatest.__version__,
+        'commit': _get_commit(),
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'params': {
+            'rows': args.rows,
+            'width': args.width,
+            'cardinality': args.cardinality,
+            'seed': args.seed,
+            'memory_rows': ctx.memory_rows,
+            'repeat': args.repeat,
+        },
+        'benchmarks': benchmarks,
+    }
+
+    if args.output:
+        with open(args.output, 'w') as fh:
+            json.dump(results, fh, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as fh:
+            old = json.load(fh)
+        if compare(old, results, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,32 +1,116 @@
 # -*- coding: utf-8 -*-
-
-# Datatest Core API (__all__ property defined in submodules)
-from .validation import *  # Validation error and functions.
-from .difference import *  # Difference classes.
-from .allowance import *   # Allowance context mangers.
-
-# Unittest-style API
-from .case import DataTestCase
-from .runner import mandatory
-from .runner import skip
-from .runner import skipIf
-from .runner import skipUnless
-from .runner import DataTestRunner
-from .main import DataTestProgram
-from .main import main
-
-# Data Handling API
-from ._load.get_reader import get_reader
-from ._load.working_directory import working_directory
-from ._query.query import Selector
-from ._query.query import Query
-from ._query.query import Result
-
-# Set module explicitly to cleanup reprs and error reporting.
-Selector.__module__ = 'datatest'
-Query.__module__ = 'datatest'
-Result.__module__ = 'datatest'
+import sys as _sys
+from types import ModuleType as _ModuleType
 
 __version__ = '0.9.2.dev0'
 
-required = mandatory  # Temporary alias for old "required" decorator.
+
+# The public API is imported lazily: each name is loaded from its
+# submodule the first time it's accessed. This keeps "import datatest"
+# (which also happens whenever pytest loads the datatest plugin) from
+# importing unittest, multiprocessing, sqlite3, etc. before they are
+# needed.
+_api = [
+    # Datatest Core API (these lists must match each submodule's __all__).
+    ('validation', [  # Validation error and functions.
+        'validate',
+        'valid',
+        'validate_schema',
+        'ValidationError',
+    ]),
+    ('difference', [  # Difference classes.
+        'BaseDifference',
+        'Missing',
+        'Extra',
+        'Invalid',
+        'Deviation',
+    ]),
+    ('allowance', [  # Allowance context mangers.
+        'allowed',
+        'allowed_missing',
+        'allowed_extra',
+        'allowed_invalid',
+        'allowed_keys',
+        'allowed_args',
+        'allowed_deviation',
+        'allowed_percent',
+        'allowed_percent_deviation',
+        'allowed_specific',
+        'allowed_baseline',
+        'allowed_limit',
+    ]),
+
+    # Unittest-style API
+    ('case', ['DataTestCase']),
+    ('runner', ['mandatory', 'skip', 'skipIf', 'skipUnless', 'DataTestRunner']),
+    ('main', ['DataTestProgram', 'main']),
+
+    # Data Handling API
+    ('_load.get_reader', ['get_reader']),
+    ('_load.working_directory', ['working_directory']),
+    ('_query.query', ['Selector', 'Query', 'Result']),
+]
+
+
+class _LazyModule(_ModuleType):
+    """Module type for the datatest package that imports public names
+    (and the submodules listed in *submodules*) on first access.
+    """
+    names = dict((name, (module, name)) for module, names in _api for name in names)
+    names['required'] = ('runner', 'mandatory')  # Temporary alias for old
+                                                 # "required" decorator.
+    submodules = ['validation', 'difference', 'allowance', 'case', 'runner', 'main']
+
+    def _import(self, module_name):
+        full_name = '{0}.{1}'.format(self.__name__, module_name)
+        __import__(full_name)
+        return _sys.modules[full_name]
+
+    def __getattr__(self, name):
+        if name in self.names:
+            module_name, attr = self.names[name]
+            value = getattr(self._import(module_name), attr)
+        elif name in self.submodules:
+            value = self._import(name)
+        else:
+            msg = 'module {0!r} has no attribute {1!r}'
+            raise AttributeError(msg.format(self.__name__, name))
+        setattr(self, name, value)
+        return value
+
+    def __setattr__(self, name, value):
+        # Importing a submodule sets it as an attribute of the package.
+        # When a public name is the same as a submodule's name (like
+        # "main"), the public object is kept instead.
+        if name in self.names and isinstance(value, _ModuleType) \
+                and value.__name__ == '{0}.{1}'.format(self.__name__, name):
+            value = getattr(value, self.names[name][1])
+        _ModuleType.__setattr__(self, name, value)
+
+    def __dir__(self):
+        return sorted(set(self.__dict__) | set(self.names))
+
+
+if _sys.version_info[:2] < (3, 3):  # Patch for older import systems.
+    # Before Python 3.3, importing a submodule sets it directly in the
+    # package's __dict__ (bypassing __setattr__), so public names are
+    # checked when they are accessed instead.
+    def __getattribute__(self, name):
+        value = _ModuleType.__getattribute__(self, name)
+        if isinstance(value, _ModuleType) and name in _LazyModule.names:
+            value = getattr(value, _LazyModule.names[name][1])
+        return value
+    _LazyModule.__getattribute__ = __getattribute__
+    del __getattribute__
+
+
+__all__ = sorted(_LazyModule.names)
+
+
+# Replace this module with a _LazyModule instance (assigning to
+# __class__ would be simpler but is not supported by older versions
+# of Python). The original module is kept so it's not cleaned up.
+_module = _LazyModule(__name__)
+_module.__dict__.update(_sys.modules[__name__].__dict__)
+_module._original_module = _sys.modules[__name__]
+_sys.modules[__name__] = _module
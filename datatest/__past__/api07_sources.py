@@ -4,16 +4,16 @@ from .._load.load_csv import load_csv
 from .._load.temptable import load_data
 from .._load.temptable import new_table_name
 from .._load.temptable import savepoint
-from .._query.query import DEFAULT_CONNECTION
+from .._query.query import _get_default_connection
 
 
 def _load_temp_sqlite_table(columns, records):
-    global DEFAULT_CONNECTION
-    cursor = DEFAULT_CONNECTION.cursor()
+    connection = _get_default_connection()
+    cursor = connection.cursor()
     with savepoint(cursor):
         table = new_table_name(cursor)
         load_data(cursor, table, columns, records)
-    return DEFAULT_CONNECTION, table
+    return connection, table
 
 
 ########################################################################
@@ -915,8 +915,6 @@ class CsvSource(SqliteBase):
         # The arg *in_memory* is now unused but should be kept in signature
         # so that old code doesn't error-out.
 
-        global DEFAULT_CONNECTION
-
         self._file_repr = repr(file)
 
         # If *file* is relative path, uses directory of calling file as base.
@@ -928,7 +926,7 @@ class CsvSource(SqliteBase):
             file = os.path.normpath(file)
 
         # Create temporary SQLite table object.
-        connection = DEFAULT_CONNECTION
+        connection = _get_default_connection()
         cursor = connection.cursor()
         with savepoint(cursor):
             table = new_table_name(cursor)
@@ -11,7 +11,7 @@ from datatest._load.temptable import load_data
 from datatest._load.temptable import new_table_name
 from datatest._load.temptable import savepoint
 from datatest._load.temptable import table_exists
-from datatest._query.query import DEFAULT_CONNECTION
+from datatest._query.query import _get_default_connection
 from datatest._query.query import BaseElement
 from datatest._utils import file_types
 from datatest._utils import string_types
@@ -49,7 +49,7 @@ class DataSource(datatest.Selector):
             data_list = file
 
         new_cls = cls.__new__(cls)
-        new_cls._connection = DEFAULT_CONNECTION
+        new_cls._connection = _get_default_connection()
         cursor = new_cls._connection.cursor()
         with savepoint(cursor):
             table = new_table_name(cursor)
@@ -65,7 +65,7 @@ class DataSource(datatest.Selector):
     @classmethod
     def from_excel(cls, path, worksheet=0):
         new_cls = cls.__new__(cls)
-        new_cls._connection = DEFAULT_CONNECTION
+        new_cls._connection = _get_default_connection()
         cursor = new_cls._connection.cursor()
         with savepoint(cursor):
             table = new_table_name(cursor)
@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+"""Compact on-disk storage for known ("baseline") differences.
+
+A baseline file holds a hash table of difference digests followed
+by a data section with the encoded differences themselves. Lookups
+read the table through a memory map so files with millions of
+entries can be checked without loading them into memory.
+"""
+from __future__ import absolute_import
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+from ._compatibility.builtins import *
+from ._compatibility.decimal import Decimal
+from . import _jsonl
+from ._cache import _replace
+
+
+MAGIC = b'DTBASE01'
+
+# Header: magic, number of slots, number of entries, data offset.
+_header = struct.Struct('<8sQQQ')
+
+# Slot: digest, position in data section plus one (0 = empty slot).
+_slot = struct.Struct('<16sQ')
+
+_index = struct.Struct('<Q')
+
+_encoder = json.JSONEncoder(separators=(',', ':'), sort_keys=True)
+
+
+def _encode_entry(key, difference):
+    """Return a JSON-compatible list for *difference* and its
+    associated *key* (None when differences are not in a mapping).
+    """
+    return [_jsonl._encode_value(key), _jsonl._encode_difference(difference)]
+
+
+def _normalize_numbers(encoded):
+    """Return a copy of *encoded* (as returned by _encode_entry()) with
+    numbers that compare equal given the same encoding--integral floats
+    and decimals become ints and exact decimals become floats.
+    """
+    if isinstance(encoded, float):
+        if encoded.is_integer():
+            return int(encoded)
+        return encoded
+    if isinstance(encoded, list):
+        return [_normalize_numbers(x) for x in encoded]
+    if isinstance(encoded, dict):
+        if '__decimal__' in encoded:
+            number = Decimal(encoded['__decimal__'])
+            if number.is_finite() and Decimal(float(number)) == number:
+                return _normalize_numbers(float(number))
+            return encoded
+        normalized = {}
+        for name, value in encoded.items():
+            value = _normalize_numbers(value)
+            if name in ('__set__', '__dict__'):
+                value = sorted(value, key=_jsonl._canonical)  # <- Re-sort.
+            normalized[name] = value
+        return normalized
+    return encoded
+
+
+def _get_digest(entry):
+    """Return the digest used to match an encoded *entry*. Numbers
+    are normalized so that, for example, ``Deviation(1, 10)`` and
+    ``Deviation(1.0, 10)`` match.
+    """
+    encoded = _encoder.encode(_normalize_numbers(entry))
+    return hashlib.sha1(encoded.encode('utf-8')).digest()[:16]
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _get_slot_count(entry_count):
+    """Return a power of two with room for *entry_count* entries
+    at a load factor of one half or less.
+    """
+    slot_count = 8
+    while slot_count < entry_count * 2:
+        slot_count *= 2
+    return slot_count
+
+
+class BaselineWriter(object):
+    """Write a baseline file to *path*, one difference at a time.
+
+    Encoded differences are written to a temporary file as they are
+    added. When closed, the hash table is built and the baseline is
+    moved into place (an existing file is replaced). Call abort()
+    to discard the new baseline instead. When used as a context
+    manager, the writer is closed on success or aborted on error.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._temp_path = self._make_temp_file('.tmp')
+        self._fh = open(self._temp_path, 'wb')
+        self._entries = []  # <- List of (digest, position) tuples.
+        self._position = 0
+
+    def _make_temp_file(self, suffix):
+        """Return the path of a new, empty file in the directory of
+        *path* (unique names keep writers from clobbering each other).
+        """
+        directory, filename = os.path.split(os.path.abspath(self.path))
+        fd, temp_path = tempfile.mkstemp(prefix=filename + '.',
+                                         suffix=suffix, dir=directory)
+        os.close(fd)
+        return temp_path
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def add(self, key, difference):
+        entry = _encode_entry(key, difference)
+        line = _encoder.encode(entry).encode('utf-8') + b'\n'
+        self._fh.write(line)
+        self._entries.append((_get_digest(entry), self._position))
+        self._position += len(line)
+
+    def _build_table(self):
+        slot_count = _get_slot_count(len(self._entries))
+        mask = slot_count - 1
+        table = bytearray(slot_count * _slot.size)
+        for digest, position in self._entries:
+            index = _index.unpack(digest[:8])[0] & mask
+            while _slot.unpack_from(table, index * _slot.size)[1]:
+                index = (index + 1) & mask
+            _slot.pack_into(table, index * _slot.size, digest, position + 1)
+        return slot_count, table
+
+    def close(self):
+        """Build the hash table and replace the file at *path* with
+        the new baseline.
+        """
+        new_path = None
+        try:
+            self._fh.close()
+            slot_count, table = self._build_table()
+            data_offset = _header.size + len(table)
+            header = _header.pack(MAGIC, slot_count, len(self._entries), data_offset)
+
+            new_path = self._make_temp_file('.new')
+            with open(new_path, 'wb') as fh:
+                fh.write(header)
+                fh.write(table)
+                with open(self._temp_path, 'rb') as data:
+                    shutil.copyfileobj(data, fh)
+            _replace(new_path, self.path)  # <- Old baseline kept until now.
+            new_path = None
+        finally:
+            _remove(self._temp_path)
+            if new_path is not None:
+                _remove(new_path)
+
+    def abort(self):
+        """Discard the new baseline (the file at *path* is unchanged)."""
+        self._fh.close()
+        _remove(self._temp_path)
+
+
+class BaselineFile(object):
+    """Memory-mapped baseline file at *path*. Each entry can be
+    taken once---repeated differences must appear in the baseline
+    as many times as they occur.
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as fh:
+            header = fh.read(_header.size)
+            if len(header) != _header.size or header[:8] != MAGIC:
+                raise ValueError('{0!r} is not a baseline file'.format(path))
+            self._mmap = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+
+        _, slot_count, entry_count, data_offset = _header.unpack(header)
+        self.entry_count = entry_count
+        self._slot_count = slot_count
+        self._data_offset = data_offset
+        self._used = bytearray(slot_count)
+        self._taken = 0
+
+    def take(self, key, difference):
+        """Mark a matching, unused entry as seen and return True. If
+        there is no such entry, return False.
+        """
+        try:
+            digest = _get_digest(_encode_entry(key, difference))
+        except TypeError:
+            return False  # <- EXIT! (not a difference object)
+
+        mask = self._slot_count - 1
+        index = _index.unpack(digest[:8])[0] & mask
+        while True:
+            offset = _header.size + index * _slot.size
+            slot_digest, position = _slot.unpack_from(self._mmap, offset)
+            if not position:
+                return False  # <- EXIT!
+            if slot_digest == digest and not self._used[index]:
+                self._used[index] = 1
+                self._taken += 1
+                return True  # <- EXIT!
+            index = (index + 1) & mask
+
+    def _decode(self, position):
+        start = self._data_offset + position - 1
+        end = self._mmap.find(b'\n', start)
+        key, encoded = json.loads(self._mmap[start:end].decode('utf-8'))
+        return _jsonl._decode_value(key), _jsonl._decode_difference(encoded)
+
+    def unseen(self):
+        """Return a list of (key, difference) tuples for entries
+        that have not been taken.
+        """
+        if self._taken == self.entry_count:
+            return []  # <- EXIT!
+
+        unseen = []
+        for index in range(self._slot_count):
+            if self._used[index]:
+                continue
+            offset = _header.size + index * _slot.size
+            position = _slot.unpack_from(self._mmap, offset)[1]
+            if position:
+                unseen.append((position, self._decode(position)))
+        unseen.sort()  # <- Restore original order.
+        return [item for _, item in unseen]
+
+    def close(self):
+        self._mmap.close()
@@ -0,0 +1,311 @@
+# -*- coding: utf-8 -*-
+"""Helpers for incremental validation and for reusing cached test
+results (tracking and fingerprinting input files).
+"""
+from __future__ import absolute_import
+import hashlib
+import os
+import re
+import types
+import warnings
+import zlib
+from ._compatibility.builtins import *
+from ._compatibility import collections
+from ._utils import regex_types
+from ._utils import string_types
+
+
+class _UnstableFingerprint(Exception):
+    """Raised when an object has no stable description."""
+
+
+_address_repr = re.compile(r' at 0x[0-9A-Fa-f]+>')  # <- Default repr().
+
+
+def _iter_global_names(code):
+    """Generate the names used by *code* (and by any nested code
+    objects) that could refer to global values.
+    """
+    for name in code.co_names:
+        yield name
+    for const in code.co_consts:
+        if hasattr(const, 'co_code'):
+            for name in _iter_global_names(const):
+                yield name
+
+
+def _update_fingerprint(hasher, obj, seen):
+    """Feed a stable description of *obj* into *hasher*. The *seen*
+    set holds the ids of containing objects to guard against
+    recursive references.
+    """
+    if id(obj) in seen:
+        hasher.update(b'<recursion>')
+        return  # <- EXIT!
+
+    seen.add(id(obj))
+    try:
+        _update_fingerprint_inner(hasher, obj, seen)
+    finally:
+        seen.discard(id(obj))
+
+
+def _update_fingerprint_inner(hasher, obj, seen):
+    update = lambda text: hasher.update(text.encode('utf-8'))
+
+    if isinstance(obj, (list, tuple)):
+        update('{0}('.format(obj.__class__.__name__))
+        for x in obj:
+            _update_fingerprint(hasher, x, seen)
+            update(',')
+        update(')')
+    elif isinstance(obj, (set, frozenset)):
+        update('{0}('.format(obj.__class__.__name__))
+        for x in sorted(fingerprint(x) for x in obj):
+            update(x + ',')
+        update(')')
+    elif isinstance(obj, collections.Mapping):
+        items = ((fingerprint(k), v) for k, v in obj.items())
+        items = sorted(items, key=lambda item: item[0])
+        update('{0}('.format(obj.__class__.__name__))
+        for key, value in items:
+            update(key + ':')
+            _update_fingerprint(hasher, value, seen)
+            update(',')
+        update(')')
+    elif isinstance(obj, regex_types):
+        update('re({0!r}, {1!r})'.format(obj.pattern, obj.flags))
+    elif isinstance(obj, type):
+        update('type({0}.{1})'.format(obj.__module__, obj.__name__))
+    elif hasattr(obj, '__code__'):  # Functions and lambdas.
+        code = obj.__code__
+        update('function({0}.{1})'.format(getattr(obj, '__module__', ''),
+                                          getattr(obj, '__name__', '')))
+        _update_fingerprint(hasher, code, seen)
+        _update_fingerprint(hasher, getattr(obj, '__defaults__', None), seen)
+        closure = getattr(obj, '__closure__', None) or ()
+        for cell in closure:
+            try:
+                contents = cell.cell_contents
+            except ValueError:  # <- Empty cell.
+                contents = None
+            _update_fingerprint(hasher, contents, seen)
+        namespace = getattr(obj, '__globals__', None) or {}
+        for name in sorted(set(_iter_global_names(code))):
+            if name in namespace:  # <- Other names are builtins or attributes.
+                update('global({0})='.format(name))
+                _update_fingerprint(hasher, namespace[name], seen)
+    elif isinstance(obj, types.ModuleType):
+        update('module({0})'.format(obj.__name__))
+    elif hasattr(obj, 'co_code'):  # Code objects.
+        hasher.update(obj.co_code)
+        update(repr(obj.co_names))
+        for const in obj.co_consts:
+            _update_fingerprint(hasher, const, seen)
+    elif hasattr(obj, '__func__'):  # Bound methods.
+        _update_fingerprint(hasher, obj.__func__, seen)
+    else:
+        text = repr(obj)
+        if _address_repr.search(text):
+            raise _UnstableFingerprint(text)
+        update(text)
+
+
+def fingerprint(obj):
+    """Return a hex digest that identifies *obj* from one run to the
+    next or None if *obj* can't be identified reliably.
+
+    Functions are identified by their code, default values, closures,
+    and the global values they refer to (recursively for functions,
+    by name for modules). Objects without a stable representation
+    (like those with a default, address-based repr) return None so
+    that no cached results are reused for them.
+    """
+    hasher = hashlib.sha1()
+    try:
+        _update_fingerprint(hasher, obj, set())
+    except _UnstableFingerprint:
+        return None
+    return hasher.hexdigest()
+
+
+def iterchunks(iterable, size=1024):
+    """Split *iterable* into content-defined chunks and generate
+    2-tuples containing each chunk's digest and a list of its values.
+
+    A chunk ends after any value whose own checksum is divisible by
+    *size* (or when it grows to eight times *size*). Since boundaries
+    depend only on nearby values, inserting or removing a row only
+    changes the digest of the chunk that contains it.
+    """
+    chunk = []
+    hasher = hashlib.sha1()
+    max_length = size * 8
+    for value in iterable:
+        encoded = repr(value).encode('utf-8')
+        hasher.update(encoded)
+        hasher.update(b'\n')
+        chunk.append(value)
+        checksum = zlib.crc32(encoded) & 0xffffffff
+        if checksum % size == 0 or len(chunk) >= max_length:
+            yield hasher.hexdigest(), chunk
+            chunk = []
+            hasher = hashlib.sha1()
+    if chunk:
+        yield hasher.hexdigest(), chunk
+
+
+try:
+    _replace = os.replace  # New in Python 3.3.
+except AttributeError:
+    def _replace(src, dst):
+        try:
+            os.rename(src, dst)  # <- Replaces *dst* atomically on POSIX.
+        except OSError:
+            if not os.path.exists(dst):
+                raise
+            os.remove(dst)  # <- Windows can't rename over a file.
+            os.rename(src, dst)
+
+
+class ChunkCache(object):
+    """Differences for chunks of data stored in the file at *path*.
+
+    The file can hold several entries, one for each *key* (a
+    fingerprint of the requirement and selection being validated).
+    When saved, an entry keeps only the chunks used during the
+    current run so that results for old data don't accumulate.
+
+    The file is JSON and differences are stored with the same
+    encoding used by ValidationError.dump() so reading a cache file
+    can't run code. Chunks whose differences can't be encoded
+    exactly (like an Invalid with an arbitrary object) are not
+    stored--they are simply checked again on the next run.
+    """
+    _version = 1
+
+    def __init__(self, path, key):
+        self.path = path
+        self.key = key
+        self._previous = self._load().get(key, {})
+        self._current = {}
+
+    def _load(self):
+        import json
+        try:
+            with open(self.path, 'rb') as fh:
+                data = json.loads(fh.read().decode('utf-8'))
+        except (EnvironmentError, ValueError):
+            return {}  # Missing or unreadable files start a new cache.
+        if not isinstance(data, dict) or data.get('version') != self._version:
+            return {}
+        entries = data.get('entries')
+        if not isinstance(entries, dict):
+            return {}
+        return entries
+
+    def get(self, digest):
+        """Return cached differences for the chunk with the given
+        *digest* or None if it is not cached.
+        """
+        from . import _jsonl
+        encoded = self._previous.get(digest)
+        if not isinstance(encoded, list):
+            return None
+        try:
+            return [_jsonl._decode_difference(x) for x in encoded]
+        except (ValueError, TypeError, KeyError):
+            return None  # <- Treat invalid entries as not cached.
+
+    def set(self, digest, differences):
+        """Store *differences* (a list) for the chunk *digest*."""
+        from . import _jsonl
+        try:
+            encoded = [_jsonl._encode_difference(x) for x in differences]
+            decoded = [_jsonl._decode_difference(x) for x in encoded]
+        except (ValueError, TypeError):
+            return  # <- EXIT!
+        if decoded == list(differences):  # <- Only exact round-trips.
+            self._current[digest] = encoded
+
+    def save(self):
+        """Write current entry to file (other entries are kept). The
+        file is replaced atomically so an interrupted save or another
+        process saving at the same time never leaves a partial file.
+        """
+        import json
+        import tempfile
+        entries = self._load()
+        entries[self.key] = self._current
+        data = {'version': self._version, 'entries': entries}
+        directory, filename = os.path.split(os.path.abspath(self.path))
+        fd, temp_path = tempfile.mkstemp(prefix=filename + '.', suffix='.tmp',
+                                         dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as fh:
+                fh.write(json.dumps(data, separators=(',', ':')).encode('utf-8'))
+            _replace(temp_path, self.path)
+        except (EnvironmentError, TypeError, ValueError) as err:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            warnings.warn('unable to save cache {0!r}: {1}'.format(self.path, err))
+
+
+_input_logs = []  # <- Stack of lists collecting input paths.
+
+
+class recording_inputs(object):
+    """Context manager that returns a list of the input files used
+    within its block (as absolute paths). An input that is not a
+    file is added as None.
+    """
+    def __enter__(self):
+        self.paths = []
+        _input_logs.append(self.paths)
+        return self.paths
+
+    def __exit__(self, exc_type, exc_value, tb):
+        for index, paths in enumerate(_input_logs):
+            if paths is self.paths:  # <- Match by identity, not equality.
+                del _input_logs[index]
+                break
+
+
+def record_input(obj):
+    """Record *obj* (a file path or file object) as an input for all
+    active recording_inputs() blocks.
+    """
+    if not _input_logs:
+        return  # <- EXIT!
+
+    path = obj if isinstance(obj, string_types) else getattr(obj, 'name', None)
+    if isinstance(path, string_types):
+        path = os.path.abspath(path)
+    else:
+        path = None  # <- Not a file.
+
+    for paths in _input_logs:
+        paths.append(path)
+
+
+def record_inputs(paths):
+    """Record a list of already-normalized input *paths*."""
+    for log in _input_logs:
+        log.extend(paths)
+
+
+def file_digest(path, known=None):
+    """Return a 3-tuple of size, modification time and content digest
+    for the file at *path*. If *known* is a previous result for the
+    same path with matching size and modification time, it is reused
+    without reading the file.
+    """
+    stat = os.stat(path)
+    if known and known[0] == stat.st_size and known[1] == stat.st_mtime:
+        return tuple(known)  # <- EXIT!
+
+    hasher = hashlib.sha1()
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(65536), b''):
+            hasher.update(block)
+    return (stat.st_size, stat.st_mtime, hasher.hexdigest())
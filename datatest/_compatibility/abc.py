@@ -5,6 +5,8 @@ from abc import *
 
 try:
     ABC  # New in version 3.4.
-except NameError:
-    ABC = ABCMeta('ABC', (object,), {})  # <- Using Python 2 and 3
-                                         #    compatible syntax.
+    assert '__slots__' in ABC.__dict__  # Empty __slots__ new in 3.7.
+except (NameError, AssertionError):
+    ABC = ABCMeta('ABC', (object,), {'__slots__': ()})  # <- Using Python 2
+                                                        #    and 3 compatible
+                                                        #    syntax.
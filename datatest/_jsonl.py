@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""Line-oriented (JSONL) serialization for validation differences."""
+from __future__ import absolute_import
+import datetime
+import gzip
+import json
+import sys
+from ._compatibility.builtins import *
+from ._compatibility import collections
+from ._compatibility.decimal import Decimal
+from ._utils import string_types
+from .difference import BaseDifference
+from .difference import Missing
+from .difference import Extra
+from .difference import Invalid
+from .difference import Deviation
+
+
+FORMAT_NAME = 'datatest-differences'
+FORMAT_VERSION = 1
+
+_difference_types = dict((cls.__name__, cls) for cls in
+                         (Missing, Extra, Invalid, Deviation))
+
+try:
+    _integer_types = (int, long)  # long removed in Python 3.0
+except NameError:
+    _integer_types = (int,)
+
+
+def _canonical(encoded):
+    """Sort key to give unordered containers a stable encoding."""
+    return json.dumps(encoded, sort_keys=True)
+
+
+def _encode_value(value):
+    """Return a JSON-compatible version of *value*. Types that JSON
+    can't represent directly are wrapped in single-item dictionaries
+    that name the original type. Objects with no encoding of their
+    own are stored as their repr() string. Sets and mappings are
+    sorted so that equal values always get the same encoding.
+    """
+    if value is None or isinstance(value, (bool, float) + _integer_types):
+        return value
+    if isinstance(value, string_types):
+        return value
+    if isinstance(value, tuple):
+        return {'__tuple__': [_encode_value(x) for x in value]}
+    if isinstance(value, list):
+        return [_encode_value(x) for x in value]
+    if isinstance(value, (set, frozenset)):
+        items = sorted((_encode_value(x) for x in value), key=_canonical)
+        return {'__set__': items}
+    if isinstance(value, collections.Mapping):
+        items = ([_encode_value(k), _encode_value(v)] for k, v in value.items())
+        return {'__dict__': sorted(items, key=_canonical)}
+    if isinstance(value, Decimal):
+        return {'__decimal__': str(value)}
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is None:
+            return {'__datetime__': value.isoformat()}
+        return {'__repr__': repr(value)}
+    if isinstance(value, datetime.date):
+        return {'__date__': value.isoformat()}
+    return {'__repr__': repr(value)}
+
+
+def _decode_datetime(text):
+    if '.' in text:
+        return datetime.datetime.strptime(text, '%Y-%m-%dT%H:%M:%S.%f')
+    return datetime.datetime.strptime(text, '%Y-%m-%dT%H:%M:%S')
+
+
+_decoders = {
+    '__tuple__': lambda x: tuple(_decode_value(y) for y in x),
+    '__set__': lambda x: set(_decode_value(y) for y in x),
+    '__dict__': lambda x: dict((_decode_value(k), _decode_value(v)) for k, v in x),
+    '__decimal__': Decimal,
+    '__datetime__': _decode_datetime,
+    '__date__': lambda x: _decode_datetime(x + 'T00:00:00').date(),
+    '__repr__': lambda x: x,  # <- Original object is not recoverable.
+}
+
+
+def _decode_value(value):
+    """Rebuild a value encoded with _encode_value()."""
+    if isinstance(value, list):
+        return [_decode_value(x) for x in value]
+    if isinstance(value, dict):
+        (name, encoded), = value.items()
+        return _decoders[name](encoded)
+    return value
+
+
+def _encode_difference(diff):
+    """Return a list containing the difference type and its args."""
+    cls = diff.__class__
+    if _difference_types.get(cls.__name__) is cls:
+        type_name = cls.__name__
+    elif isinstance(diff, BaseDifference):
+        type_name = '{0}.{1}'.format(cls.__module__, cls.__name__)
+    else:
+        msg = 'expected difference, got {0}: {1!r}'
+        raise TypeError(msg.format(cls.__name__, diff))
+    return [type_name] + [_encode_value(x) for x in diff.args]
+
+
+def _get_difference_type(type_name):
+    """Return the difference class named by *type_name*. Other than
+    the basic difference types, it must name a BaseDifference subclass
+    in a module that has already been imported--loading a file never
+    imports modules or calls objects of other types.
+    """
+    if not isinstance(type_name, string_types):
+        raise ValueError('invalid difference type: {0!r}'.format(type_name))
+
+    cls = _difference_types.get(type_name)
+    if cls is None:
+        module_name, _, cls_name = type_name.rpartition('.')
+        module = sys.modules.get(module_name) if module_name else None
+        cls = getattr(module, cls_name, None)
+        if not (isinstance(cls, type) and issubclass(cls, BaseDifference)):
+            raise ValueError('unknown difference type: {0!r}'.format(type_name))
+    return cls
+
+
+def _decode_difference(encoded):
+    if not isinstance(encoded, list) or not encoded:
+        raise ValueError('invalid difference: {0!r}'.format(encoded))
+    cls = _get_difference_type(encoded[0])
+    return cls(*[_decode_value(x) for x in encoded[1:]])
+
+
+def _open(path, mode):
+    """Open *path* in binary *mode*, use gzip if it ends with ".gz"."""
+    if path.endswith('.gz'):
+        return gzip.open(path, mode)
+    return open(path, mode)
+
+
+def _write_line(fh, obj):
+    line = json.dumps(obj, separators=(',', ':'))
+    fh.write(line.encode('utf-8') + b'\n')
+
+
+def dump(path, differences, description=None):
+    """Write *differences* to the file at *path* using one line per
+    difference (for mappings, one line per key). The first line is
+    a header that holds the *description*. If *path* ends with ".gz",
+    the file is gzip compressed.
+    """
+    is_mapping = isinstance(differences, collections.Mapping)
+    with _open(path, 'wb') as fh:
+        _write_line(fh, {
+            'format': FORMAT_NAME,
+            'version': FORMAT_VERSION,
+            'description': description,
+            'mapping': is_mapping,
+        })
+
+        if is_mapping:
+            for key in differences:
+                value = differences[key]
+                if isinstance(value, BaseDifference):
+                    line = {'key': _encode_value(key),
+                            'diff': _encode_difference(value)}
+                else:
+                    line = {'key': _encode_value(key),
+                            'diffs': [_encode_difference(x) for x in value]}
+                _write_line(fh, line)
+        else:
+            for diff in differences:
+                _write_line(fh, _encode_difference(diff))
+
+
+def _iter_lines(fh):
+    for line in fh:
+        line = line.strip()
+        if line:
+            yield json.loads(line.decode('utf-8'))
+
+
+def _iter_differences(path, is_mapping):
+    """Generate differences (or key-value items) from the file at
+    *path*, skipping the header line.
+    """
+    with _open(path, 'rb') as fh:
+        lines = _iter_lines(fh)
+        next(lines)  # <- Skip header.
+        if is_mapping:
+            for line in lines:
+                key = _decode_value(line['key'])
+                if 'diff' in line:
+                    yield key, _decode_difference(line['diff'])
+                else:
+                    yield key, [_decode_difference(x) for x in line['diffs']]
+        else:
+            for line in lines:
+                yield _decode_difference(line)
+
+
+def load(path):
+    """Read the header from a file written with dump() and return a
+    3-tuple containing an iterator of differences (or of key-value
+    items), the description, and a boolean that is True when the
+    iterator contains key-value items. Differences are rebuilt as
+    the iterator is consumed.
+    """
+    with _open(path, 'rb') as fh:
+        header = next(_iter_lines(fh), None)
+
+    if not isinstance(header, dict) or header.get('format') != FORMAT_NAME:
+        raise ValueError('{0!r} is not a differences file'.format(path))
+    if header.get('version') != FORMAT_VERSION:
+        msg = 'unsupported differences file version: {0!r}'
+        raise ValueError(msg.format(header.get('version')))
+
+    is_mapping = header['mapping']
+    iterator = _iter_differences(path, is_mapping)
+    return iterator, header['description'], is_mapping
@@ -10,6 +10,7 @@ from .._utils import iterpeek
 from .._utils import file_types
 from .._utils import nonstringiter
 from .._utils import string_types
+from .. import _cache
 
 
 ########################################################################
@@ -223,6 +224,7 @@ class get_reader(object):
         If *csvfile* is a file object, it should be opened with
         ``newline=''``.
         """
+        _cache.record_input(csvfile)
         if isinstance(csvfile, string_types):
             return _from_csv_path(csvfile, encoding, **kwds)
         return _from_csv_iterable(csvfile, encoding, **kwds)
@@ -351,6 +353,7 @@ class get_reader(object):
                 "This is an optional constructor that requires the "
                 "third-party library 'xlrd'."
             )
+        _cache.record_input(path)
         book = xlrd.open_workbook(path, on_demand=True)
         try:
             if isinstance(worksheet, int):
@@ -388,6 +391,7 @@ class get_reader(object):
         def recfactory(record):
             return [x[1] for x in record]
         kwds['recfactory'] = recfactory
+        _cache.record_input(filename)
         table = dbfread.DBF(filename, encoding, **kwds)
 
         yield table.field_names  # <- Header row.
@@ -38,6 +38,17 @@ def new_table_name(cursor):
     return new_name
 
 
+def shared_table_name(key):
+    """Return the table name for data identified by *key* (a hex
+    digest) in a database shared by several processes. Unlike
+    new_table_name(), which counts up from the same start in every
+    process, this name depends only on *key*--each process derives
+    the same name for the same data and a different name for
+    different data.
+    """
+    return 'shared_{0}'.format(key)
+
+
 def normalize_names(names):
     def normalize(name):
         name = str(name).strip()  # Strip whitespace.
@@ -1,5 +1,7 @@
 # -*- coding: utf-8 -*-
 import re
+from functools import partial
+from operator import eq
 from ._compatibility.builtins import *
 from ._compatibility import abc
 from ._utils import regex_types
@@ -20,8 +22,22 @@ class PredicateObject(abc.ABC):
 class PredicateTuple(PredicateObject, tuple):
     """Wrapper to mark tuples that contain one or more PredicateMatcher
     instances.
+
+    When created, the elements are compiled into a single matching
+    function so that comparisons don't need to dispatch through each
+    element's __eq__() method.
     """
-    pass
+    def __init__(self, iterable=()):
+        self._func = _compile_tuple(self)
+
+    def __eq__(self, other):
+        return self._func(other)
+
+    def __ne__(self, other):  # <- For Python 2.x compatibility.
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
 
 
 class PredicateMatcher(PredicateObject):
@@ -40,6 +56,10 @@ class PredicateMatcher(PredicateObject):
         return self._repr
 
 
+def _wildcard(x):
+    return True  # <- Matches everything.
+
+
 def _get_matcher(value):
     """Return an object suitable for comparing to other values
     using the "==" operator.
@@ -61,7 +81,7 @@ def _get_matcher(value):
             return result
         repr_string = getattr(value, '__name__', repr(value))
     elif value is Ellipsis:
-        function = lambda x: True  # <- Wildcard (matches everything).
+        function = _wildcard
         repr_string = '...'
     elif isinstance(value, regex_types):
         def function(x):
@@ -84,6 +104,37 @@ def _get_matcher(value):
     return PredicateMatcher(function, repr_string)
 
 
+def _compile_tuple(predicate):
+    """Return a function that compares a tuple to the elements of
+    *predicate* in a single call. Like tuple comparison, elements
+    are checked for identity before equality. Wildcard elements are
+    skipped entirely.
+    """
+    checks = []
+    for index, value in enumerate(predicate):
+        if isinstance(value, PredicateMatcher):
+            if value._func is _wildcard:
+                continue
+            checks.append((index, value, value._func))
+        else:
+            checks.append((index, value, partial(eq, value)))
+    checks = tuple(checks)
+    length = len(predicate)
+
+    def function(other):
+        if not isinstance(other, tuple):
+            return NotImplemented
+        if len(other) != length:
+            return False
+        for index, value, func in checks:
+            x = other[index]
+            if x is not value and not func(x):
+                return False
+        return True
+
+    return function
+
+
 def get_predicate(obj):
     """Return a predicate object suitable for comparing to other
     objects using the "==" operator.
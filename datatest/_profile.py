@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+"""Optional timing of validations and the work they perform.
+
+Profiling is enabled by setting the module-level *recorder* to a
+Recorder instance (see DataTestRunner's *profile* argument). When
+it is None, instrumented operations only pay for a global lookup.
+"""
+from __future__ import absolute_import
+import sys
+import timeit
+from ._compatibility.builtins import *
+
+
+FORMAT_NAME = 'datatest-profile'
+FORMAT_VERSION = 1
+
+timer = timeit.default_timer
+
+recorder = None  # <- The active Recorder (None when not profiling).
+
+
+def _get_location():
+    """Return a "filename:lineno" string for the nearest calling
+    frame outside of the datatest package (or None if not found).
+    """
+    frame = sys._getframe(1)
+    while frame is not None:
+        name = frame.f_globals.get('__name__', '')
+        if name != 'datatest' and not name.startswith('datatest.'):
+            code = frame.f_code
+            return '{0}:{1}'.format(code.co_filename, frame.f_lineno)
+        frame = frame.f_back
+    return None
+
+
+class ValidationRecord(object):
+    """Timings, in seconds, for a single validate() or assertValid()
+    call. Time spent in SQL queries is counted separately from the
+    comparison that uses their results. Formatting time is added
+    later, when the resulting error is rendered as text.
+    """
+    def __init__(self, test, location):
+        self.test = test
+        self.location = location
+        self.description = None
+        self.items = 0
+        self.differences = 0
+        self.allowances = []
+        self.query = 0.0
+        self.compare = 0.0
+        self.allowance = 0.0
+        self.format = 0.0
+
+    @property
+    def seconds(self):
+        return self.query + self.compare + self.allowance + self.format
+
+    def to_dict(self):
+        return {
+            'location': self.location,
+            'description': self.description,
+            'items': self.items,
+            'differences': self.differences,
+            'allowances': self.allowances,
+            'seconds': self.seconds,
+            'query': self.query,
+            'compare': self.compare,
+            'allowance': self.allowance,
+            'format': self.format,
+        }
+
+
+class TestRecord(object):
+    """Total time and the operations performed by a single test (or,
+    when *test* is None, operations performed outside of any test).
+    Selector loads and queries are kept as lists of dictionaries.
+    """
+    def __init__(self, test):
+        self.test = test
+        self.seconds = 0.0
+        self.loads = []
+        self.queries = []
+        self.validations = []
+
+    def to_dict(self):
+        return {
+            'test': self.test,
+            'seconds': self.seconds,
+            'loads': self.loads,
+            'queries': self.queries,
+            'validations': [x.to_dict() for x in self.validations],
+        }
+
+    def format_summary(self):
+        """Return a one-line summary of the operations performed."""
+        parts = ['{0:.4f}s'.format(self.seconds)]
+        if self.loads:
+            parts.append('{0} load{1} ({2} rows, {3:.4f}s)'.format(
+                len(self.loads),
+                '' if len(self.loads) == 1 else 's',
+                sum(x['rows'] for x in self.loads),
+                sum(x['seconds'] for x in self.loads)))
+        if self.queries:
+            parts.append('{0} quer{1} ({2:.4f}s)'.format(
+                len(self.queries),
+                'y' if len(self.queries) == 1 else 'ies',
+                sum(x['seconds'] for x in self.queries)))
+        if self.validations:
+            parts.append('{0} validation{1} ({2} items, {3} differences, '
+                         '{4:.4f}s)'.format(
+                len(self.validations),
+                '' if len(self.validations) == 1 else 's',
+                sum(x.items for x in self.validations),
+                sum(x.differences for x in self.validations),
+                sum(x.seconds for x in self.validations)))
+        return ', '.join(parts)
+
+
+class Recorder(object):
+    """Collects TestRecord and ValidationRecord objects."""
+    def __init__(self):
+        self.tests = []
+        self._test = None
+        self._test_start = None
+        self._validation = None  # <- Validation currently running.
+        self._previous = None    # <- Most recently finished validation.
+
+    def start_test(self, test_id):
+        self._test = TestRecord(test_id)
+        self.tests.append(self._test)
+        self._previous = None
+        self._test_start = timer()
+
+    def stop_test(self):
+        if self._test is not None:
+            self._test.seconds = timer() - self._test_start
+        self._test = None
+
+    def _current_test(self):
+        """Return the TestRecord for the running test. Outside of
+        tests, a record whose test is None is used instead.
+        """
+        test = self._test
+        if test is None:
+            if not self.tests or self.tests[-1].test is not None:
+                self.tests.append(TestRecord(None))
+            test = self.tests[-1]
+        return test
+
+    def start_validation(self):
+        """Create a new ValidationRecord for the current test, make it
+        the active validation, and return it.
+        """
+        test = self._current_test()
+        record = ValidationRecord(test.test, _get_location())
+        test.validations.append(record)
+        self._validation = record
+        return record
+
+    def stop_validation(self, record):
+        self._validation = None
+        self._previous = record
+
+    def add_load(self, source, rows, seconds):
+        self._current_test().loads.append(
+            {'source': source, 'rows': rows, 'seconds': seconds})
+
+    def add_query(self, statement, seconds):
+        self._current_test().queries.append(
+            {'sql': statement, 'seconds': seconds})
+        if self._validation is not None:
+            self._validation.query += seconds
+
+    def count_rows(self, rows):
+        """Generate *rows* and count them as items compared by the
+        active validation.
+        """
+        for row in rows:
+            if self._validation is not None:
+                self._validation.items += 1
+            yield row
+
+    def add_allowance(self, allowance, seconds):
+        # Allowances used as context managers are applied after the
+        # validation has finished, so time is added to the previous
+        # validation when no validation is active.
+        record = self._validation or self._previous
+        if record is not None:
+            record.allowance += seconds
+            record.allowances.append(repr(allowance))
+
+    def validations(self):
+        """Return a list of all ValidationRecord objects."""
+        return [x for test in self.tests for x in test.validations]
+
+    def format_summary(self, limit=10):
+        """Return a table of the *limit* slowest validations as a
+        string (or an empty string if there were no validations).
+        """
+        validations = sorted(self.validations(), key=lambda x: -x.seconds)
+        if not validations:
+            return ''  # <- EXIT!
+
+        lines = ['Slowest validations:',
+                 '{0:>9} {1:>9} {2:>9} {3:>9} {4:>9}  {5}'.format(
+                     'total', 'query', 'compare', 'allowance', 'format',
+                     'location')]
+        for record in validations[:limit]:
+            lines.append('{0:9.4f} {1:9.4f} {2:9.4f} {3:9.4f} {4:9.4f}  {5}'.format(
+                record.seconds, record.query, record.compare,
+                record.allowance, record.format, record.location))
+            if record.test:
+                lines.append('{0}({1})'.format(' ' * 51, record.test))
+        return '\n'.join(lines)
+
+    def format_tests(self, limit=10):
+        """Return a list of lines summarizing the *limit* slowest
+        tests (and any operations performed outside of tests).
+        """
+        tests = sorted((x for x in self.tests if x.test is not None),
+                       key=lambda x: -x.seconds)
+        lines = ['{0}: {1}'.format(x.test, x.format_summary())
+                 for x in tests[:limit]]
+        outside = TestRecord(None)
+        for record in self.tests:
+            if record.test is None:
+                outside.loads.extend(record.loads)
+                outside.queries.extend(record.queries)
+                outside.validations.extend(record.validations)
+        if outside.loads or outside.queries or outside.validations:
+            summary = outside.format_summary().split(', ', 1)[1]
+            lines.append('(outside tests): {0}'.format(summary))
+        return lines
+
+    def dump(self, path):
+        """Write all records to *path* as JSON."""
+        import json
+        profile = {
+            'format': FORMAT_NAME,
+            'version': FORMAT_VERSION,
+            'tests': [x.to_dict() for x in self.tests],
+        }
+        text = json.dumps(profile, indent=1, sort_keys=True)
+        with open(path, 'wb') as fh:
+            fh.write(text.encode('utf-8'))
@@ -27,14 +27,25 @@ This is done for a few reasons:
    plugin component.
 """
 
+import hashlib
+import os
 import re
+import shutil
+import sys
+import tempfile
 from _pytest._code.code import ReprEntry
 from _pytest.assertion.truncate import _should_truncate_item
 from _pytest.assertion.truncate import DEFAULT_MAX_LINES
 from _pytest.assertion.truncate import DEFAULT_MAX_CHARS
 from _pytest.assertion.truncate import USAGE_MSG
+try:
+    from _pytest.reports import TestReport
+except ImportError:  # Older versions of pytest.
+    from _pytest.runner import TestReport
 from pytest import hookimpl
-from datatest import ValidationError
+import datatest
+from datatest import _cache
+from datatest import _profile
 
 if __name__ == 'pytest_datatest':
     from datatest._pytest_plugin import version_info as _bundled_version_info
@@ -42,14 +53,21 @@ else:
     _bundled_version_info = (0, 0, 0)
 
 
-version = '0.1.2'
-version_info = (0, 1, 2)
+version = '0.2.0'
+version_info = (0, 2, 0)
 
 _idconfig_session_dict = {}  # Dictionary to store ``session`` reference.
+_allowance_stats = []  # List of (nodeid, stats) tuples when enabled.
+_result_cache = None  # _ResultCache instance when enabled.
+_shared_db_dir = None  # Directory holding shared Selector database.
 
 
 def pytest_addoption(parser):
-    """Add the '--ignore-mandatory' command line option."""
+    """Add the '--ignore-mandatory', '--datatest-allowance-stats',
+    '--datatest-profile', '--datatest-profile-json',
+    '--datatest-result-cache', '--datatest-rerun', and
+    '--datatest-shared-db' command line options.
+    """
     # The following try/except block is needed because this hook
     # runs before we have a chance to turn-off the bundled plugin,
     # so this option might have already been added.
@@ -63,6 +81,58 @@ def pytest_addoption(parser):
                 "even when a mandatory test fails)."
             ),
         )
+        group.addoption(
+            '--datatest-allowance-stats',
+            action='store_true',
+            help=(
+                "report the number of differences seen, accepted, "
+                "and passed on by each allowance and the time spent "
+                "checking them."
+            ),
+        )
+        group.addoption(
+            '--datatest-profile',
+            action='store_true',
+            help=(
+                "report the Selector loads, queries, validations, and "
+                "allowances performed by each test and the time spent "
+                "on them (counting loaded rows adds two COUNT(*) scans "
+                "per Selector load)."
+            ),
+        )
+        group.addoption(
+            '--datatest-profile-json',
+            action='store',
+            metavar='path',
+            default=None,
+            help="write datatest profile records to a JSON file.",
+        )
+        group.addoption(
+            '--datatest-result-cache',
+            action='store_true',
+            help=(
+                "reuse the previous outcome of tests marked with "
+                "'result_cache' whose input files (loaded with "
+                "Selector or get_reader) and code are unchanged."
+            ),
+        )
+        group.addoption(
+            '--datatest-rerun',
+            action='store_true',
+            help=(
+                "run all tests even when cached outcomes could be "
+                "reused (the result cache is still updated)."
+            ),
+        )
+        group.addoption(
+            '--datatest-shared-db',
+            action='store_true',
+            help=(
+                "when running tests with pytest-xdist, load Selector "
+                "data from files once into a database shared by all "
+                "workers."
+            ),
+        )
     except ValueError as exc:
         assert 'already added' in str(exc)
 
@@ -75,11 +145,332 @@ def pytest_plugin_registered(plugin, manager):
 
 
 def pytest_configure(config):
-    """Register 'mandatory' marker."""
+    """Register 'mandatory' marker and enable allowance stats and
+    profiling.
+    """
     config.addinivalue_line(
         'markers',
         'mandatory: test is mandatory, stops session early on failure.',
     )
+    config.addinivalue_line(
+        'markers',
+        'result_cache: with --datatest-result-cache, reuse the outcome of '
+        'this test when its input files and code are unchanged.',
+    )
+    global _allowance_stats
+    _allowance_stats = []  # <- Stats from any earlier session are dropped.
+    if config.getoption('--datatest-allowance-stats', False):
+        from datatest import allowance
+        allowance._stats_log = []
+    if config.getoption('--datatest-profile', False) \
+            or config.getoption('--datatest-profile-json', None):
+        _profile.recorder = _profile.Recorder()
+
+    global _result_cache
+    if config.getoption('--datatest-result-cache', False) \
+            and getattr(config, 'cache', None) is not None:
+        rerun = config.getoption('--datatest-rerun', False)
+        _result_cache = _ResultCache(config, rerun)
+        config.pluginmanager.register(_result_cache, 'datatest-result-cache')
+
+    workerinput = getattr(config, 'workerinput', None)  # <- Set by xdist.
+    if workerinput and workerinput.get('datatest_shared_db'):
+        from datatest._query import query
+        query._use_shared_database(workerinput['datatest_shared_db'])
+
+
+@hookimpl(optionalhook=True)
+def pytest_configure_node(node):
+    """Create the shared Selector database (if enabled) and pass its
+    path to the pytest-xdist worker *node*.
+    """
+    if not node.config.getoption('--datatest-shared-db', False):
+        return  # <- EXIT!
+
+    global _shared_db_dir
+    if _shared_db_dir is None:
+        from datatest._query import query
+        _shared_db_dir = tempfile.mkdtemp(prefix='datatest-')
+        query._create_shared_database(os.path.join(_shared_db_dir, 'selectors.db'))
+    node.workerinput['datatest_shared_db'] = os.path.join(_shared_db_dir, 'selectors.db')
+
+
+def pytest_unconfigure(config):
+    """Disable allowance stats, profiling, result caching, and the
+    shared Selector database.
+    """
+    global _allowance_stats
+    global _result_cache
+    global _shared_db_dir
+    _allowance_stats = []
+    allowance = sys.modules.get('datatest.allowance')
+    if allowance is not None:
+        allowance._stats_log = None
+    _profile.recorder = None
+    _result_cache = None
+
+    query = sys.modules.get('datatest._query.query')
+    if query is not None and query._shared_database is not None:
+        query._use_shared_database(None)  # <- Closes connections.
+    if _shared_db_dir is not None:
+        shutil.rmtree(_shared_db_dir, ignore_errors=True)
+        _shared_db_dir = None
+
+
+def _serialize_report(report):
+    """Return a JSON-compatible dictionary for a TestReport."""
+    longrepr = report.longrepr
+    if longrepr is not None and not isinstance(longrepr, tuple):
+        longrepr = str(longrepr)  # <- Keep text of failure report.
+    return {
+        'when': report.when,
+        'outcome': report.outcome,
+        'longrepr': longrepr,
+        'sections': [list(x) for x in report.sections],
+        'duration': report.duration,
+        'wasxfail': getattr(report, 'wasxfail', None),
+    }
+
+
+def _deserialize_report(item, data):
+    """Rebuild a TestReport for *item* from _serialize_report() data."""
+    longrepr = data['longrepr']
+    if isinstance(longrepr, list):
+        longrepr = tuple(longrepr)  # <- Skip reports use a 3-tuple.
+    report = TestReport(
+        item.nodeid,
+        item.location,
+        dict((x, 1) for x in item.keywords),
+        data['outcome'],
+        longrepr,
+        data['when'],
+        [tuple(x) for x in data['sections']],
+        data['duration'],
+    )
+    if data.get('wasxfail') is not None:
+        report.wasxfail = data['wasxfail']
+    return report
+
+
+def _has_marker(item, name):
+    """Return True if *item* has the marker *name*."""
+    get_marker = getattr(item, 'get_closest_marker', None) or item.get_marker
+    return get_marker(name) is not None
+
+
+class _ResultCache(object):
+    """Reuse the reports of tests whose input files and code are
+    unchanged since they were last run.
+
+    Only tests marked with 'result_cache' are cached--the plugin can
+    only see data that is read with get_reader() or through a Selector
+    so each test must opt in. Only marked tests that used at least one
+    input file, and only files, are cached. The test code is identified
+    by the contents of the test's module, of any conftest.py files
+    between it and the root directory, and of all loaded project
+    modules (under the root directory but not installed packages)
+    and datatest modules. Entries are kept in pytest's cache (see
+    the --cache-clear option).
+
+    An instance is registered as a plugin when the result cache is
+    enabled.
+    """
+    key = 'datatest/results-v2'
+
+    def __init__(self, config, rerun=False):
+        self.config = config
+        self.rerun = rerun
+        self.entries = config.cache.get(self.key, {})
+        self.reused = set()
+        self._reports = {}
+        self._recording = None
+        self._base_paths = {}
+        self._module_paths = (None, [])  # <- Count of sys.modules, paths.
+        self._file_digests = {}
+
+    def _get_file_digest(self, path, known=None):
+        """Return (size, mtime, digest) for *path* or None if the file
+        is missing. Results are cached for the rest of the session.
+        """
+        try:
+            return self._file_digests[path]
+        except KeyError:
+            pass
+        try:
+            digest = _cache.file_digest(path, known)
+        except (IOError, OSError):
+            digest = None
+        self._file_digests[path] = digest
+        return digest
+
+    def _get_base_paths(self, item):
+        """Return paths of the test module of *item* and the conftest.py
+        files between it and the root directory.
+        """
+        path = str(item.fspath)
+        try:
+            return self._base_paths[path]
+        except KeyError:
+            pass
+
+        paths = [path]
+        rootdir = str(self.config.rootdir)
+        directory = os.path.dirname(path)
+        while True:
+            conftest = os.path.join(directory, 'conftest.py')
+            if os.path.isfile(conftest):
+                paths.append(conftest)
+            parent = os.path.dirname(directory)
+            if directory == rootdir or parent == directory:
+                break
+            directory = parent
+        self._base_paths[path] = paths
+        return paths
+
+    def _get_module_paths(self):
+        """Return a sorted list of source files of the loaded modules
+        that belong to the project or to datatest itself.
+        """
+        if self._module_paths[0] == len(sys.modules):
+            return self._module_paths[1]  # <- EXIT! (no new modules)
+
+        rootdir = os.path.join(str(self.config.rootdir), '')
+        datatest_dir = os.path.join(os.path.dirname(datatest.__file__), '')
+        prefixes = set([sys.prefix, sys.exec_prefix,
+                        getattr(sys, 'base_prefix', sys.prefix)])
+        prefixes = tuple(os.path.join(x, '') for x in prefixes)
+        installed = ('site-packages', 'dist-packages')
+        paths = set()
+        for module in list(sys.modules.values()):
+            path = getattr(module, '__file__', None)
+            if not path:
+                continue
+            path = os.path.abspath(path)
+            if path.endswith(('.pyc', '.pyo')):
+                path = path[:-1]
+            if path.startswith(datatest_dir):
+                paths.add(path)
+            elif path.startswith(rootdir) and not path.startswith(prefixes) \
+                    and not any(x in path.split(os.sep) for x in installed):
+                paths.add(path)  # <- Project module (not installed).
+        self._module_paths = (len(sys.modules), sorted(paths))
+        return self._module_paths[1]
+
+    def _get_code_digest(self, item, module_paths):
+        """Return a digest of the code used by *item*--its module,
+        conftest.py files, and the given *module_paths*.
+        """
+        hasher = hashlib.sha1(datatest.__version__.encode('utf-8'))
+        for path in self._get_base_paths(item) + list(module_paths):
+            digest = self._get_file_digest(path)
+            hasher.update(path.encode('utf-8'))
+            hasher.update(str(digest and digest[2]).encode('utf-8'))
+        return hasher.hexdigest()
+
+    def get_reports(self, item):
+        """Return a list of cached reports for *item* or None if its
+        outcome cannot be reused.
+        """
+        entry = self.entries.get(item.nodeid)
+        if self.rerun or not entry or not _has_marker(item, 'result_cache'):
+            return None
+        if entry['code'] != self._get_code_digest(item, entry['modules']):
+            return None
+        for path, known in entry['inputs']:
+            digest = self._get_file_digest(path, known)
+            if digest is None or digest[2] != known[2]:
+                return None  # <- EXIT! (input has changed)
+        return [_deserialize_report(item, x) for x in entry['reports']]
+
+    def start(self, item):
+        self._recording = _cache.recording_inputs()
+        self._recording.__enter__()
+
+    def finish(self, item):
+        recording, self._recording = self._recording, None
+        recording.__exit__(None, None, None)
+        reports = self._reports.pop(item.nodeid, [])
+        if item.nodeid in self.reused:
+            return  # <- EXIT!
+
+        paths = []
+        for path in recording.paths:
+            if path not in paths:
+                paths.append(path)
+
+        inputs = [(x, self._get_file_digest(x)) for x in paths if x]
+        if not inputs or None in paths or any(x is None for _, x in inputs) \
+                or not _has_marker(item, 'result_cache'):
+            self.entries.pop(item.nodeid, None)  # <- Can't be reused.
+            return  # <- EXIT!
+
+        module_paths = self._get_module_paths()
+        self.entries[item.nodeid] = {
+            'code': self._get_code_digest(item, module_paths),
+            'modules': module_paths,
+            'inputs': [[path, list(digest)] for path, digest in inputs],
+            'reports': reports,
+        }
+
+    @hookimpl(tryfirst=True)
+    def pytest_runtest_protocol(self, item, nextitem):
+        """Report the cached outcome of *item*, instead of running
+        it, when its inputs and code are unchanged.
+        """
+        reports = self.get_reports(item)
+        if reports is None:
+            return None  # <- EXIT!
+
+        self.reused.add(item.nodeid)
+        ihook = item.ihook
+        ihook.pytest_runtest_logstart(nodeid=item.nodeid, location=item.location)
+        for report in reports:
+            ihook.pytest_runtest_logreport(report=report)
+            if (report.failed and item.get_marker('mandatory')
+                    and not item.config.getoption('--ignore-mandatory')):
+                shouldfail = 'mandatory {0!r} failed'.format(item.name)
+                item.session.shouldfail = shouldfail
+        if hasattr(ihook, 'pytest_runtest_logfinish'):
+            ihook.pytest_runtest_logfinish(nodeid=item.nodeid,
+                                           location=item.location)
+        return True
+
+    def pytest_runtest_logreport(self, report):
+        if report.nodeid not in self.reused:
+            data = _serialize_report(report)
+            self._reports.setdefault(report.nodeid, []).append(data)
+
+    def pytest_sessionfinish(self, session):
+        self.config.cache.set(self.key, self.entries)
+
+
+@hookimpl(hookwrapper=True)
+def pytest_runtest_protocol(item, nextitem):
+    """Attribute profiled operations (including those performed by
+    fixtures during setup) and input files to the running test.
+    """
+    recorder = _profile.recorder
+    result_cache = _result_cache
+    if recorder is not None:
+        recorder.start_test(item.nodeid)
+    if result_cache is not None:
+        result_cache.start(item)
+    try:
+        yield
+    finally:
+        if result_cache is not None:
+            result_cache.finish(item)
+        if recorder is not None:
+            recorder.stop_test()
+
+
+def _collect_allowance_stats(item):
+    """Move stats of allowances applied by *item* into the report list."""
+    allowance = sys.modules.get('datatest.allowance')  # <- None if unused.
+    stats_log = getattr(allowance, '_stats_log', None)
+    if stats_log:
+        _allowance_stats.extend((item.nodeid, stats) for stats in stats_log)
+        del stats_log[:]
 
 
 def pytest_collection_modifyitems(session, config, items):
@@ -94,6 +485,9 @@ _diff_start_regex = re.compile(
 _diff_stop_regex = re.compile('^E\s+(?:\}|\]|\.\.\.)$')
 
 
+_chunk_size = 1024  # Maximum number of lines written at once.
+
+
 class DatatestReprEntry(ReprEntry):
     """Wrapper for ReprEntry to change behavior of toterminal() method."""
     def __init__(self, entry):
@@ -127,28 +521,44 @@ class DatatestReprEntry(ReprEntry):
                 return len(lines) - index
         return None
 
-    def _writelines(self, tw):
-        """If row contains a difference item, trim the "E   " prefix
-        and indent with four spaces (but still print in red).
-        """
-        lines = list(self.lines)
+    def _iterlines(self):
+        """Generate 2-tuples of each line and whether it should be
+        printed in red. If row contains a difference item, trim the
+        "E   " prefix and indent with four spaces (but still print
+        in red).
 
+        Only the boundaries of the differences are found up front,
+        the lines themselves are neither copied nor held (failures
+        can have hundreds of thousands of lines).
+        """
+        lines = self.lines
         diff_start = self._find_diff_start(lines)
         diff_stop = self._find_diff_stop(lines)
+        if diff_start is None or diff_stop is None:
+            diff_start = diff_stop = -1  # <- Matches no line index.
 
-        if isinstance(diff_start, int) and isinstance(diff_stop, int):
-            lines[diff_start] = lines[diff_start].replace(
-                'datatest.ValidationError', 'ValidationError')
+        for index, line in enumerate(lines):
+            red = line.startswith('E   ')
+            if index == diff_start:
+                line = line.replace('datatest.ValidationError', 'ValidationError')
+            elif diff_start < index < diff_stop:
+                line = ' ' + line[1:]  # Replace "E" prefix with space.
+            yield line, red
 
-            for index, line in enumerate(lines):
-                red = line.startswith('E   ')
-                if diff_start < index < diff_stop:
-                    line = ' ' + line[1:]  # Replace "E" prefix with space.
-                tw.line(line, bold=True, red=red)
-        else:
-            for line in lines:
-                red = line.startswith('E   ')
-                tw.line(line, bold=True, red=red)
+    def _writelines(self, tw):
+        """Write lines in chunks that share the same markup (calling
+        tw.line() for each of a huge number of lines is slow).
+        """
+        chunk = []
+        chunk_red = False
+        for line, red in self._iterlines():
+            if chunk and (red != chunk_red or len(chunk) >= _chunk_size):
+                tw.line('\n'.join(chunk), bold=True, red=chunk_red)
+                chunk = []
+            chunk.append(line)
+            chunk_red = red
+        if chunk:
+            tw.line('\n'.join(chunk), bold=True, red=chunk_red)
 
     def toterminal(self, tw):
         if self.style == 'short':
@@ -178,6 +588,16 @@ def _should_truncate(line_count, char_count):
 _truncation_notice = '...Full output truncated, {0}'.format(USAGE_MSG)
 
 
+def _is_validation_error(excinfo):
+    """Return True if *excinfo* holds a ValidationError. Datatest's
+    validation module is not imported if it hasn't been used.
+    """
+    validation = sys.modules.get('datatest.validation')
+    if not excinfo or validation is None:
+        return False
+    return excinfo.errisinstance(validation.ValidationError)
+
+
 @hookimpl(tryfirst=True, hookwrapper=True)
 def pytest_runtest_makereport(item, call):
     """Hook wrapper to replace ReprEntry instances for ValidationError
@@ -185,7 +605,7 @@ def pytest_runtest_makereport(item, call):
     """
     if call.when == 'call':
 
-        datafail = call.excinfo and call.excinfo.errisinstance(ValidationError)
+        datafail = _is_validation_error(call.excinfo)
 
         # Pytest-style truncation must be applied before `yield`.
         if datafail and _should_truncate_item(item):
@@ -196,14 +616,18 @@ def pytest_runtest_makereport(item, call):
 
         # Check for failure again--unittest-style failures only appear
         # after `yield`.
-        datafail = datafail or \
-            call.excinfo and call.excinfo.errisinstance(ValidationError)
+        datafail = datafail or _is_validation_error(call.excinfo)
 
         if datafail:
+            # Only the last entry holds the exception's lines.
             result = outcome.get_result()
             entries = result.longrepr.reprtraceback.reprentries
-            new_entries = [DatatestReprEntry(entry) for entry in entries]
-            result.longrepr.reprtraceback.reprentries = new_entries
+            if entries and isinstance(entries[-1], ReprEntry):
+                entries[-1] = DatatestReprEntry(entries[-1])
+
+            # The report has its own copy of the error's lines so the
+            # rendered string cached by the exception can be released.
+            call.excinfo.value._clear_str_cache()
 
         # If test was mandatory, session should fail immediately.
         if (call.excinfo and item.get_marker('mandatory')
@@ -214,6 +638,8 @@ def pytest_runtest_makereport(item, call):
     else:
         outcome = yield
 
+    _collect_allowance_stats(item)
+
 
 def pytest_terminal_summary(terminalreporter, exitstatus):
     """Add sections to terminal summary report when appropriate."""
@@ -233,6 +659,39 @@ def pytest_terminal_summary(terminalreporter, exitstatus):
             **markup
         )
 
+    if _allowance_stats:
+        terminalreporter.section('allowance stats')
+        for nodeid, stats in _allowance_stats:
+            terminalreporter.write_line(nodeid)
+            for line in str(stats).splitlines():
+                terminalreporter.write_line('    ' + line)
+
+    recorder = _profile.recorder
+    if recorder is not None:
+        config = terminalreporter.config
+        if config.getoption('--datatest-profile', False):
+            terminalreporter.section('datatest profile')
+            for line in recorder.format_tests():
+                terminalreporter.write_line(line)
+            summary = recorder.format_summary()
+            if summary:
+                terminalreporter.write_line('')
+                for line in summary.splitlines():
+                    terminalreporter.write_line(line)
+
+        path = config.getoption('--datatest-profile-json', None)
+        if path:
+            recorder.dump(path)
+            terminalreporter.write_line(
+                'datatest profile written to {0}'.format(path))
+
+    if _result_cache is not None and _result_cache.reused:
+        terminalreporter.write_line(
+            'datatest: reused cached outcomes of {0} unchanged test{1} '
+            "(use '--datatest-rerun' to run all tests)".format(
+                len(_result_cache.reused),
+                '' if len(_result_cache.reused) == 1 else 's'))
+
     if _bundled_version_info > version_info:
         markup = {'yellow': True, 'bold': True}
         terminalreporter.section('NOTICE', **markup)
@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import
 import inspect
+import os
+import weakref
 try:
     import sqlite3
 except ImportError:
@@ -26,12 +28,17 @@ from .._utils import _make_token
 from .._utils import _unique_everseen
 from .._utils import file_types
 from .._utils import string_types
+from .. import _cache
+from .. import _profile
 from .._load.get_reader import get_reader
 from .._load.load_csv import load_csv
+from .._load.temptable import create_table
 from .._load.temptable import drop_table
+from .._load.temptable import insert_records
 from .._load.temptable import load_data
 from .._load.temptable import new_table_name
 from .._load.temptable import savepoint
+from .._load.temptable import shared_table_name
 from .._load.temptable import table_exists
 
 try:
@@ -40,14 +47,175 @@ except NameError:
     # If not available, use as an alias for OSError.
     FileNotFoundError = OSError
 
-# For the following database connection, the synchronous flag is
-# set to "OFF" for faster insertions and commits. Since the database
-# is temporary, long-term integrity should not be a concern--in the
-# unlikely event of data corruption, it should be entirely acceptable
-# to simply rebuild the temporary tables.
-DEFAULT_CONNECTION = sqlite3.connect('')  # <- Using '' makes a temp file.
-DEFAULT_CONNECTION.execute('PRAGMA synchronous=OFF')
-DEFAULT_CONNECTION.isolation_level = None  # <- Run in 'autocommit' mode.
+_default_connection = None
+_shared_database = None  # <- Path of database shared between processes.
+_shared_connection = None  # <- Writable connection to shared database.
+_SHARED_TIMEOUT = 3600.0  # <- Seconds to wait while another process builds.
+
+
+def _get_default_connection():
+    """Return the database connection shared by Selectors. It's
+    created on first use (rather than at import time).
+
+    For this connection, the synchronous flag is set to "OFF" for
+    faster insertions and commits. Since the database is temporary,
+    long-term integrity should not be a concern--in the unlikely
+    event of data corruption, it should be entirely acceptable to
+    simply rebuild the temporary tables.
+
+    When a shared database is in use, the connection opens it
+    read-only (Selectors still create their own temporary tables).
+    """
+    global _default_connection
+    if _default_connection is None:
+        if _shared_database is None:
+            connection = sqlite3.connect('')  # <- Using '' makes a temp file.
+        elif sys.version_info[:2] >= (3, 4):
+            from urllib.request import pathname2url
+            uri = 'file:{0}?mode=ro'.format(pathname2url(_shared_database))
+            connection = sqlite3.connect(uri, uri=True, timeout=_SHARED_TIMEOUT)
+        else:
+            # Older versions can't open URIs so read-only mode is not
+            # enforced (Selectors only write to shared tables through
+            # the connection from _get_shared_connection()).
+            connection = sqlite3.connect(_shared_database, timeout=_SHARED_TIMEOUT)
+        connection.execute('PRAGMA synchronous=OFF')
+        connection.isolation_level = None  # <- Run in 'autocommit' mode.
+        _default_connection = connection
+    return _default_connection
+
+
+def __getattr__(name):
+    """Provide DEFAULT_CONNECTION, the old name for the connection
+    returned by _get_default_connection(), without creating the
+    connection at import time (used by Python 3.7 and newer, see
+    PEP 562).
+    """
+    if name == 'DEFAULT_CONNECTION':
+        return _get_default_connection()
+    msg = 'module {0!r} has no attribute {1!r}'
+    raise AttributeError(msg.format(__name__, name))
+
+
+if (3, 5) <= sys.version_info[:2] < (3, 7):  # Patch for older versions.
+    # Before Python 3.7, a module-level __getattr__() is not called
+    # but the module's __class__ can be changed to a subclass that
+    # provides it.
+    class _QueryModule(type(sys)):
+        def __getattr__(self, name):
+            return __getattr__(name)
+
+    sys.modules[__name__].__class__ = _QueryModule
+
+
+def _get_shared_connection():
+    """Return a writable connection to the shared database."""
+    global _shared_connection
+    if _shared_connection is None:
+        connection = sqlite3.connect(_shared_database, timeout=_SHARED_TIMEOUT)
+        connection.isolation_level = None  # <- Run in 'autocommit' mode.
+        _shared_connection = connection
+    return _shared_connection
+
+
+def _create_shared_database(path):
+    """Create an empty database at *path* to be shared by several
+    processes (see _use_shared_database()). It uses write-ahead
+    logging so that readers aren't blocked while a table is built.
+    """
+    connection = sqlite3.connect(path)
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.close()
+
+
+def _use_shared_database(path):
+    """Make Selectors created after this call keep data loaded from
+    files in the database at *path* so it can be reused by other
+    processes (like pytest-xdist workers) that load the same files.
+
+    Each table is built once, by the first process that needs it,
+    while holding the database's write lock. Other processes wait
+    for the lock and then read the finished table. Use None to stop
+    using the shared database.
+    """
+    global _default_connection
+    global _shared_database
+    global _shared_connection
+    for connection in (_default_connection, _shared_connection):
+        if connection is not None and _shared_database is not None:
+            _registered_function_ids.pop(id(connection), None)
+            connection.close()
+    _default_connection = None
+    _shared_connection = None
+    _shared_database = os.path.abspath(path) if path else None
+
+
+def _get_shared_key(obj_list, args, kwds):
+    """Return a key identifying the data loaded from *obj_list* with
+    *args* and *kwds* or None if it can't be shared (only data from
+    files can be shared).
+    """
+    if _shared_database is None:
+        return None
+    if not all(isinstance(obj, string_types) for obj in obj_list):
+        return None
+    files = []
+    for obj in obj_list:
+        stat = os.stat(obj)
+        files.append((os.path.abspath(obj), stat.st_size, stat.st_mtime))
+    return _cache.fingerprint([files, args, kwds])
+
+
+def _load_obj(cursor, table, obj, *args, **kwds):
+    """Load data from *obj* into *table* (creating the table if it
+    doesn't exist).
+    """
+    if ((
+            isinstance(obj, string_types)
+            and obj.lower().endswith('.csv')
+        ) or (
+            isinstance(obj, file_types)
+            and getattr(obj, 'name', '').lower().endswith('.csv')
+        )
+    ):
+        load_csv(cursor, table, obj, *args, **kwds)
+    else:
+        reader = get_reader(obj, *args, **kwds)
+        load_data(cursor, table, reader)
+
+
+def _build_shared_table(table, obj_list, args, kwds):
+    """Load *obj_list* into *table* in the shared database unless
+    another process has already built it.
+    """
+    cursor = _get_shared_connection().cursor()
+    cursor.execute('BEGIN IMMEDIATE')  # <- Waits for other builders.
+    try:
+        if not table_exists(cursor, table):
+            temp_table = new_table_name(cursor)
+            for obj in obj_list:
+                _load_obj(cursor, temp_table, obj, *args, **kwds)
+            statement = 'CREATE TABLE main.{0} AS SELECT * FROM temp.{1}'
+            cursor.execute(statement.format(table, temp_table))
+            drop_table(cursor, temp_table)
+    except Exception:
+        cursor.execute('ROLLBACK')
+        raise
+    cursor.execute('COMMIT')
+
+
+def _execute_shared(statement):
+    """Execute *statement* (like CREATE INDEX IF NOT EXISTS) with
+    the writable connection to the shared database.
+    """
+    cursor = _get_shared_connection().cursor()
+    cursor.execute('BEGIN IMMEDIATE')
+    try:
+        cursor.execute(statement)
+    except Exception:
+        cursor.execute('ROLLBACK')
+        raise
+    cursor.execute('COMMIT')
 
 
 _Mapping = collections.Mapping    # Get direct reference to eliminate
@@ -922,6 +1090,20 @@ with contextlib.suppress(AttributeError):  # inspect.Signature() is new in 3.3
     ])
 
 
+def _execute(cursor, statement, params=()):
+    """Execute *statement* with *cursor* and, when profiling is
+    enabled, record the time it takes.
+    """
+    recorder = _profile.recorder
+    if recorder is None:
+        return cursor.execute(statement, params)  # <- EXIT!
+
+    start = _profile.timer()
+    cursor.execute(statement, params)
+    recorder.add_query(statement, _profile.timer() - start)
+    return cursor
+
+
 _registered_function_ids = collections.defaultdict(set)
 def _register_function(connection, func_list):
     """Register user-defined functions with SQLite connection.
@@ -947,6 +1129,54 @@ def _register_function(connection, func_list):
             connection.create_function(name, 1, wrapper)  # <- Register!
 
 
+def _get_reload_objs(objs):
+    """Return *objs* with relative file paths made absolute so they
+    can be loaded again from a different working directory.
+    """
+    if isinstance(objs, string_types):
+        return os.path.abspath(objs)
+    if isinstance(objs, list) and objs \
+            and not isinstance(objs[0], (list, tuple, dict)):
+        return [os.path.abspath(x) if isinstance(x, string_types) else x
+                for x in objs]
+    return objs
+
+
+def _is_exhaustible(obj):
+    try:
+        return exhaustible(obj)
+    except TypeError:  # <- Not iterable.
+        return False
+
+
+# Selectors that loaded data from files, keyed by id().
+_file_selectors = weakref.WeakValueDictionary()
+
+
+def _reload_selectors(paths):
+    """Reload the Selectors that loaded data from any of the given
+    file *paths* (absolute paths). Returns a 3-tuple of lists: the
+    Selectors that were reloaded, those that could not be reloaded,
+    and (selector, exception) pairs for those whose reload failed
+    (like when a file is missing or only partly written). Selectors
+    that fail keep their previous data.
+    """
+    paths = set(paths)
+    reloaded = []
+    not_reloaded = []
+    failed = []
+    for selector in list(_file_selectors.values()):
+        if paths.intersection(selector._inputs):
+            try:
+                if selector._reload():
+                    reloaded.append(selector)
+                else:
+                    not_reloaded.append(selector)
+            except Exception as err:
+                failed.append((selector, err))
+    return reloaded, not_reloaded, failed
+
+
 class Selector(object):
     """A class to quickly load and select tabular data. The given
     *objs*, *\*args*, and *\*\*kwds*, can be any values supported
@@ -960,9 +1190,13 @@ class Selector(object):
     """
     def __init__(self, objs=None, *args, **kwds):
         """Initialize self."""
-        self._connection = DEFAULT_CONNECTION
+        self._connection = _get_default_connection()
         self._table = None
+        self._shared = False  # <- True when _table is in shared database.
         self._obj_strings = []
+        self._inputs = []  # <- Input file paths (None for other sources).
+        self._loads = []    # <- Arguments of load_data() calls.
+        self._indexes = []  # <- Arguments of create_index() calls.
         if objs:
             try:
                 self.load_data(objs, *args, **kwds)
@@ -1013,28 +1247,112 @@ class Selector(object):
         else:
             obj_list = objs
 
-        cursor = self._connection.cursor()
-        with savepoint(cursor):
-            table = self._table or new_table_name(cursor)
-            for obj in obj_list:
-                if ((
-                        isinstance(obj, string_types)
-                        and obj.lower().endswith('.csv')
-                    ) or (
-                        isinstance(obj, file_types)
-                        and getattr(obj, 'name', '').lower().endswith('.csv')
-                    )
-                ):
-                    load_csv(cursor, table, obj, *args, **kwds)
-                else:
-                    reader = get_reader(obj, *args, **kwds)
-                    load_data(cursor, table, reader)
+        recorder = _profile.recorder
+        if recorder is not None:
+            start = _profile.timer()
+            obj_count = len(self._obj_strings)
+            row_count = self._count_rows()
 
-                self._append_obj_string(obj)
+        cursor = self._connection.cursor()
+        if self._shared:
+            self._copy_shared_table()  # <- Shared tables are read-only.
+        shared_key = None if self._table else _get_shared_key(obj_list, args, kwds)
+
+        with _cache.recording_inputs() as inputs:
+            if shared_key:
+                table = shared_table_name(shared_key)
+                if not table_exists(cursor, table):
+                    _build_shared_table(table, obj_list, args, kwds)
+                self._shared = True
+                for obj in obj_list:
+                    _cache.record_input(obj)
+                    self._append_obj_string(obj)
+            else:
+                with savepoint(cursor):
+                    table = self._table or new_table_name(cursor)
+                    for obj in obj_list:
+                        _load_obj(cursor, table, obj, *args, **kwds)
+                        _cache.record_input(obj)
+                        self._append_obj_string(obj)
+
+        for path in inputs:
+            if path not in self._inputs:
+                self._inputs.append(path)
+        self._loads.append((_get_reload_objs(objs), args, kwds))
+        if any(inputs):
+            _file_selectors[id(self)] = self
 
         if not self._table and table_exists(cursor, table):
             self._table = table
 
+        if recorder is not None:
+            recorder.add_load(', '.join(self._obj_strings[obj_count:]),
+                              self._count_rows() - row_count,
+                              _profile.timer() - start)
+
+    def _reload(self):
+        """Load the data again from its original sources (used by
+        watch mode when input files change). Returns False, without
+        changing anything, if a source can only be read once (like
+        an iterator or a file object).
+
+        The data is loaded into a new table that replaces the old
+        one only when loading succeeds--if an error is raised, the
+        Selector keeps its previous data.
+        """
+        for objs, _, _ in self._loads:
+            for obj in (objs if isinstance(objs, list) else [objs]):
+                if not isinstance(obj, string_types) and _is_exhaustible(obj):
+                    return False  # <- EXIT!
+
+        new = self.__class__()
+        new._connection = self._connection
+        try:
+            for objs, args, kwds in self._loads:
+                new.load_data(objs, *args, **kwds)
+            for columns in self._indexes:
+                new.create_index(*columns)
+        except Exception:
+            if new._table and not new._shared:
+                drop_table(self._connection.cursor(), new._table)
+            raise
+        finally:
+            _file_selectors.pop(id(new), None)
+
+        if self._table and not self._shared:
+            drop_table(self._connection.cursor(), self._table)
+        self._table = new._table
+        self._shared = new._shared
+        self._inputs = new._inputs
+        self._loads = new._loads
+        self._indexes = new._indexes
+        return True  # <- Original reprs in _obj_strings are kept.
+
+    def _copy_shared_table(self):
+        """Copy data from the shared database into a new temporary
+        table (and recreate its indexes) so more data can be loaded.
+        """
+        cursor = self._connection.cursor()
+        table = new_table_name(cursor)
+        columns = self.fieldnames
+        with savepoint(cursor):
+            create_table(cursor, table, columns)
+            statement = 'INSERT INTO {0} SELECT * FROM {1}'
+            cursor.execute(statement.format(table, self._table))
+        self._table = table
+        self._shared = False
+        indexes, self._indexes = self._indexes, []
+        for columns in indexes:
+            self.create_index(*columns)
+
+    def _count_rows(self):
+        """Return the number of rows loaded (used when profiling)."""
+        if not self._table:
+            return 0
+        cursor = self._connection.cursor()
+        cursor.execute('SELECT COUNT(*) FROM ' + self._table)
+        return cursor.fetchone()[0]
+
     def _append_obj_string(self, obj):
         """Get string for *obj*, limit to one line, and append to list."""
         obj_str = repr(obj)
@@ -1070,6 +1388,7 @@ class Selector(object):
 
     def __iter__(self):
         """Return iterable of dictionary rows (like csv.DictReader)."""
+        _cache.record_inputs(self._inputs)
         cursor = self._connection.cursor()
         cursor.execute('SELECT * FROM ' + self._table)
 
@@ -1126,6 +1445,7 @@ class Selector(object):
 
     def _execute_query(self, select_clause, trailing_clause=None, **kwds_filter):
         """Execute query and return cursor object."""
+        _cache.record_inputs(self._inputs)
         try:
             # Register where-clause functions with SQLite connection.
             func_list = [x for x in kwds_filter.values() if callable(x)]
@@ -1141,7 +1461,7 @@ class Selector(object):
 
             # Execute query.
             cursor = self._connection.cursor()
-            cursor.execute(stmnt, params)
+            _execute(cursor, stmnt, params)
 
         except Exception as e:
             exc_cls = e.__class__
@@ -1198,6 +1518,10 @@ class Selector(object):
         The *columns* can be a string, sequence, set or mapping--see
         the _select() method for details.
         """
+        recorder = _profile.recorder
+        if recorder is not None:
+            cursor = recorder.count_rows(cursor)  # <- Count rows as read.
+
         if isinstance(columns, (collections.Sequence, collections.Set)):
             return self._format_result_group(columns, cursor)
 
@@ -1292,7 +1616,8 @@ class Selector(object):
         value_columns = tuple('{0}({1})'.format(sqlfunc, x) for x in value_columns)
         select_clause = ', '.join(key_columns + value_columns)
         if key:
-            group_by = 'GROUP BY {0}'.format(', '.join(key_columns))
+            key_columns_string = ', '.join(key_columns)
+            group_by = 'GROUP BY {0}\nORDER BY {0}'.format(key_columns_string)
         else:
             group_by = None
         cursor = self._execute_query(select_clause, group_by, **where)
@@ -1303,6 +1628,120 @@ class Selector(object):
             return Result(results, evaluation_type=dict)
         return next(results)
 
+    def _load_requirement(self, cursor, width, records, index_width=0):
+        """Load *records* into a new temporary table with *width*
+        columns and return the table name and its escaped column
+        names. If *index_width* is given, an index is created for
+        that many leading columns.
+        """
+        table = new_table_name(cursor)
+        columns = ['col{0}'.format(x) for x in range(width)]
+        create_table(cursor, table, columns)
+        insert_records(cursor, table, columns, records)
+        columns = tuple(self._escape_field_name(x) for x in columns)
+        if index_width:
+            statement = 'CREATE INDEX idx_{0} ON {0} ({1})'.format(
+                table, ', '.join(columns[:index_width]))
+            cursor.execute(statement)
+        return table, columns
+
+    def _select_set_difference(self, columns, records, **where):
+        """Compare selected *columns* against *records* (an iterable
+        of row-tuples) inside SQLite and return a 2-tuple of lists:
+        the *records* that were not selected and the selected values
+        that are not in *records*. Values are formatted as they would
+        be for the given *columns*.
+        """
+        _cache.record_inputs(self._inputs)
+        key, value = _parse_columns(columns)
+        _, value_columns = self._parse_key_value(key, value)
+
+        func_list = [x for x in where.values() if callable(x)]
+        _register_function(self._connection, func_list)
+
+        cursor = self._connection.cursor()
+        req_table, req_columns = self._load_requirement(
+            cursor, len(value_columns), records)
+        try:
+            data_select = 'SELECT {0} FROM {1}'.format(
+                ', '.join(value_columns), self._table)
+            where_clause, params = self._build_where_clause(where)
+            if where_clause:
+                data_select = '{0} WHERE {1}'.format(data_select, where_clause)
+            req_select = 'SELECT {0} FROM {1}'.format(
+                ', '.join(req_columns), req_table)
+
+            _execute(cursor, '{0}\nEXCEPT\n{1}'.format(req_select, data_select),
+                     params)
+            missing = list(self._format_result_group(value, cursor))
+
+            _execute(cursor, '{0}\nEXCEPT\n{1}'.format(data_select, req_select),
+                     params)
+            extra = list(self._format_result_group(value, cursor))
+        finally:
+            drop_table(cursor, req_table)
+        return missing, extra
+
+    def _select_mapping_mismatches(self, columns, items, **where):
+        """Compare selected *columns* (a mapping of key columns to a
+        single value column) against *items* (an iterable of key-tuple
+        and value pairs) inside SQLite. Returns a 2-tuple containing
+        a list of key and value-list pairs for the selected rows that
+        do not match their required value, and a list of keys that
+        are required but not selected.
+        """
+        _cache.record_inputs(self._inputs)
+        key, value = _parse_columns(columns)
+        key_columns, value_columns = self._parse_key_value(key, value)
+        width = len(key_columns)
+
+        func_list = [x for x in where.values() if callable(x)]
+        _register_function(self._connection, func_list)
+
+        cursor = self._connection.cursor()
+        records = (tuple(k) + (v,) for k, v in items)
+        req_table, req_columns = self._load_requirement(
+            cursor, width + 1, records, index_width=width)
+        try:
+            pairs = zip(req_columns, key_columns + value_columns)
+            matching = ' AND '.join(
+                '{0}.{1} IS {2}.{3}'.format(req_table, x, self._table, y)
+                for x, y in pairs
+            )
+            where_clause, params = self._build_where_clause(where)
+            condition = 'NOT EXISTS (SELECT 1 FROM {0} WHERE {1})'.format(
+                req_table, matching)
+            if where_clause:
+                condition = '{0} AND {1}'.format(where_clause, condition)
+            statement = 'SELECT {0} FROM {1} WHERE {2}\nORDER BY {3}'.format(
+                ', '.join(key_columns + value_columns),
+                self._table,
+                condition,
+                ', '.join(key_columns + ('_ROWID_',)),
+            )
+            _execute(cursor, statement, params)
+            mismatched = [(k, list(v)) for k, v in self._format_results(columns, cursor)]
+
+            statement = 'SELECT {0} FROM {1}\nEXCEPT\nSELECT {2} FROM {3}'.format(
+                ', '.join(req_columns[:width]),
+                req_table,
+                ', '.join(key_columns),
+                self._table,
+            )
+            if where_clause:
+                statement = '{0} WHERE {1}'.format(statement, where_clause)
+            _execute(cursor, statement, params)
+            key_type = type(key)
+            if issubclass(key_type, str):
+                missing = [row[0] for row in cursor]
+            elif issubclass(key_type, tuple) and hasattr(key_type, '_fields'):
+                missing = [key_type(*row) for row in cursor]  # If namedtuple.
+            else:
+                missing = [key_type(row) for row in cursor]
+        finally:
+            drop_table(cursor, req_table)
+        return mismatched, missing
+
     def create_index(self, *columns):
         """Create an index for specified columns---can speed up
         testing in many cases.
@@ -1329,6 +1768,7 @@ class Selector(object):
                   lead to longer run times so use indexes with care.
         """
         self._assert_fields_exist(columns)
+        original_columns = columns
 
         # Build index name.
         whitelist = lambda col: ''.join(x for x in col if x.isalnum())
@@ -1343,8 +1783,12 @@ class Selector(object):
         statement = statement.format(idx_name, self._table, ', '.join(columns))
 
         # Create index.
-        cursor = self._connection.cursor()
-        cursor.execute(statement)
+        if self._shared:
+            _execute_shared(statement)
+        else:
+            cursor = self._connection.cursor()
+            cursor.execute(statement)
+        self._indexes.append(original_columns)
 
 
 # Prepare error message for old or non-standard builds of Python
@@ -1369,3 +1813,9 @@ elif sqlite3.sqlite_version_info < (3, 6, 8):
                 'version:\n\nPython {0}\nBuilt with SQLite {1}'
             ).format(sys.version, sqlite3.sqlite_version)
             raise Exception(msg)
+
+
+# Set module explicitly to cleanup reprs and error reporting.
+Selector.__module__ = 'datatest'
+Query.__module__ = 'datatest'
+Result.__module__ = 'datatest'
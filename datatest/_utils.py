@@ -1,7 +1,6 @@
 # -*- coding: utf-8 -*-
 """Utility helper functions."""
 from __future__ import absolute_import
-import inspect
 import re
 from io import IOBase
 from numbers import Number
@@ -61,13 +60,27 @@ def iterpeek(iterable):
     return first_item, iterable
 
 
+try:
+    _number_types = (int, long, float, bool)  # long removed in Python 3.0
+except NameError:
+    _number_types = (int, float, bool)
+
+
 def _safesort_key(obj):
     """Return a key suitable for sorting objects of any type."""
+    cls = obj.__class__
+    if cls in _number_types:  # Fast paths for the most common exact
+        return (1, obj)       # types (avoids slower isinstance() checks
+    if cls is str:            # against abstract base classes).
+        return (2, obj)
+    if cls is tuple:
+        return (3, tuple(_safesort_key(x) for x in obj))
+
     if obj is None:
         index = 0
     elif isinstance(obj, Number):
         index = 1
-    elif isinstance(obj, str):
+    elif isinstance(obj, string_types):
         index = 2
     elif isinstance(obj, Iterable):
         index = 3
@@ -134,6 +147,7 @@ def _get_arg_lengths(func):
     as the first item and the number of variable positional arguments as
     the second item.
     """
+    import inspect  # <- Imported here to keep "import datatest" fast.
     try:
         funcsig = inspect.signature(func)
         params_dict = funcsig.parameters
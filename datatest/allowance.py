@@ -1,6 +1,11 @@
 # -*- coding: utf-8 -*-
 from __future__ import division
 import inspect
+import re
+import struct
+import warnings
+import weakref
+from timeit import default_timer
 from math import isnan
 from numbers import Number
 from ._compatibility.builtins import *
@@ -11,21 +16,31 @@ from ._compatibility import functools
 from ._compatibility import itertools
 
 from ._utils import exhaustible
+from . import _baseline
+from . import _profile
 from ._predicate import PredicateObject
+from ._predicate import PredicateMatcher
+from ._predicate import PredicateTuple
 from ._predicate import get_predicate
 from ._utils import _get_arg_lengths
 from ._utils import _expects_multiple_params
 from ._utils import _make_decimal
 from ._utils import string_types
+from ._utils import regex_types
 from ._query.query import BaseElement
 from ._query.query import DictItems
 
 from .validation import ValidationError
+from .validation import _DifferenceStore
+from .validation import _SerializedDifferences
+from .validation import _deserialize_items
 from .difference import BaseDifference
 from .difference import Missing
 from .difference import Extra
 from .difference import Invalid
 from .difference import Deviation
+from .difference import _nan_to_token
+from .difference import NOTFOUND
 
 
 __datatest = True  # Used to detect in-module stack frames (which are
@@ -43,10 +58,72 @@ __all__ = [
     'allowed_percent',
     'allowed_percent_deviation',  # alias of allowed_percent
     'allowed_specific',
+    'allowed_baseline',
     'allowed_limit',
 ]
 
 
+class AllowanceStats(object):
+    """Counts and timing for an allowance whose statistics are being
+    tracked (see :meth:`BaseAllowance.track_stats`). The *children*
+    are the stats of the allowances it's composed of (if any).
+    """
+    def __init__(self, allowance, children=()):
+        self.name = repr(allowance)
+        self.children = list(children)
+        self.seen = 0       #: Number of differences checked.
+        self.accepted = 0   #: Number of differences allowed.
+        self.time = 0.0     #: Seconds spent in call_predicate().
+
+    @property
+    def passed(self):
+        """Number of differences not allowed (passed on to the next
+        allowance or left in the error).
+        """
+        return self.seen - self.accepted
+
+    def __repr__(self):
+        cls_name = self.__class__.__name__
+        return '{0}(seen={1}, accepted={2}, passed={3}, time={4:.6f})'.format(
+            cls_name, self.seen, self.accepted, self.passed, self.time)
+
+    def _lines(self, indent):
+        line = '{0}{1}: seen {2}, accepted {3}, passed {4}, {5:.4f}s'.format(
+            indent, self.name, self.seen, self.accepted, self.passed, self.time)
+        yield line
+        for child in self.children:
+            for line in child._lines(indent + '    '):
+                yield line
+
+    def __str__(self):
+        return '\n'.join(self._lines(''))
+
+
+# Allowances whose statistics are tracked (mapped to their stats).
+_tracked_stats = weakref.WeakKeyDictionary()
+
+# When set to a list, the stats of all allowances are tracked and
+# appended to it as they are applied (used by the pytest plugin).
+_stats_log = None
+
+
+def _call_predicate(allowance, item):
+    """Call the allowance's call_predicate() method and update its
+    stats if they are being tracked.
+    """
+    stats = _tracked_stats.get(allowance) if _tracked_stats else None
+    if stats is None:
+        return allowance.call_predicate(item)  # <- EXIT!
+
+    start = default_timer()
+    result = allowance.call_predicate(item)
+    stats.time += default_timer() - start
+    stats.seen += 1
+    if result:
+        stats.accepted += 1
+    return result
+
+
 class BaseAllowance(abc.ABC):
     """Context manager base class to allow certain differences without
     triggering a test failure.
@@ -62,6 +139,36 @@ class BaseAllowance(abc.ABC):
         msg_part = 'msg={0!r}'.format(self.msg) if self.msg else ''
         return '{0}({1})'.format(cls_name, msg_part)
 
+    ##################################
+    # Methods for tracking statistics.
+    ##################################
+    def track_stats(self):
+        """Start tracking the number of differences seen, accepted,
+        and passed on by this allowance (and by each allowance it's
+        composed of) as well as the time spent checking them. Returns
+        the allowance itself::
+
+            allowance = allowed.deviation(5) | allowed.limit(10)
+
+            with allowance.track_stats():
+                validate(data, requirement)
+
+            print(allowance.stats)
+
+        Counts and times accumulate until this method is called
+        again. The time for a composed allowance includes the time
+        spent in its parts.
+        """
+        _tracked_stats[self] = AllowanceStats(self)
+        return self
+
+    @property
+    def stats(self):
+        """An :class:`AllowanceStats` object or None if stats are not
+        being tracked.
+        """
+        return _tracked_stats.get(self)
+
     ######################################
     # Hook methods for allowance protocol.
     ######################################
@@ -118,10 +225,14 @@ class BaseAllowance(abc.ABC):
             return item[0]
         grouped = itertools.groupby(serialized, key=make_key)
 
+        call_predicate = self.call_predicate
+        if _tracked_stats:
+            call_predicate = functools.partial(_call_predicate, self)
+
         for key, group in grouped:
             self.start_group(key)
             for item in group:
-                if self.call_predicate(item):
+                if call_predicate(item):
                     continue
                 yield item
             self.end_group(key)
@@ -131,31 +242,92 @@ class BaseAllowance(abc.ABC):
     @staticmethod
     def _serialized_items(iterable):
         if isinstance(iterable, collections.Mapping):
-            for key in iterable:
-                value = iterable[key]
-                if isinstance(value, (BaseElement, Exception)):
-                    yield (key, value)
-                else:
-                    for subvalue in value:
-                        yield (key, subvalue)
+            items = ((key, iterable[key]) for key in iterable)
+        elif isinstance(iterable, DictItems):
+            items = iterable  # <- Items are serialized as they are generated.
         else:
             for value in iterable:
                 yield (None, value)
+            return  # <- EXIT!
+
+        for key, value in items:
+            if isinstance(value, (BaseElement, Exception)):
+                yield (key, value)
+            else:
+                for subvalue in value:
+                    yield (key, subvalue)
 
     @staticmethod
     def _deserialized_items(iterable):
-        def make_key(item):
-            return item[0]
+        return _deserialize_items(iterable)
 
-        grouped = itertools.groupby(iterable, key=make_key)
+    def _get_error(self, differences, description):
+        """Check *differences* against the allowance and return a new
+        ValidationError containing those that are not allowed (or None
+        if all differences are allowed).
 
-        def make_value(group):
-            value = [item[1] for item in group]
-            if len(value) == 1:
-                return value.pop()
-            return value
+        The *differences* can be a container, a DictItems iterator,
+        or a _SerializedDifferences object. Iterators are checked as
+        they are consumed, so allowed differences are never stored.
+        """
+        recorder = _profile.recorder
+        if recorder is not None:
+            start = _profile.timer()
+            try:
+                return self._check_differences(differences, description)
+            finally:
+                recorder.add_allowance(self, _profile.timer() - start)
+        return self._check_differences(differences, description)
+
+    def _check_differences(self, differences, description):
+        if _stats_log is not None and self.stats is None:
+            self.track_stats()
+
+        if isinstance(differences, _SerializedDifferences):
+            is_mapping = differences.is_mapping
+            store, keys = differences._store, differences._keys
+        elif isinstance(differences, _DifferenceStore):
+            is_mapping = False
+            store, keys = differences, None
+        else:
+            is_mapping = isinstance(differences, (collections.Mapping, DictItems))
+            store = None
+
+        # Differences kept in a columnar store can be checked as a
+        # batch when the allowance supports it (see _get_column_check).
+        check_columns = _get_column_check(self) if store else None
+        accepted = check_columns(store) if check_columns else None
+
+        if accepted is not None:
+            selectors = [not x for x in accepted]
+            if keys is not None:
+                keys = [x for x, y in zip(keys, selectors) if y]
+            store = store._compress(selectors)
+            differences = _SerializedDifferences._from_store(store, keys)
+        else:
+            if isinstance(differences, _SerializedDifferences):
+                stream = iter(differences)
+            else:
+                stream = self._serialized_items(differences)
+            stream = self._filterfalse(stream)
+            differences = _SerializedDifferences(stream, is_mapping)
 
-        return dict((key, make_value(group)) for key, group in grouped)
+        if _stats_log is not None:
+            _stats_log.append(self.stats)
+
+        if not differences:
+            return None  # <- EXIT!
+
+        # Extend description with allowance message.
+        if self.msg:
+            if description:
+                message = '{0}: {1}'.format(self.msg, description)
+            else:
+                message = self.msg
+        else:
+            message = description
+
+        return ValidationError(differences, message)
 
     def __enter__(self):
         return self
@@ -164,39 +336,25 @@ class BaseAllowance(abc.ABC):
         if exc_type and not issubclass(exc_type, ValidationError):
             raise exc_value
 
-        differences = getattr(exc_value, 'differences', [])
-        is_not_mapping = not isinstance(differences, collections.Mapping)
-
-        stream = self._serialized_items(differences)
-        stream = self._filterfalse(stream)
-        differences = self._deserialized_items(stream)
-
-        if not differences:
+        # Differences from an enclosing allowance's error are streamed
+        # directly from their compact form (without first loading them
+        # into a dictionary or creating a list of difference objects).
+        differences = getattr(exc_value, '_pending', None)
+        if differences is None:
+            get_differences = getattr(exc_value, '_get_differences', None)
+            differences = get_differences() if get_differences else []
+
+        description = getattr(exc_value, 'description', None)
+        exc = self._get_error(differences, description)
+        if exc is None:
             return True  # <- EXIT!
 
         __tracebackhide__ = True  # Set pytest flag to hide traceback.
 
-        if is_not_mapping:
-            assert len(differences) == 1
-            differences = differences.popitem()[1]
-            if isinstance(differences, BaseDifference):
-                differences = [differences]
-
-        # Extend description with allowance message.
-        if self.msg:
-            if exc_value.description:
-                message = '{0}: {1}'.format(self.msg, exc_value.description)
-            else:
-                message = self.msg
-        else:
-            message = exc_value.description
-
-        # Build new ValidationError with remaining differences.
-        exc = ValidationError(differences, message)
-
         # Re-raised error inherits truncation behavior of original.
         exc._should_truncate = exc_value._should_truncate
         exc._truncation_notice = exc_value._truncation_notice
+        exc._profile = getattr(exc_value, '_profile', None)
 
         exc.__cause__ = None  # <- Suppress context using verbose
         raise exc             #    alternative to support older Python
@@ -212,6 +370,13 @@ class CombinedAllowance(BaseAllowance):
         self.msg = msg
         self.priority = max(left.priority, right.priority)
 
+    def track_stats(self):
+        self.left.track_stats()
+        self.right.track_stats()
+        children = [self.left.stats, self.right.stats]
+        _tracked_stats[self] = AllowanceStats(self, children)
+        return self
+
     def start_collection(self):
         self.left.start_collection()
         self.right.start_collection()
@@ -245,7 +410,7 @@ class IntersectedAllowance(CombinedAllowance):
         # short-circuit evaluation to avoid calling the second allowance
         # unnecessarily. If `first` returns False, then `second` should
         # not be called.
-        return first.call_predicate(item) and second.call_predicate(item)
+        return _call_predicate(first, item) and _call_predicate(second, item)
 
 
 class UnionedAllowance(CombinedAllowance):
@@ -264,7 +429,45 @@ class UnionedAllowance(CombinedAllowance):
         # short-circuit evaluation to avoid calling the second allowance
         # unnecessarily. If `first` returns True, then `second` should
         # not be called.
-        return first.call_predicate(item) or second.call_predicate(item)
+        return _call_predicate(first, item) or _call_predicate(second, item)
+
+
+def _get_column_check(allowance):
+    """Return a function that checks the differences in a columnar
+    _DifferenceStore as a batch (returning a list of accepted flags,
+    or None if the batch can't be checked) or return None if the
+    *allowance* must use the allowance protocol.
+
+    Batches are only used for stateless, element-wise allowances that
+    define a _check_columns() method themselves (subclasses must define
+    their own) and for unions or intersections of these. Batches are
+    not used when stats are being tracked.
+    """
+    if _tracked_stats:
+        return None  # <- EXIT!
+
+    cls = allowance.__class__
+    if cls is UnionedAllowance or cls is IntersectedAllowance:
+        check_left = _get_column_check(allowance.left)
+        check_right = _get_column_check(allowance.right)
+        if not (check_left and check_right):
+            return None  # <- EXIT!
+
+        is_union = cls is UnionedAllowance
+
+        def check_columns(store):
+            left = check_left(store)
+            right = check_right(store) if left is not None else None
+            if right is None:
+                return None  # <- EXIT!
+            if is_union:
+                return [x or y for x, y in zip(left, right)]
+            return [x and y for x, y in zip(left, right)]
+        return check_columns  # <- EXIT!
+
+    if '_check_columns' in cls.__dict__:
+        return allowance._check_columns
+    return None
 
 
 class allowed_missing(BaseAllowance):
@@ -366,6 +569,66 @@ def _normalize_deviation_args(lower, upper, msg):
     return (lower, upper, msg)
 
 
+def _next_float(x, up):
+    """Return the closest float above (when *up* is True) or below
+    the float *x*.
+    """
+    if x != x or x == (float('inf') if up else float('-inf')):
+        return x  # <- EXIT!
+    if x == 0.0:
+        return 5e-324 if up else -5e-324  # <- EXIT! (smallest subnormal)
+    bits = struct.unpack('<q', struct.pack('<d', x))[0]
+    bits += 1 if (bits >= 0) == up else -1
+    return struct.unpack('<d', struct.pack('<q', bits))[0]
+
+
+def _get_float_bounds(lower, upper):
+    """Return float versions of the Decimal *lower* and *upper* bounds.
+
+    The float bounds are rounded inward (to the smallest float not
+    below *lower* and the largest float not above *upper*) so that
+    comparing a float against them gives the same result as comparing
+    it against the exact Decimal values.
+    """
+    float_lower = float(lower)
+    if float_lower < lower:
+        float_lower = _next_float(float_lower, up=True)
+    float_upper = float(upper)
+    if float_upper > upper:
+        float_upper = _next_float(float_upper, up=False)
+    return float_lower, float_upper
+
+
+def _check_deviation_columns(allowance, store):
+    """Check the deviation and expected columns of a _DifferenceStore
+    against a deviation *allowance* and return a list of results. If
+    the store contains other types of differences, return None.
+
+    When every deviation is a float, the whole deviation column is
+    compared against the allowance's float bounds in a single pass
+    (see _compare_float_columns()). Otherwise, each difference is
+    checked with the allowance's _is_within() method.
+    """
+    kinds = store._kinds
+    if kinds.count(_DifferenceStore._DEVIATION) != len(kinds):
+        return None  # <- EXIT!
+
+    deviations = store._first_args
+    expected = store._second_args
+    if set(map(type, deviations)) <= _float_type \
+            and set(map(type, expected)) <= _float_or_int_types:
+        results = allowance._compare_float_columns(deviations, expected)
+        if results is not None:
+            return results  # <- EXIT!
+
+    is_within = allowance._is_within
+    return [is_within(x, y) for x, y in zip(deviations, expected)]
+
+
+_float_type = set([float])
+_float_or_int_types = set([float, int])
+
+
 class allowed_deviation(BaseAllowance):
     """allowed_deviation(tolerance, /, msg=None)
     allowed_deviation(lower, upper, msg=None)
@@ -379,6 +642,7 @@ class allowed_deviation(BaseAllowance):
         lower, upper, msg = _normalize_deviation_args(lower, upper, msg)
         self.lower = lower
         self.upper = upper
+        self._float_bounds = _get_float_bounds(lower, upper)
         super(allowed_deviation, self).__init__(msg)
 
     def __repr__(self):
@@ -391,13 +655,39 @@ class allowed_deviation(BaseAllowance):
                                                          self.upper,
                                                          msg_part)
 
-    def call_predicate(self, item):
-        diff = item[1]
-        deviation = diff.deviation or 0
-        if isnan(deviation) or isnan(diff.expected or 0):
+    def _is_within(self, deviation, expected):
+        deviation = deviation or 0
+        expected = expected or 0
+
+        # Fast path for floats (comparing floats to Decimals is slow).
+        if deviation.__class__ is float \
+                and (expected.__class__ is float or expected.__class__ is int):
+            if deviation != deviation or expected != expected:
+                return False  # <- EXIT! (NaN values)
+            float_lower, float_upper = self._float_bounds
+            return float_lower <= deviation <= float_upper  # <- EXIT!
+
+        if isnan(deviation) or isnan(expected):
             return False
         return self.lower <= deviation <= self.upper
 
+    def call_predicate(self, item):
+        diff = item[1]
+        return self._is_within(diff.deviation, diff.expected)
+
+    def _check_columns(self, store):
+        return _check_deviation_columns(self, store)
+
+    def _compare_float_columns(self, deviations, expected):
+        """Compare a column of float *deviations* against the float
+        bounds (same results as _is_within() but without a call for
+        each value). Return None if *expected* contains NaN values.
+        """
+        if any(x != x for x in expected):
+            return None  # <- EXIT!
+        float_lower, float_upper = self._float_bounds
+        return [float_lower <= x <= float_upper for x in deviations]
+
 with contextlib.suppress(AttributeError):  # inspect.Signature() is new in 3.3
     allowed_deviation.__init__.__signature__ = inspect.Signature([
         inspect.Parameter('self', inspect.Parameter.POSITIONAL_ONLY),
@@ -419,6 +709,7 @@ class allowed_percent(BaseAllowance):
         lower, upper, msg = _normalize_deviation_args(lower, upper, msg)
         self.lower = lower
         self.upper = upper
+        self._float_bounds = _get_float_bounds(lower, upper)
         super(allowed_percent, self).__init__(msg)
 
     def __repr__(self):
@@ -431,11 +722,7 @@ class allowed_percent(BaseAllowance):
                                                          self.upper,
                                                          msg_part)
 
-    def call_predicate(self, item):
-        diff = item[1]
-        deviation = diff.deviation
-        expected = diff.expected
-
+    def _is_within(self, deviation, expected):
         if expected:
             percent_error = (deviation or 0) / expected
         elif not deviation:
@@ -443,10 +730,35 @@ class allowed_percent(BaseAllowance):
         else:
             return False  # <- EXIT!
 
+        # Fast path for floats (comparing floats to Decimals is slow).
+        if percent_error.__class__ is float:
+            if percent_error != percent_error:
+                return False  # <- EXIT! (NaN value)
+            float_lower, float_upper = self._float_bounds
+            return float_lower <= percent_error <= float_upper  # <- EXIT!
+
         if isnan(percent_error):
             return False
         return self.lower <= percent_error <= self.upper
 
+    def call_predicate(self, item):
+        diff = item[1]
+        return self._is_within(diff.deviation, diff.expected)
+
+    def _check_columns(self, store):
+        return _check_deviation_columns(self, store)
+
+    def _compare_float_columns(self, deviations, expected):
+        """Compare the percent errors of float *deviations* against
+        the float bounds (same results as _is_within() but without a
+        call for each value). Return None if *expected* contains zeros.
+        """
+        if 0 in expected:
+            return None  # <- EXIT! (zero is handled by _is_within())
+        float_lower, float_upper = self._float_bounds
+        return [float_lower <= x / y <= float_upper
+                for x, y in zip(deviations, expected)]
+
 with contextlib.suppress(AttributeError):  # inspect.Signature() is new in 3.3
     allowed_percent.__init__.__signature__ = inspect.Signature([
         inspect.Parameter('self', inspect.Parameter.POSITIONAL_ONLY),
@@ -457,11 +769,245 @@ with contextlib.suppress(AttributeError):  # inspect.Signature() is new in 3.3
 allowed_percent_deviation = allowed_percent  # Set alias for full name.
 
 
+_base_difference_eq = BaseDifference.__dict__['__eq__']
+_uses_base_eq = dict()  # Cache of classes checked by _get_diff_hashkey().
+
+
+def _get_diff_hashkey(diff):
+    """Return a hashable key that matches the equality behavior of
+    *diff* or None if no such key can be made. Keys are only made
+    for differences that use the default BaseDifference.__eq__()
+    method and whose args are hashable.
+    """
+    cls = diff.__class__
+    try:
+        uses_base_eq = _uses_base_eq[cls]
+    except KeyError:
+        eq_method = getattr(cls, '__eq__', None)
+        eq_method = getattr(eq_method, '__func__', eq_method)
+        uses_base_eq = _uses_base_eq[cls] = eq_method is _base_difference_eq
+
+    if not uses_base_eq:
+        return None  # <- EXIT!
+
+    hashkey = (cls, tuple(map(_nan_to_token, diff.args)))
+    try:
+        hash(hashkey)
+    except TypeError:
+        return None
+    return hashkey
+
+
+class _AllowedDiffs(object):
+    """A multiset of allowed differences that supports removal like
+    a list does (removing one matching difference at a time and
+    raising a ValueError when no match is found).
+
+    Differences are counted in a hash table that is shared with any
+    fresh() copies---each copy only tracks how many of each it has
+    used. Differences without a hash key are kept in a list and are
+    matched by linear search.
+    """
+    def __init__(self, iterable=(), _counts=None, _others=None):
+        if _counts is None:
+            _counts = dict()  # Maps hashkeys to [representative, count].
+            _others = []
+            for diff in iterable:
+                hashkey = _get_diff_hashkey(diff)
+                if hashkey is None:
+                    _others.append(diff)
+                elif hashkey in _counts:
+                    _counts[hashkey][1] += 1
+                else:
+                    _counts[hashkey] = [diff, 1]
+        self._counts = _counts
+        self._others = _others
+        self._used = dict()
+
+    def fresh(self):
+        """Return a copy with none of the differences used."""
+        return _AllowedDiffs(_counts=self._counts, _others=list(self._others))
+
+    def _available(self, hashkey):
+        return self._counts[hashkey][1] - self._used.get(hashkey, 0)
+
+    def remove(self, diff):
+        hashkey = _get_diff_hashkey(diff)
+        if hashkey is not None:
+            if hashkey in self._counts and self._available(hashkey) > 0:
+                self._used[hashkey] = self._used.get(hashkey, 0) + 1
+                return  # <- EXIT!
+        else:
+            # Differences with custom equality must be compared
+            # against every allowed difference.
+            for hashkey, (allowed, _) in self._counts.items():
+                if allowed == diff and self._available(hashkey) > 0:
+                    self._used[hashkey] = self._used.get(hashkey, 0) + 1
+                    return  # <- EXIT!
+
+        self._others.remove(diff)  # <- Raises ValueError if not found.
+
+
+# Patterns with backreferences or inline flags can't be safely
+# combined into a single alternation (group numbers shift and
+# flags can only be set at the start of an expression).
+_uncombinable_pattern = re.compile(r'\\\d|\(\?P=|\(\?[aiLmsux]')
+
+
+def _combine_regexes(regexes):
+    """Return one compiled pattern that matches when any of the
+    given *regexes* would match or None if they can't be combined.
+    """
+    flags = set(x.flags for x in regexes)
+    if len(flags) != 1:
+        return None  # <- EXIT!
+
+    patterns = [x.pattern for x in regexes]
+    for pattern in patterns:
+        if not isinstance(pattern, str) or _uncombinable_pattern.search(pattern):
+            return None  # <- EXIT!
+
+    combined = '|'.join('(?:{0})'.format(x) for x in patterns)
+    try:
+        return re.compile(combined, flags.pop())
+    except (re.error, OverflowError, AssertionError):
+        return None
+
+
+class _RegexTree(object):
+    """Tree of combined regular expressions for finding all of the
+    *members* (a list of key-regex pairs) that match a string.
+    Branches whose combined pattern doesn't match are skipped so
+    that finding a match among *n* patterns takes about O(log n)
+    searches rather than *n*.
+    """
+    fanout = 8  # <- Wider trees need fewer (costly) pattern compiles.
+
+    def __init__(self, members):
+        self.members = members
+        self.combined = _combine_regexes([regex for _, regex in members])
+        if len(members) > self.fanout:
+            size = -(-len(members) // self.fanout)  # <- Ceiling division.
+            self.children = [_RegexTree(members[i:i + size])
+                             for i in range(0, len(members), size)]
+        else:
+            self.children = []
+
+    def search(self, text):
+        """Return a list of keys whose regex matches *text*."""
+        if self.combined is not None and not self.combined.search(text):
+            return []  # <- EXIT!
+        if self.children:
+            return [key for child in self.children for key in child.search(text)]
+        return [key for key, regex in self.members if regex.search(text)]
+
+
+class _PredicateKeyIndex(object):
+    """Index for finding which predicate keys (from the *items* of
+    an allowed_specific dictionary) match a given key.
+
+    * Wildcard keys (Ellipsis) always match.
+    * Set keys (frozensets) are expanded so that each member maps
+      back to the set in a hash table of exact values.
+    * Regex keys are searched using a tree of combined patterns.
+    * Tuple keys are indexed by the value in their first literal
+      (non-predicate) position so that only tuples that share a
+      literal value with the given key need to be compared.
+    * All other predicates are compared one at a time.
+    """
+    def __init__(self, items):
+        self._order = dict()
+        self._predicates = dict()
+        self._wildcards = []
+        self._exact = collections.defaultdict(list)
+        regex_members = []
+        self._tuple_index = collections.defaultdict(list)
+        self._others = []
+
+        for position, (key, predicate) in enumerate(items):
+            self._order[key] = position
+            self._predicates[key] = predicate
+            if key is Ellipsis:
+                self._wildcards.append(key)
+            elif isinstance(key, frozenset):
+                for member in key:
+                    self._exact[member].append(key)
+            elif isinstance(key, regex_types) and isinstance(key.pattern, str):
+                regex_members.append((key, key))
+            elif isinstance(predicate, PredicateTuple) \
+                    and self._add_tuple(key, predicate):
+                pass
+            else:
+                self._others.append((key, predicate))
+
+        self._regex_tree = _RegexTree(regex_members) if regex_members else None
+
+    def _add_tuple(self, key, predicate):
+        """Add *key* to the tuple index using its first literal value.
+        Returns False if the predicate has no usable literal value.
+        """
+        for position, value in enumerate(predicate):
+            if isinstance(value, PredicateMatcher):
+                continue
+            index_key = (len(predicate), position, value)
+            try:
+                self._tuple_index[index_key].append(key)
+            except TypeError:  # <- Unhashable value.
+                continue
+            return True
+        return False
+
+    def _get_tuple_candidates(self, key):
+        candidates = []
+        for position, value in enumerate(key):
+            try:
+                candidates.extend(
+                    self._tuple_index.get((len(key), position, value), ())
+                )
+            except TypeError:  # <- Unhashable value.
+                pass
+        return candidates
+
+    def get_matches(self, key):
+        """Return a list of the predicate keys that match *key* (in
+        the same order that they were given).
+        """
+        matches = list(self._wildcards)
+
+        if self._exact:
+            try:
+                matches.extend(self._exact.get(key, ()))
+            except TypeError:  # <- Unhashable key.
+                pass
+
+        if self._regex_tree is not None:
+            if isinstance(key, str):
+                matches.extend(self._regex_tree.search(key))
+            else:  # Compare individually (may raise a TypeError).
+                for match_key, _ in self._regex_tree.members:
+                    if self._predicates[match_key] == key:
+                        matches.append(match_key)
+
+        if self._tuple_index and isinstance(key, tuple):
+            for match_key in set(self._get_tuple_candidates(key)):
+                if self._predicates[match_key] == key:
+                    matches.append(match_key)
+
+        for match_key, predicate in self._others:
+            if predicate == key:
+                matches.append(match_key)
+
+        return sorted(matches, key=self._order.__getitem__)
+
+
 class allowed_specific(BaseAllowance):
     """Allows specific *differences* without triggering a
     test failure.
     """
     def __init__(self, differences, msg=None):
+        if isinstance(differences, _DifferenceStore):
+            differences = list(differences)  # <- From ValidationError.
+
         if not isinstance(differences, (BaseDifference, list, set, dict)):
             raise TypeError(
                 'differences must be a list, dict, or a single difference, '
@@ -471,6 +1017,8 @@ class allowed_specific(BaseAllowance):
         self.msg = msg
         self._allowed = dict()         # Properties to hold working values
         self._predicate_keys = dict()  # during allowance checking.
+        self._predicate_index = None
+        self._last_matches = None
 
     @property
     def priority(self):
@@ -484,23 +1032,26 @@ class allowed_specific(BaseAllowance):
     def start_collection(self):
         self._predicate_keys = dict()  # Clear _predicate_keys
 
-        # Normalize and copy mutable containers, assign to "_allowed".
+        # Normalize containers as multisets, assign to "_allowed".
         diffs = self.differences
         if isinstance(diffs, BaseDifference):
-            allowed = collections.defaultdict(lambda: [diffs])
+            allowed = collections.defaultdict(_AllowedDiffs([diffs]).fresh)
         elif isinstance(diffs, (list, set)):
-            allowed = collections.defaultdict(lambda: list(diffs))
+            allowed = collections.defaultdict(_AllowedDiffs(diffs).fresh)
         elif isinstance(diffs, dict):
             allowed = dict()
             for key, value in diffs.items():
-                predicate = get_predicate(key)
+                if isinstance(key, frozenset):
+                    predicate = get_predicate(set(key))  # <- Set key.
+                else:
+                    predicate = get_predicate(key)
                 if isinstance(predicate, PredicateObject):
                     self._predicate_keys[key]= predicate
 
                 if isinstance(value, (list, set)):
-                    allowed[key] = list(value)  # Make a copy.
+                    allowed[key] = _AllowedDiffs(value)
                 else:
-                    allowed[key] = [value]
+                    allowed[key] = _AllowedDiffs([value])
         else:
             raise TypeError(
                 'differences must be a list, dict, or a single difference, '
@@ -508,32 +1059,37 @@ class allowed_specific(BaseAllowance):
             )
         self._allowed = allowed
 
+        predicate_items = [(k, v) for k, v in self._predicate_keys.items()]
+        self._predicate_index = _PredicateKeyIndex(predicate_items)
+        self._last_matches = None
+
     def call_predicate(self, item):
         key, diff = item
         try:
             self._allowed[key].remove(diff)
             return True
         except KeyError:
-            matches = dict()
-
             # See if key compares as equal to any predicate-keys.
-            for match_key, match_pred in self._predicate_keys.items():
-                if match_pred == key:
-                    matches[match_key] = match_pred
+            # Differences are grouped by key, so the matches for the
+            # most recent key are reused.
+            last_key, matches = self._last_matches or (NOTFOUND, None)
+            if last_key.__class__ is not key.__class__ or not last_key == key:
+                matches = self._predicate_index.get_matches(key)
+                self._last_matches = (key, matches)
 
             if not matches:
                 return False
             elif len(matches) == 1:
                 try:
-                    match_key = next(iter(matches.keys()))
-                    self._allowed[match_key].remove(diff)
+                    self._allowed[matches[0]].remove(diff)
                     return True
                 except ValueError:
                     return False
             else:
+                predicates = (self._predicate_keys[x] for x in matches)
                 msg = (
                     'the key {0!r} matches multiple predicates: {1}'
-                ).format(key, ', '.join(repr(x) for x in matches.values()))
+                ).format(key, ', '.join(repr(x) for x in predicates))
                 exc = KeyError(msg)
                 exc.__cause__ = None
                 raise exc
@@ -542,6 +1098,83 @@ class allowed_specific(BaseAllowance):
             return False
 
 
+class allowed_baseline(BaseAllowance):
+    """Allows differences recorded in the baseline file at *path*.
+    When *update* is True, all differences are allowed and the
+    baseline file is rewritten to contain them.
+
+    Differences are matched by their type, arguments and associated
+    key (numbers that compare equal, like ``1`` and ``1.0``, match).
+    Each recorded difference is allowed once. After checking,
+    the :attr:`unseen` attribute holds a list of (key, difference)
+    tuples for recorded differences that did not occur (key is None
+    when differences are not in a mapping) and a warning is issued
+    if any are found.
+    """
+    def __init__(self, path, msg=None, update=False):
+        self.path = path
+        self.msg = msg
+        self.update = update
+        self.unseen = None
+        self._baseline = None  # Properties to hold working values
+        self._writer = None    # during allowance checking.
+
+    def __repr__(self):
+        cls_name = self.__class__.__name__
+        msg_part = ', msg={0!r}'.format(self.msg) if self.msg else ''
+        update_part = ', update=True' if self.update else ''
+        return '{0}({1!r}{2}{3})'.format(cls_name, self.path, msg_part, update_part)
+
+    @property
+    def priority(self):
+        return 200
+
+    def _filterfalse(self, serialized):
+        # If checking stops early (because of an error or because
+        # the differences are not all consumed), release the baseline
+        # and discard a partly written one.
+        try:
+            for item in super(allowed_baseline, self)._filterfalse(serialized):
+                yield item
+        finally:
+            if self._writer is not None:
+                self._writer.abort()
+                self._writer = None
+            if self._baseline is not None:
+                self._baseline.close()
+                self._baseline = None
+
+    def start_collection(self):
+        self.unseen = None
+        if self.update:
+            self._writer = _baseline.BaselineWriter(self.path)
+        else:
+            self._baseline = _baseline.BaselineFile(self.path)
+
+    def call_predicate(self, item):
+        if self._writer is not None:
+            self._writer.add(*item)
+            return True
+        return self._baseline.take(*item)
+
+    def end_collection(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+            self.unseen = []
+            return  # <- EXIT!
+
+        self.unseen = self._baseline.unseen()
+        self._baseline.close()
+        self._baseline = None
+        if self.unseen:
+            shown = ', '.join(repr(diff) for _, diff in self.unseen[:5])
+            if len(self.unseen) > 5:
+                shown += ', ...'
+            msg = '{0} baseline differences in {1!r} no longer seen: {2}'
+            warnings.warn(msg.format(len(self.unseen), self.path, shown))
+
+
 class allowed_limit(BaseAllowance):
     """Allows up to a given *number* of differences without triggering
     a test failure.
@@ -805,9 +1438,51 @@ class allowed(abc.ABC):
 
             with known_issues:
                 validate(data, requirement)
+
+        Since sets can't be used as dictionary keys, a :py:class:`frozenset`
+        key is treated as a set predicate--it matches any key that is one
+        of its members (a key equal to the frozenset itself still matches
+        too).
         """
         return allowed_specific(differences, msg)
 
+    @classmethod
+    def baseline(cls, path, msg=None, update=False):
+        """Allows differences recorded in the baseline file at *path*.
+        Use *update* to record (or re-record) the current differences:
+
+        .. code-block:: python
+            :emphasize-lines: 7
+
+            from datatest import validate, allowed
+
+            data = ['x', 'y', 'q']
+
+            requirement = {'x', 'y', 'z'}
+
+            with allowed.baseline('known_issues.baseline', update=True):
+                validate(data, requirement)  # Records [Extra('q'),
+                                             #          Missing('z')]
+
+        Later runs accept the recorded differences and fail on any
+        new ones:
+
+        .. code-block:: python
+            :emphasize-lines: 1
+
+            with allowed.baseline('known_issues.baseline'):
+                validate(data, requirement)
+
+        Baseline files store a hash table of the recorded differences
+        and are memory-mapped when checked, so they can hold a very
+        large number of known differences without loading them all
+        into memory. Each recorded difference is allowed once. When
+        recorded differences no longer occur, a warning is issued
+        and the differences can be found in the allowance's
+        ``unseen`` attribute.
+        """
+        return allowed_baseline(path, msg, update)
+
     @classmethod
     def limit(cls, number, msg=None):
         """Allows up to a given *number* of differences without
@@ -10,7 +10,9 @@ from ._compatibility import contextlib
 from ._query.query import Query
 from ._query.query import Result
 
-from .validation import _get_invalid_info
+from .validation import _get_validation_error
+from .validation import _get_schema_invalid_info
+from .validation import _new_error
 from .validation import ValidationError
 
 __datatest = True  # Used to detect in-module stack frames (which are
@@ -22,6 +24,7 @@ from .allowance import allowed_invalid
 from .allowance import allowed_deviation
 from .allowance import allowed_percent
 from .allowance import allowed_specific
+from .allowance import allowed_baseline
 from .allowance import allowed_keys
 from .allowance import allowed_args
 from .allowance import allowed_limit
@@ -35,7 +38,7 @@ class DataTestCase(TestCase):
     """
     maxDiff = getattr(TestCase, 'maxDiff', 80 * 8)  # Uses default in 3.1 and 2.6.
 
-    def assertValid(self, data, requirement, msg=None):
+    def assertValid(self, data, requirement, msg=None, cache=None, allow=None):
         """Fail if the *data* under test does not satisfy the
         *requirement*.
 
@@ -107,24 +110,67 @@ class DataTestCase(TestCase):
                 data = ...
                 requirement = 'FOO'
                 self.assertValid(data, requirement)
+
+        **Incremental validation:** When *cache* is given as a file
+        path, queries from a :class:`Selector` that are checked
+        against a single predicate reuse the results of previous runs
+        for unchanged data (see :func:`validate` for details)::
+
+            def test_mydata(self):
+                data = self.selector('A')
+                self.assertValid(data, iseven, cache='.datatest_cache')
+
+        **Allowances:** When *allow* is given, differences accepted
+        by the allowance are discarded as they are generated (see
+        :func:`validate` for details)::
+
+            def test_mydata(self):
+                data = ...
+                requirement = {'A', 'B', 'C', ...}
+                self.assertValid(data, requirement,
+                                 allow=self.allowedMissing())
         """
         # Setup traceback-hiding for pytest integration.
         __tracebackhide__ = lambda excinfo: excinfo.errisinstance(ValidationError)
 
-        invalid_info = _get_invalid_info(data, requirement)
-        if invalid_info:
-            default_msg, differences = invalid_info  # Unpack values.
-            err = ValidationError(differences, msg or default_msg)
+        err = _get_validation_error(data, requirement, msg, cache, allow)
+        if err is not None:
+            self._set_truncation(err)
+            raise err
 
-            def should_truncate(line_count, char_count):
-                return self.maxDiff and (char_count > self.maxDiff)
-            err._should_truncate = should_truncate
+    def assertValidSchema(self, data, schema, msg=None):
+        """Fail if any field in *data* does not satisfy its
+        requirement in *schema*. All fields are checked in a single
+        pass over the data (see :func:`validate_schema` for details)::
 
-            err._truncation_notice = \
-                'Diff is too long. Set self.maxDiff to None to see it.'
+            def test_mydata(self):
+                schema = {
+                    'A': {'x', 'y', 'z'},
+                    'B': re.compile('^[0-9]+$'),
+                }
+                self.assertValidSchema(self.selector, schema)
+        """
+        # Setup traceback-hiding for pytest integration.
+        __tracebackhide__ = lambda excinfo: excinfo.errisinstance(ValidationError)
 
+        invalid_info = _get_schema_invalid_info(data, schema)
+        if invalid_info:
+            default_msg, differences = invalid_info  # Unpack values.
+            err = _new_error(differences, msg or default_msg)
+            self._set_truncation(err)
             raise err
 
+    def _set_truncation(self, err):
+        """Truncate the message of *err* (a ValidationError) when it
+        is longer than maxDiff.
+        """
+        def should_truncate(line_count, char_count):
+            return self.maxDiff and (char_count > self.maxDiff)
+        err._should_truncate = should_truncate
+
+        err._truncation_notice = \
+            'Diff is too long. Set self.maxDiff to None to see it.'
+
     #def assertUnique(self, data, msg=None):
     #    pass
 
@@ -201,6 +247,21 @@ class DataTestCase(TestCase):
         """
         return allowed_specific(differences, msg)
 
+    def allowedBaseline(self, path, msg=None, update=False):
+        """Allows differences recorded in the baseline file at *path*
+        without triggering a test failure::
+
+            with self.allowedBaseline('known_issues.baseline'):
+                data = {'A', 'B', 'D'}
+                requirement = {'A', 'B', 'C'}
+                self.assertValid(data, requirement)
+
+        When *update* is True, all differences are allowed and they
+        are recorded in the baseline file (see :meth:`allowed.baseline`
+        for details).
+        """
+        return allowed_baseline(path, msg, update)
+
     def allowedKeys(self, predicate, msg=None):
         """Allows differences in a mapping whose keys satisfy the
         given *predicate*.
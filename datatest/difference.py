@@ -36,6 +36,8 @@ class BaseDifference(abc.ABC):
     """The base class for "difference" objects---all other difference
     classes are derived from this base.
     """
+    __slots__ = ('_args',)
+
     def __init__(self, *args):
         if not args:
             msg = '{0} requires at least 1 argument, got 0'
@@ -64,6 +66,18 @@ class BaseDifference(abc.ABC):
         return not self.__eq__(other)  #    no implicit relationship between
                                        #    __eq__() and __ne__() in Python 2.
 
+    def __getstate__(self):  # <- Needed to pickle __slots__ in Python 2.x.
+        state = dict(getattr(self, '__dict__', {}))
+        for cls in self.__class__.__mro__:
+            for name in cls.__dict__.get('__slots__', ()):
+                if name not in state and hasattr(self, name):
+                    state[name] = getattr(self, name)
+        return state
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+
     def __repr__(self):
         cls_name = self.__class__.__name__
         args_repr = ', '.join(repr(arg) for arg in self.args)
@@ -91,6 +105,8 @@ class Missing(BaseDifference):
             Missing('A'),
         ]
     """
+    __slots__ = ()
+
     def __init__(self, value):
         self._args = (value,)
 
@@ -122,6 +138,8 @@ class Extra(BaseDifference):
             Extra('C'),
         ]
     """
+    __slots__ = ()
+
     def __init__(self, value):
         self._args = (value,)
 
@@ -153,6 +171,8 @@ class Invalid(BaseDifference):
             Invalid(9),
         ]
     """
+    __slots__ = ('invalid', 'expected')
+
     def __init__(self, invalid, expected=None):
         self.invalid = invalid  #: The invalid value under test.
         self.expected = expected  #: The expected value.
@@ -193,6 +213,8 @@ class Deviation(BaseDifference):
             'C': Deviation(+3, 30),
         }
     """
+    __slots__ = ('deviation', 'expected')
+
     def __init__(self, deviation, expected):
         isempty = lambda x: x is None or x == ''
         try:
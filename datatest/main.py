@@ -17,8 +17,12 @@ class DataTestProgram(_TestProgram):
     def __init__(self, module='__main__', defaultTest=None, argv=None,
                    testRunner=DataTestRunner, testLoader=_defaultTestLoader,
                    exit=True, verbosity=1, failfast=None, catchbreak=None,
-                   buffer=None, ignore=False):
+                   buffer=None, ignore=False, workers=None, profile=None,
+                   watch=False):
         self.ignore = ignore
+        self.workers = workers
+        self.profile = profile
+        self.watch = watch
         _TestProgram.__init__(self,
                               module=module,
                               defaultTest=defaultTest,
@@ -31,6 +35,23 @@ class DataTestProgram(_TestProgram):
                               catchbreak=catchbreak,
                               buffer=buffer)
 
+    def _getParentArgParser(self):
+        # Add the '--workers', '--profile', '--profile-file' and '--watch'
+        # options (Python 3.4 and newer).
+        parser = _TestProgram._getParentArgParser(self)
+        parser.add_argument('--workers', dest='workers', type=int,
+                            help='Run tests in a pool of worker processes')
+        parser.add_argument('--profile', dest='profile', action='store_true',
+                            help='Show the slowest validations')
+        parser.add_argument('--profile-file', dest='profile_file',
+                            metavar='FILE',
+                            help=('Show the slowest validations and write '
+                                  'a JSON profile to FILE'))
+        parser.add_argument('--watch', dest='watch', action='store_true',
+                            help=('Re-run tests when the data files they '
+                                  'use are changed'))
+        return parser
+
     def runTests(self):
         try:
             if self.catchbreak and installHandler:
@@ -41,9 +62,14 @@ class DataTestProgram(_TestProgram):
         if self.testRunner is None:
             self.testRunner = DataTestRunner
 
+        profile_file = getattr(self, 'profile_file', None)
+        if profile_file:
+            self.profile = profile_file  # <- Runner accepts True or a path.
+
         if isinstance(self.testRunner, type):
             try:
-                kwds = ['verbosity', 'failfast', 'buffer', 'warnings', 'ignore']
+                kwds = ['verbosity', 'failfast', 'buffer', 'warnings', 'ignore',
+                        'workers', 'profile']
                 kwds = [attr for attr in kwds if hasattr(self, attr)]
                 kwds = dict((attr, getattr(self, attr)) for attr in kwds)
                 testRunner = self.testRunner(**kwds)
@@ -55,7 +81,10 @@ class DataTestProgram(_TestProgram):
             # assumed to be a TestRunner instance
             testRunner = self.testRunner
 
-        self.result = testRunner.run(self.test)
+        if self.watch and hasattr(testRunner, 'watch'):
+            self.result = testRunner.watch(self.test)
+        else:
+            self.result = testRunner.run(self.test)
         if self.exit:
             _sys.exit(not self.result.wasSuccessful())
 
@@ -63,8 +92,12 @@ class DataTestProgram(_TestProgram):
 if _sys.version_info[:2] == (3, 1):  # Patch methods for Python 3.1.
     def __init__(self, module='__main__', defaultTest=None, argv=None,
                    testRunner=DataTestRunner, testLoader=_defaultTestLoader,
-                   exit=True, ignore=False):
+                   exit=True, ignore=False, workers=None, profile=None,
+                   watch=False):
         self.ignore = ignore
+        self.workers = workers
+        self.profile = profile
+        self.watch = watch
         _TestProgram.__init__(self,
                               module=module,
                               defaultTest=defaultTest,
@@ -77,9 +110,13 @@ if _sys.version_info[:2] == (3, 1):  # Patch methods for Python 3.1.
 elif _sys.version_info[:2] == (2, 6):  # Patch runTests() for Python 2.6.
     def __init__(self, module='__main__', defaultTest=None, argv=None,
                    testRunner=DataTestRunner, testLoader=_defaultTestLoader,
-                   exit=True, ignore=False):
+                   exit=True, ignore=False, workers=None, profile=None,
+                   watch=False):
         self.exit = exit  # <- 2.6 does not handle exit argument.
         self.ignore = ignore
+        self.workers = workers
+        self.profile = profile
+        self.watch = watch
         _TestProgram.__init__(self,
                               module=module,
                               defaultTest=defaultTest,
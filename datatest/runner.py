@@ -1,13 +1,18 @@
 """Running tests"""
 import inspect
+import linecache
 import os
 import re
 import sys
+import time
+import traceback
 import unittest
 import warnings
 
 from ._compatibility import functools
 from ._utils import string_types
+from . import _cache
+from . import _profile
 from .validation import ValidationError
 
 try:
@@ -90,6 +95,18 @@ class DataTestResult(TextTestResult):
         self.ignore = ignore
         TextTestResult.__init__(self, stream, descriptions, verbosity)
 
+    def startTest(self, test):
+        recorder = _profile.recorder
+        if recorder is not None:
+            recorder.start_test(test.id())
+        TextTestResult.startTest(self, test)
+
+    def stopTest(self, test):
+        TextTestResult.stopTest(self, test)
+        recorder = _profile.recorder
+        if recorder is not None:
+            recorder.stop_test()
+
     def _is_mandatory(self, test):
         """Return True if a given *test* is mandatory or is a member of
         a class that is mandatory.
@@ -118,7 +135,7 @@ class DataTestResult(TextTestResult):
         stop_early_msg = 'mandatory test failed, stopping early'
 
         if issubclass(exctype, ValidationError):
-            differences = value.differences
+            differences = value._get_differences()  # <- Keeps compact store.
             if value.description:
                 desc = '{0}: {1}'.format(stop_early_msg, value.description)
             else:
@@ -171,6 +188,358 @@ class DataTestResult(TextTestResult):
             if self._is_mandatory(test):
                 self.stop()  # <- sets "self.shouldStop = True
 
+    def _exc_info_to_string(self, err, test):
+        """Return formatted text of errors from worker processes as-is,
+        otherwise format *err* normally.
+        """
+        if isinstance(err[1], _FormattedError):
+            return err[1].text
+        return TextTestResult._exc_info_to_string(self, err, test)
+
+
+class _FormattedError(Exception):
+    """An error or failure from a worker process (see _ParallelSuite)
+    that was already formatted as text.
+    """
+    def __init__(self, text):
+        Exception.__init__(self, text)
+        self.text = text
+
+
+class _RecordingResult(DataTestResult):
+    """Result for worker processes that records the outcome of each
+    test, in order, as a list of picklable tuples. Each record holds
+    the test's position in *tests* (or None if it's not one of the
+    given tests), the test's description, the kind of event, and an
+    optional text value.
+    """
+    def __init__(self, tests, ignore=False, failfast=False):
+        DataTestResult.__init__(self, _NullStream(), False, 0, ignore)
+        self.failfast = failfast
+        self.records = []
+        self._positions = dict((id(test), i) for i, test in enumerate(tests))
+
+    def _record(self, kind, test, text=None):
+        position = self._positions.get(id(test))
+        description = None if position is not None else str(test)
+        self.records.append((position, description, kind, text))
+
+    def startTest(self, test):
+        DataTestResult.startTest(self, test)
+        self._record('start', test)
+
+    def stopTest(self, test):
+        DataTestResult.stopTest(self, test)
+        self._record('stop', test)
+
+    def addSuccess(self, test):
+        DataTestResult.addSuccess(self, test)
+        self._record('success', test)
+
+    def addError(self, test, err):
+        DataTestResult.addError(self, test, err)
+        self._record('error', test, self.errors[-1][1])
+
+    def addFailure(self, test, err):
+        DataTestResult.addFailure(self, test, err)
+        self._record('failure', test, self.failures[-1][1])
+
+    def addSkip(self, test, reason):
+        DataTestResult.addSkip(self, test, reason)
+        self._record('skip', test, reason)
+
+    def addExpectedFailure(self, test, err):
+        DataTestResult.addExpectedFailure(self, test, err)
+        self._record('expected_failure', test, self.expectedFailures[-1][1])
+
+    def addUnexpectedSuccess(self, test):
+        DataTestResult.addUnexpectedSuccess(self, test)
+        self._record('unexpected_success', test)
+
+    def addSubTest(self, test, subtest, err):
+        DataTestResult.addSubTest(self, test, subtest, err)
+        if err is not None:
+            kind = 'error' if not issubclass(err[0], test.failureException) \
+                else 'failure'
+            text = (self.failures if kind == 'failure' else self.errors)[-1][1]
+            self.records.append((None, str(subtest), kind, text))
+
+
+class _NullStream(object):
+    """Stream that discards output (a stand-in for the stream wrapper
+    that TextTestResult expects).
+    """
+    def write(self, *args):
+        pass
+
+    def writeln(self, *args):
+        pass
+
+    def flush(self):
+        pass
+
+
+try:
+    from unittest.suite import _ErrorHolder
+except ImportError:  # Python 2.6 and older.
+    class _ErrorHolder(object):
+        failureException = None
+
+        def __init__(self, description):
+            self.description = description
+
+        def id(self):
+            return self.description
+
+        def shortDescription(self):
+            return None
+
+        def __str__(self):
+            return self.description
+
+        def __call__(self, result):
+            pass
+
+
+def _replay_records(result, tests, records):
+    """Report the outcomes in *records* (see _RecordingResult) to
+    *result* as if the *tests* had been run in this process.
+    """
+    holders = {}
+    for position, description, kind, text in records:
+        if position is not None:
+            test = tests[position]
+        else:
+            if description not in holders:
+                holders[description] = _ErrorHolder(description)
+            test = holders[description]
+
+        if kind == 'start':
+            result.startTest(test)
+        elif kind == 'stop':
+            result.stopTest(test)
+        elif kind == 'success':
+            result.addSuccess(test)
+        elif kind == 'error':
+            err = (_FormattedError, _FormattedError(text), None)
+            TextTestResult.addError(result, test, err)
+        elif kind == 'failure':
+            err = (_FormattedError, _FormattedError(text), None)
+            TextTestResult.addFailure(result, test, err)
+        elif kind == 'skip':
+            result.addSkip(test, text)
+        elif kind == 'expected_failure':
+            err = (_FormattedError, _FormattedError(text), None)
+            result.addExpectedFailure(test, err)
+        elif kind == 'unexpected_success':
+            TextTestResult.addUnexpectedSuccess(result, test)
+
+
+def _get_test_units(tests):
+    """Split a list of *tests* (already in run order) into a list of
+    units that can be run in separate processes. Each unit contains
+    the tests of a single class or, if a module defines setUpModule()
+    or tearDownModule() fixtures, of a single module.
+    """
+    units = []
+    previous_key = None
+    for test in tests:
+        module = sys.modules.get(test.__class__.__module__)
+        if hasattr(module, 'setUpModule') or hasattr(module, 'tearDownModule'):
+            key = module
+        else:
+            key = test.__class__
+
+        if not units or key is not previous_key:
+            units.append([])
+        units[-1].append(test)
+        previous_key = key
+    return units
+
+
+_worker_units = None  # Set in parent process before forking workers.
+
+
+def _run_unit(index, ignore, failfast):
+    """Run the tests of a unit (in a worker process) and return a
+    3-tuple containing a list of records, a boolean that is True
+    if the whole test run should stop early, and a list of profile
+    records (or None when not profiling).
+    """
+    recorder = _profile.recorder
+    if recorder is not None:
+        del recorder.tests[:]  # <- Only return records for this unit.
+
+    tests = _worker_units[index]
+    result = _RecordingResult(tests, ignore, failfast)
+    unittest.TestSuite(tests)(result)
+    profile = recorder.tests if recorder is not None else None
+    return result.records, result.shouldStop, profile
+
+
+def _get_fork_context():
+    """Return a multiprocessing context that uses "fork" or None if
+    forking is not available. Worker processes must be forked so that
+    they inherit the loaded test objects.
+    """
+    if not hasattr(os, 'fork'):
+        return None  # <- EXIT!
+
+    import multiprocessing  # <- Only needed for parallel runs.
+    if hasattr(multiprocessing, 'get_context'):
+        return multiprocessing.get_context('fork')
+    return multiprocessing  # <- Python 2 always forks on POSIX systems.
+
+
+class _ParallelSuite(object):
+    """Callable suite that runs *tests* in a pool of *workers*
+    processes and reports their outcomes to a single result (in the
+    same order as running them serially).
+
+    Units of tests (see _get_test_units) are scheduled as workers
+    become available. When a unit stops early (when a mandatory test
+    fails or when using failfast), no new units are scheduled and
+    outcomes from units that come after it are discarded.
+    """
+    def __init__(self, tests, workers, ignore=False):
+        self.tests = tests
+        self.workers = workers
+        self.ignore = ignore
+
+    def __call__(self, result):
+        global _worker_units
+        units = _get_test_units(self.tests)
+        context = _get_fork_context()
+        if context is None or self.workers < 2 or len(units) < 2:
+            return unittest.TestSuite(self.tests)(result)  # <- EXIT!
+
+        _worker_units = units
+        pool = context.Pool(self.workers)
+
+        # Workers inherit the profile recorder when forked. In this
+        # process, records from workers are merged instead (replayed
+        # outcomes are not timed).
+        recorder = _profile.recorder
+        _profile.recorder = None
+        try:
+            self._run_units(pool, units, result, recorder)
+        finally:
+            _profile.recorder = recorder
+            pool.terminate()
+            pool.join()
+            _worker_units = None
+        return result
+
+    def _run_units(self, pool, units, result, recorder=None):
+        window = self.workers * 2
+        failfast = getattr(result, 'failfast', False)
+        stop_flag = []  # <- Set by callback when a unit stops early.
+
+        def callback(value):
+            if value[1]:
+                stop_flag.append(True)
+
+        pending = {}
+        next_unit = 0
+        for index in range(len(units)):
+            while next_unit < len(units) and len(pending) < window \
+                    and not stop_flag:
+                args = (next_unit, self.ignore, failfast)
+                pending[next_unit] = pool.apply_async(_run_unit, args,
+                                                      callback=callback)
+                next_unit += 1
+
+            if index not in pending:
+                break  # <- Not scheduled (an earlier unit stopped early).
+
+            records, should_stop, profile = pending.pop(index).get()
+            _replay_records(result, units[index], records)
+            if recorder is not None:
+                recorder.tests.extend(profile)
+            if should_stop:
+                result.stop()
+            if result.shouldStop:
+                break
+
+
+class _WatchSuite(object):
+    """Callable suite used by watch mode to run *tests* (a list that
+    can be replaced between runs) and record the input files used by
+    each test in the *inputs* dictionary.
+
+    Unlike a regular suite, module and class fixtures are set up the
+    first time one of their tests is run and are not torn down until
+    close() is called. This keeps data loaded by setUpModule() and
+    setUpClass() in memory from one run to the next.
+    """
+    def __init__(self, tests):
+        self.tests = tests
+        self.inputs = {}
+        self._fixtures = []  # <- Modules and classes that have been set up.
+
+    def _set_up(self, obj, name, result):
+        """Call *obj*'s set up fixture, named *name*, if it has not
+        been set up already. Returns False if the fixture failed.
+        """
+        if obj in self._fixtures:
+            return True  # <- EXIT!
+
+        fixture = getattr(obj, name, None)
+        if fixture is not None:
+            try:
+                fixture()
+            except Exception:
+                description = '{0} ({1})'.format(name, getattr(obj, '__name__', obj))
+                result.addError(_ErrorHolder(description), sys.exc_info())
+                return False  # <- EXIT! (fixture is tried again next run)
+        self._fixtures.append(obj)
+        return True
+
+    def __call__(self, result):
+        for test in self.tests:
+            if result.shouldStop:
+                break
+
+            module = sys.modules.get(test.__class__.__module__)
+            if not self._set_up(module, 'setUpModule', result):
+                continue
+            if not getattr(test.__class__, '__unittest_skip__', False) \
+                    and not self._set_up(test.__class__, 'setUpClass', result):
+                continue
+
+            with _cache.recording_inputs() as paths:
+                test(result)
+            self.inputs[test] = set(paths)
+        return result
+
+    def close(self):
+        """Tear down module and class fixtures in reverse order and
+        return a list of formatted tracebacks for any that failed.
+        """
+        errors = []
+        while self._fixtures:
+            obj = self._fixtures.pop()
+            name = 'tearDownClass' if isinstance(obj, type) else 'tearDownModule'
+            fixture = getattr(obj, name, None)
+            if fixture is None:
+                continue
+            try:
+                fixture()
+            except Exception:
+                errors.append(traceback.format_exc())
+        return errors
+
+
+def _stat_input(path):
+    """Return a (size, mtime) tuple for the file at *path* or None if
+    it does not exist.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_size, stat.st_mtime)
+
 
 class HideInternalStackFrames(object):
     """Wrapper for traceback to hide extraneous stack frames that
@@ -228,10 +597,13 @@ class DataTestRunner(unittest.TextTestRunner):
     resultclass = DataTestResult
 
     def __init__(self, stream=None, descriptions=True, verbosity=1,
-                 failfast=False, buffer=False, resultclass=None, ignore=False):
+                 failfast=False, buffer=False, resultclass=None, ignore=False,
+                 workers=None, profile=None):
         if stream is None:
             stream = sys.stderr
         self.ignore = ignore
+        self.workers = workers
+        self.profile = profile
         unittest.TextTestRunner.__init__(self,
                                          stream=stream,
                                          descriptions=descriptions,
@@ -247,12 +619,32 @@ class DataTestRunner(unittest.TextTestRunner):
     def run(self, test):
         """Run the given tests in order of line number from source
         file.
+
+        When *workers* is greater than one, test classes (or whole
+        modules when they define module-level fixtures) are run in a
+        pool of worker processes. Outcomes are reported in the same
+        order as a serial run and, when a mandatory test fails, no
+        new tests are started.
+
+        When *profile* is True, the time spent in each test and in
+        each validation (split into query execution, comparison,
+        allowances, and error formatting) is recorded and a table of
+        the slowest validations is written after the results. When
+        *profile* is a file path, the full profile is also saved to
+        this file as JSON.
         """
         test = _sort_tests(test)  # Sort tests by line number.
+        if self.workers and self.workers > 1:
+            suite = _ParallelSuite(test._tests, self.workers, self.ignore)
+        else:
+            suite = test
+        return self._run_suite(suite, test._tests)
 
+    def _run_suite(self, suite, tests):
+        """Write banner for modules of *tests* and run *suite*."""
         # Get test modules.
         modules = []
-        for one_test in test._tests:
+        for one_test in tests:
             mod = _get_module(one_test)
             if mod not in modules:
                 modules.append(mod)
@@ -272,17 +664,111 @@ class DataTestRunner(unittest.TextTestRunner):
         separator = '=' * 70
         self.stream.writeln(separator)
         self.stream.writeln(docstrings)
-        return unittest.TextTestRunner.run(self, test)
+
+        if not self.profile:
+            return unittest.TextTestRunner.run(self, suite)  # <- EXIT!
+
+        previous = _profile.recorder
+        recorder = _profile.recorder = _profile.Recorder()
+        try:
+            result = unittest.TextTestRunner.run(self, suite)
+        finally:
+            _profile.recorder = previous
+        self._write_profile(recorder)
+        return result
+
+    def watch(self, test, interval=1.0):
+        """Run the given tests and then watch the input files that
+        they used. When files change, reload any Selectors that were
+        loaded from them and re-run only the tests that used them.
+        Runs until interrupted (with Ctrl+C) and returns the result
+        of the most recent run.
+
+        Module and class fixtures are set up once, so Selectors for
+        unchanged files stay loaded between runs. Files are checked
+        for changes in size or modification time every *interval*
+        seconds. Tests are always run serially in watch mode.
+        """
+        from ._query.query import _reload_selectors
+
+        tests = _sort_tests(test)._tests
+        suite = _WatchSuite(tests)
+        result = None
+        try:
+            result = self._run_suite(suite, tests)
+            stats = {}
+            while True:
+                for paths in suite.inputs.values():
+                    for path in paths:
+                        if path and path not in stats:
+                            stats[path] = _stat_input(path)
+
+                time.sleep(interval)
+                changed = []
+                for path in sorted(stats):
+                    stat = _stat_input(path)
+                    if stat != stats[path]:
+                        stats[path] = stat
+                        changed.append(path)
+                if not changed:
+                    continue
+
+                self.stream.writeln()
+                for path in changed:
+                    self.stream.writeln('Changed: {0}'.format(path))
+                _, not_reloaded, failed = _reload_selectors(changed)
+                for selector in not_reloaded:
+                    self.stream.writeln('Unable to reload {0!r} (restart to '
+                                        'use the new data)'.format(selector))
+
+                # When a reload fails (like when a file is missing or
+                # still being written), the Selector keeps its previous
+                # data. Tests that use its files are not run until the
+                # files change again.
+                failed_paths = set()
+                for selector, error in failed:
+                    self.stream.writeln('Unable to reload {0!r}: {1}'.format(
+                        selector, ''.join(traceback.format_exception_only(
+                            error.__class__, error)).strip()))
+                    failed_paths.update(selector._inputs)
+
+                changed = set(changed)
+                affected = [x for x in tests if changed & suite.inputs.get(x, set())
+                            and not failed_paths & suite.inputs.get(x, set())]
+                if affected:
+                    suite.tests = affected
+                    result = self._run_suite(suite, affected)
+        except KeyboardInterrupt:
+            if result is None:
+                raise  # <- Interrupted during first run.
+            self.stream.writeln()
+        finally:
+            for error in suite.close():
+                self.stream.writeln(error)
+        return result
+
+    def _write_profile(self, recorder):
+        summary = recorder.format_summary()
+        if summary:
+            self.stream.writeln()
+            self.stream.writeln(summary)
+        if isinstance(self.profile, string_types):
+            recorder.dump(self.profile)
+            self.stream.writeln()
+            self.stream.writeln('Profile written to {0}'.format(self.profile))
 
 
 # Replace __init__ with version that uses arguments appropriate for older
 # versions of unittest.  Also, fixes redirect behavior inherited from these
 # older versions (see issue 10786 <http://bugs.python.org/issue10786>).
 if sys.version_info[:2] in [(3, 1), (2, 6)]:  # 3.1 and 2.6
-    def __init__(self, stream=None, descriptions=1, verbosity=1, ignore=False):
+    def __init__(self, stream=None, descriptions=1, verbosity=1, ignore=False,
+                 workers=None, profile=None):
         if stream is None:
             stream = sys.stderr
         self.ignore = ignore
+        self.workers = workers
+        self.profile = profile
         unittest.TextTestRunner.__init__(self,
                                          stream=stream,
                                          descriptions=descriptions,
@@ -290,18 +776,117 @@ if sys.version_info[:2] in [(3, 1), (2, 6)]:  # 3.1 and 2.6
     DataTestRunner.__init__ = __init__
 
 
+_name_pattern = re.compile(r'^\s*(?:def\s+|class\s+)?([A-Za-z_]\w*)\s*[(:=]')
+_module_linenos = {}  # <- Per-module cache of {name: lineno} mappings.
+_class_linenos = {}  # <- Per-class cache of {name: lineno} mappings.
+
+
+def _find_linenos(lines, start=1):
+    """Return a dictionary that maps names found in *lines* to the
+    line numbers where they first appear and a set of names that
+    appear more than once.
+    """
+    linenos = {}
+    repeated = set()
+    for lineno, line in enumerate(lines, start):
+        match = _name_pattern.match(line)
+        if match:
+            name = match.group(1)
+            if name in linenos:
+                repeated.add(name)
+            else:
+                linenos[name] = lineno
+    return linenos, repeated
+
+
+def _get_module_linenos(module_name):
+    """Return a dictionary that maps names defined in the module to
+    the line numbers where they appear. Names that appear more than
+    once (e.g., methods with the same name in different classes) are
+    left out. The module's source is read once and the result is
+    cached.
+    """
+    try:
+        return _module_linenos[module_name]
+    except KeyError:
+        pass
+
+    linenos = {}
+    filename = getattr(sys.modules.get(module_name), '__file__', None)
+    if filename:
+        if filename.endswith(('.pyc', '.pyo')):
+            filename = filename[:-1]
+        linenos, repeated = _find_linenos(linecache.getlines(filename))
+        for name in repeated:
+            del linenos[name]
+    _module_linenos[module_name] = linenos
+    return linenos
+
+
+def _get_class_linenos(cls):
+    """Return a dictionary that maps names defined in the body of
+    *cls* to the line numbers where they first appear. The result
+    is cached.
+    """
+    try:
+        return _class_linenos[cls]
+    except KeyError:
+        pass
+
+    try:
+        lines, start = inspect.getsourcelines(cls)
+        start = max(start, 1)
+    except (IOError, OSError, TypeError):  # <- Source not available.
+        lines, start = [], 1
+
+    # Older versions of inspect find classes by name alone, so the
+    # source is checked against the line numbers of the class's
+    # functions (it could belong to another class with the same name).
+    stop = start + len(lines)
+    for value in vars(cls).values():
+        code = getattr(value, '__code__', None)
+        if code is not None and not (start <= code.co_firstlineno < stop):
+            lines = []
+            break
+
+    linenos, _ = _find_linenos(lines, start)
+    _class_linenos[cls] = linenos
+    return linenos
+
+
+def _get_lineno(cls, name):
+    """Return the line number where *name* is assigned in the body
+    of *cls* (or one of its base classes) or None if it can't be
+    determined. This is used as a fallback for test objects that
+    have no code object.
+    """
+    for base in getattr(cls, '__mro__', (cls,)):
+        if name in vars(base):
+            lineno = _get_class_linenos(base).get(name)
+            if lineno is not None:
+                return lineno
+            break
+    return _get_module_linenos(cls.__module__).get(name)
+
+
 def _sort_key(test):
     """Accepts test method, returns module name and line number."""
     method = getattr(test, test._testMethodName)
     while hasattr(method, '_wrapped'):  # If object is wrapped with a
         method = method._wrapped        # decorator, unwrap it.
 
-    try:
-        lineno = inspect.getsourcelines(method)[1]
-    except IOError:
+    code = getattr(method, '__code__', None)
+    if code is not None:
+        return (method.__module__, code.co_firstlineno)  # <- EXIT!
+
+    # Objects with no code object (callable instances, partials, etc.)
+    # are located by the line where they are assigned in the class body.
+    module_name = test.__class__.__module__
+    lineno = _get_lineno(test.__class__, test._testMethodName)
+    if lineno is None:
         warnings.warn('Unable to sort {0}'.format(method))
         lineno = 0
-    return (method.__module__, lineno)
+    return (module_name, lineno)
 
 
 def _sort_tests(suite, key=_sort_key):
@@ -1,22 +1,34 @@
 """Validation and comparison handling."""
 import difflib
+import heapq
 import re
 import sys
+from array import array
+from math import isnan
 from ._compatibility import itertools
 from ._compatibility import collections
 from ._compatibility.builtins import callable
+from ._compatibility.builtins import zip
+from . import __version__
+from . import _cache
+from . import _jsonl
+from . import _profile
 from ._predicate import PredicateObject
 from ._predicate import get_predicate
 from ._utils import nonstringiter
 from ._utils import exhaustible
 from ._utils import iterpeek
 from ._utils import _safesort_key
+from ._utils import string_types
 from ._query.query import (
     BaseElement,
     DictItems,
     _is_collection_of_items,
+    _parse_columns,
     Query,
     Result,
+    Selector,
+    _sqlite_sortkey,
 )
 from .difference import (
     BaseDifference,
@@ -32,6 +44,7 @@ from .difference import (
 __all__ = [
     'validate',
     'valid',
+    'validate_schema',
     'ValidationError',
 ]
 
@@ -148,14 +161,19 @@ def _require_set(data, requirement_set):
     return None
 
 
-def _require_predicate(value, other, show_expected=False):
+def _require_predicate(value, other, show_expected=False, predicate=None):
+    # When given, *predicate* is *other* already compiled (it is
+    # used for matching but *other* is still used in differences).
+    if predicate is None:
+        predicate = other
+
     # Predicate comparisons use "==" to trigger __eq__(), not "!=".
-    if isinstance(other, PredicateObject):
-        matches = other == value
-    elif callable(other) and not isinstance(other, type):
-        matches = other(value)
+    if isinstance(predicate, PredicateObject):
+        matches = predicate == value
+    elif callable(predicate) and not isinstance(predicate, type):
+        matches = predicate(value)
     else:
-        matches = get_predicate(other) == value
+        matches = get_predicate(predicate) == value
 
     if not matches:
         return _make_difference(value, other, show_expected)
@@ -164,21 +182,28 @@ def _require_predicate(value, other, show_expected=False):
     return None
 
 
-def _require_predicate_expected(value, other):
-    return _require_predicate(value, other, show_expected=True)
+def _require_predicate_expected(value, other, predicate=None):
+    return _require_predicate(value, other, True, predicate)
+
+
+def _compile_predicate(requirement):
+    """Return *requirement* as a predicate object or function
+    (functions are used as-is).
+    """
+    if callable(requirement) and not isinstance(requirement, type):
+        return requirement
+    return get_predicate(requirement)
 
 
-def _require_predicate_from_iterable(data, other):
+def _require_predicate_from_iterable(data, other, predicate=None):
     if data is NOTFOUND:
         return Invalid(None)  # <- EXIT!
 
     if isinstance(data, tuple):
         data = [data]
 
-    if callable(other) and not isinstance(other, type):
-        predicate = other
-    else:
-        predicate = get_predicate(other)
+    if predicate is None:
+        predicate = _compile_predicate(other)
 
     diffs = (_require_predicate(value, predicate) for value in data)
     diffs = (x for x in diffs if x)
@@ -189,27 +214,39 @@ def _require_predicate_from_iterable(data, other):
     return None
 
 
-def _get_msg_and_func(data, requirement):
-    """
-    Each validation-function must accept an iterable of differences,
-    a single difference, or None.
+def _get_require_func(data, requirement):
+    """Return the validation-function for *data* and *requirement*
+    (without building a default message).
     """
     # Check for special cases--*requirement* types
     # that trigger a particular validation method.
     if not isinstance(requirement, (str, tuple)) and \
                isinstance(requirement, collections.Sequence):
-        return 'does not match sequence order', _require_sequence
+        return _require_sequence
 
     if isinstance(requirement, collections.Set):
-        return 'does not satisfy set membership', _require_set
+        return _require_set
 
     # If *requirement* did not match any of the special cases
     # above, then return an appropriate equality function.
-    if isinstance(data, (tuple, BaseElement)):    # <- Based on *data* not
-        equality_func = _require_predicate        #    *requirement* like
-    else:                                         #    the rest.
-        equality_func = _require_predicate_from_iterable
+    if isinstance(data, (tuple, BaseElement)):  # <- Based on *data* not
+        return _require_predicate               #    *requirement* like
+    return _require_predicate_from_iterable     #    the rest.
+
 
+def _get_msg_and_func(data, requirement):
+    """
+    Each validation-function must accept an iterable of differences,
+    a single difference, or None.
+    """
+    require_func = _get_require_func(data, requirement)
+    if require_func is _require_sequence:
+        return 'does not match sequence order', require_func
+
+    if require_func is _require_set:
+        return 'does not satisfy set membership', require_func
+
+    equality_func = require_func
     if isinstance(requirement, _regex_type):
         equality_msg = 'does not satisfy regex {0!r}'.format(requirement.pattern)
     elif callable(requirement) and not isinstance(requirement, type):
@@ -227,6 +264,44 @@ def _get_msg_and_func(data, requirement):
     return equality_msg, equality_func
 
 
+def _get_compiled_predicate(expected, predicates):
+    """Return the compiled predicate for a mapping requirement value.
+    Results are stored in the *predicates* dictionary by the id() of
+    *expected*--the value itself is stored too so that its id can't
+    be reused by another object while *predicates* is in use.
+    """
+    try:
+        value, predicate = predicates[id(expected)]
+        if value is expected:
+            return predicate  # <- EXIT!
+    except KeyError:
+        pass
+    predicate = _compile_predicate(expected)
+    predicates[id(expected)] = (expected, predicate)
+    return predicate
+
+
+def _get_mapping_item_diff(actual, expected, predicates=None):
+    """Return the difference (or list of differences) for a single
+    item of a mapping requirement or None if the item is valid.
+
+    When a *predicates* dictionary is given, it is used to compile
+    each requirement value only once (see _get_compiled_predicate()).
+    """
+    require_func = _get_require_func(actual, expected)
+    if require_func is _require_predicate:
+        require_func = _require_predicate_expected
+    if predicates is not None and (require_func is _require_predicate_expected
+            or require_func is _require_predicate_from_iterable):
+        predicate = _get_compiled_predicate(expected, predicates)
+        diff = require_func(actual, expected, predicate)
+    else:
+        diff = require_func(actual, expected)
+    if diff and not isinstance(diff, (tuple, BaseElement)):
+        diff = list(diff)
+    return diff
+
+
 def _apply_mapping_requirement(data, mapping):
     if isinstance(data, collections.Mapping):
         data_items = getattr(data, 'iteritems', data.items)()
@@ -236,31 +311,277 @@ def _apply_mapping_requirement(data, mapping):
         raise TypeError('data must be mapping or iterable of key-value items')
 
     data_keys = set()
+    predicates = dict()  # <- Compiled requirement values.
     for key, actual in data_items:
         data_keys.add(key)
         expected = mapping.get(key, NOTFOUND)
-
-        _, require_func = _get_msg_and_func(actual, expected)
-        if require_func is _require_predicate:
-            require_func = _require_predicate_expected
-        diff = require_func(actual, expected)
+        diff = _get_mapping_item_diff(actual, expected, predicates)
         if diff:
-            if not isinstance(diff, (tuple, BaseElement)):
-                diff = list(diff)
             yield key, diff
 
     mapping_items = getattr(mapping, 'iteritems', mapping.items)()
     for key, expected in mapping_items:
         if key not in data_keys:
-            _, require_func = _get_msg_and_func(NOTFOUND, expected)
-            if require_func is _require_predicate:
-                require_func = _require_predicate_expected
-            diff = require_func(NOTFOUND, expected)
-            if not isinstance(diff, (tuple, BaseElement)):
-                diff = list(diff)
+            diff = _get_mapping_item_diff(NOTFOUND, expected, predicates)
+            if diff:
+                yield key, diff
+
+
+def _is_sorted_mapping_query(obj):
+    """Return True if *obj* is a Query of key-value items selected
+    from a Selector (these are always ordered by key).
+    """
+    return (isinstance(obj, Query)
+            and isinstance(obj.source, Selector)
+            and isinstance(obj.args[0], collections.Mapping))
+
+
+def _get_key_width(query):
+    """Return the number of key columns used by a mapping *query*."""
+    key, _ = _parse_columns(query.args[0])
+    return None if isinstance(key, str) else len(key)
+
+
+def _merge_sorted_items(data_items, requirement_items):
+    """Merge two iterators of key-value items that are both ordered
+    by key (using SQLite's sort order) and generate 3-tuples of
+    *key*, *actual*, and *expected* values. When a key is only found
+    in one of the iterators, NOTFOUND is used for the other value.
+
+    Only the current item from each iterator is held in memory.
+    """
+    def sortkey(key):
+        if isinstance(key, tuple):
+            return tuple(_sqlite_sortkey(x) for x in key)
+        return _sqlite_sortkey(key)
+
+    data_items = iter(data_items)
+    requirement_items = iter(requirement_items)
+    data_item = next(data_items, None)
+    requirement_item = next(requirement_items, None)
+
+    while data_item is not None and requirement_item is not None:
+        data_key = sortkey(data_item[0])
+        requirement_key = sortkey(requirement_item[0])
+        if data_key < requirement_key:
+            yield data_item[0], data_item[1], NOTFOUND
+            data_item = next(data_items, None)
+        elif requirement_key < data_key:
+            yield requirement_item[0], NOTFOUND, requirement_item[1]
+            requirement_item = next(requirement_items, None)
+        else:
+            yield data_item[0], data_item[1], requirement_item[1]
+            data_item = next(data_items, None)
+            requirement_item = next(requirement_items, None)
+
+    while data_item is not None:
+        yield data_item[0], data_item[1], NOTFOUND
+        data_item = next(data_items, None)
+
+    while requirement_item is not None:
+        yield requirement_item[0], NOTFOUND, requirement_item[1]
+        requirement_item = next(requirement_items, None)
+
+
+def _apply_mapping_requirement_merge(data, requirement):
+    """Compare two mapping queries using a streaming merge join (see
+    _apply_mapping_requirement() for the equivalent behavior when
+    the requirement is a mapping).
+    """
+    def evaluate(obj):  # Requirement values are evaluated eagerly
+        if hasattr(obj, 'evaluation_type'):  # (same as Result.fetch()).
+            return obj.evaluation_type(obj)
+        return obj
+
+    merged = _merge_sorted_items(data.execute(), requirement.execute())
+    for key, actual, expected in merged:
+        diff = _get_mapping_item_diff(actual, evaluate(expected))
+        if diff:
             yield key, diff
 
 
+try:
+    _sql_number_types = (int, long, float)  # `long` removed in Python 3.0
+except NameError:
+    _sql_number_types = (int, float)
+
+
+def _is_sql_literal(value):
+    """Return True if *value* is stored by SQLite without changing
+    how it compares for equality (strings, integers, non-NaN floats,
+    and None). Booleans are excluded because they are stored as
+    integers.
+    """
+    if value is None or isinstance(value, string_types):
+        return True
+    if isinstance(value, bool) or not isinstance(value, _sql_number_types):
+        return False
+    if isinstance(value, float):
+        return not isnan(value)
+    return -2 ** 63 <= value < 2 ** 63  # <- Range of SQLite INTEGER.
+
+
+def _is_sql_row(value, width):
+    """Return True if *value* is a SQL literal (when *width* is
+    None) or a plain tuple of *width* SQL literals.
+    """
+    if width is None:
+        return _is_sql_literal(value)
+    return (value.__class__ is tuple
+            and len(value) == width
+            and all(_is_sql_literal(x) for x in value))
+
+
+def _get_sql_comparison(data, requirement):
+    """Return a 3-tuple of (selector, columns, where) if *data* and
+    *requirement* can be compared directly inside SQLite or return
+    None if they cannot.
+
+    This is possible when *data* is a Query of a Selector with no
+    additional query steps and the *requirement* is a set of plain
+    values or, for key-value selections, a mapping of plain values.
+    """
+    if not isinstance(data, Query) \
+            or not isinstance(data.source, Selector) \
+            or data._query_steps:
+        return None  # <- EXIT!
+
+    columns = data.args[0]
+    key, value = _parse_columns(columns)
+    inner = next(iter(value))
+    width = None if isinstance(inner, str) else len(inner)
+    if width is not None and inner.__class__ is not tuple:
+        return None  # <- EXIT! (Namedtuples and lists are not supported.)
+
+    if isinstance(requirement, collections.Set) and not key:
+        is_supported = all(_is_sql_row(x, width) for x in requirement)
+    elif isinstance(requirement, collections.Mapping) and key:
+        if width is not None or value.__class__ is not list:
+            return None  # <- EXIT!
+        key_width = None if isinstance(key, str) else len(key)
+        items = getattr(requirement, 'iteritems', requirement.items)()
+        is_supported = all(_is_sql_row(k, key_width) and _is_sql_literal(v)
+                           for k, v in items)
+    else:
+        return None  # <- EXIT!
+
+    if not is_supported:
+        return None
+    return data.source, columns, data.kwds
+
+
+def _require_set_sql(selector, columns, where, requirement_set):
+    """Compare a selection with *requirement_set* using SQL (see
+    _require_set() for the equivalent Python behavior).
+    """
+    if all(isinstance(x, tuple) for x in requirement_set):
+        records = requirement_set
+    else:
+        records = ((x,) for x in requirement_set)
+    missing_elements, extra_elements = \
+        selector._select_set_difference(columns, records, **where)
+
+    if missing_elements:  # Use original objects, not their SQLite copies.
+        missing_elements = set(missing_elements)
+        missing_elements = [x for x in requirement_set if x in missing_elements]
+
+    if extra_elements or missing_elements:
+        missing = (Missing(x) for x in missing_elements)
+        extra = (Extra(x) for x in extra_elements)
+        return itertools.chain(missing, extra)
+    return None
+
+
+def _apply_mapping_requirement_sql(selector, columns, where, mapping):
+    """Compare a key-value selection with *mapping* using SQL (see
+    _apply_mapping_requirement() for the equivalent Python behavior).
+    Only those rows whose values do not match are returned by the
+    database, so the differences are built from these rows alone.
+    """
+    key, _ = _parse_columns(columns)
+    if isinstance(key, str):
+        make_key = lambda k: (k,)
+    else:
+        make_key = tuple
+    mapping_items = getattr(mapping, 'iteritems', mapping.items)()
+    items = ((make_key(k), v) for k, v in mapping_items)
+    mismatched, missing_keys = \
+        selector._select_mapping_mismatches(columns, items, **where)
+
+    predicates = dict()  # <- Compiled requirement values.
+    for key, values in mismatched:
+        expected = mapping.get(key, NOTFOUND)
+        predicate = _get_compiled_predicate(expected, predicates)
+        diff = _require_predicate_from_iterable(values, expected, predicate)
+        if diff:
+            yield key, list(diff)
+
+    if missing_keys:  # Use original keys, not their SQLite copies.
+        missing_keys = set(missing_keys)
+        for key, expected in getattr(mapping, 'iteritems', mapping.items)():
+            if key in missing_keys:
+                yield key, _require_predicate_expected(NOTFOUND, expected)
+
+
+def _is_incremental_query(data, requirement):
+    """Return True if *data* is a Query of non-mapping values from a
+    Selector (with no additional query steps) and *requirement* is
+    checked value-by-value. The differences for such queries can be
+    computed separately for any part of the data.
+    """
+    if not isinstance(data, Query) \
+            or not isinstance(data.source, Selector) \
+            or data._query_steps \
+            or isinstance(data.args[0], collections.Mapping):
+        return False  # <- EXIT!
+    _, require_func = _get_msg_and_func([], requirement)  # <- Any list
+    return require_func is _require_predicate_from_iterable     #    of values.
+
+
+def _require_predicate_incremental(data, requirement, cache_path):
+    """Check values from a Selector *data* query against a predicate
+    *requirement* reusing results saved in the file *cache_path*.
+
+    Values are split into content-defined chunks (see _cache.iterchunks)
+    and the differences for each chunk are stored along with its
+    digest. On later runs, chunks that have not changed use their
+    stored differences and only changed or new chunks are checked.
+    The cache entry is keyed by a fingerprint of the selection, the
+    requirement (including the globals and helper functions it uses),
+    and the datatest version, so changing any of them invalidates the
+    stored results. If the requirement can't be fingerprinted reliably,
+    all values are checked and nothing is cached.
+    """
+    if callable(requirement) and not isinstance(requirement, type):
+        predicate = requirement
+    else:
+        predicate = get_predicate(requirement)
+
+    key = _cache.fingerprint((
+        __version__,
+        repr(data.source),
+        data.args,
+        data.kwds,
+        requirement,
+    ))
+    if key is None:
+        diffs = (_require_predicate(value, predicate) for value in data.execute())
+        return [x for x in diffs if x] or None  # <- EXIT! (can't cache)
+
+    cache = _cache.ChunkCache(cache_path, key)
+
+    diffs = []
+    for digest, chunk in _cache.iterchunks(data.execute()):
+        chunk_diffs = cache.get(digest)
+        if chunk_diffs is None:
+            chunk_diffs = (_require_predicate(value, predicate) for value in chunk)
+            chunk_diffs = [x for x in chunk_diffs if x]
+        cache.set(digest, chunk_diffs)
+        diffs.extend(chunk_diffs)
+    cache.save()
+    return diffs or None
+
+
 def _normalize_mapping_result(result):
     """Accepts an iterator of dictionary items and returns a DictItems
     object or None.
@@ -331,17 +652,56 @@ def _normalize_requirement(requirement):
     return requirement
 
 
-def _get_invalid_info(data, requirement):
+def _get_invalid_info(data, requirement, cache=None):
     """If data is invalid, return a 2-tuple containing a default-message
     string and an iterable of differences. If data is not invalid,
     return None.
+
+    If *cache* is a file path, Selector queries checked against a
+    predicate are validated incrementally (see
+    _require_predicate_incremental() for details).
     """
+    # When data and requirement are both key-value queries from
+    # Selectors, they are already sorted by key and can be compared
+    # with a merge join (without building a dict for either side).
+    if _is_sorted_mapping_query(data) \
+            and _is_sorted_mapping_query(requirement) \
+            and _get_key_width(data) == _get_key_width(requirement):
+        default_msg = 'does not satisfy mapping requirement'
+        diffs = _apply_mapping_requirement_merge(data, requirement)
+        diffs = _normalize_mapping_result(diffs)
+        if not diffs:
+            return None
+        return (default_msg, diffs)
+
+    requirement = _normalize_requirement(requirement)
+
+    if cache and _is_incremental_query(data, requirement):
+        default_msg, _ = _get_msg_and_func([], requirement)
+        diffs = _require_predicate_incremental(data, requirement, cache)
+        if not diffs:
+            return None
+        return (default_msg, diffs)
+
+    # When possible, compare Selector queries inside SQLite so that
+    # only the differences are loaded into Python.
+    sql_comparison = _get_sql_comparison(data, requirement)
+    if sql_comparison:
+        if isinstance(requirement, collections.Mapping):
+            default_msg = 'does not satisfy mapping requirement'
+            diffs = _apply_mapping_requirement_sql(*sql_comparison + (requirement,))
+            diffs = _normalize_mapping_result(diffs)
+        else:
+            default_msg = 'does not satisfy set membership'
+            diffs = _require_set_sql(*sql_comparison + (requirement,))
+        if not diffs:
+            return None
+        return (default_msg, diffs)
+
     data = _normalize_data(data)
     if isinstance(data, collections.Mapping):
         data = getattr(data, 'iteritems', data.items)()
 
-    requirement = _normalize_requirement(requirement)
-
     # Get default-message and differences (if any exist).
     if isinstance(requirement, collections.Mapping):
         default_msg = 'does not satisfy mapping requirement'
@@ -365,25 +725,392 @@ def _get_invalid_info(data, requirement):
     return (default_msg, diffs)
 
 
+class _SchemaColumn(object):
+    """Collect differences for one *requirement* of a schema, one
+    value at a time (see _get_schema_invalid_info() for details).
+    """
+    def __init__(self, requirement):
+        if isinstance(requirement, collections.Mapping):
+            msg = 'schema requirements can not be mappings, got {0!r}'
+            raise TypeError(msg.format(requirement))
+
+        if isinstance(requirement, collections.Set):
+            self._matching = set()
+            self._extra = set()
+            self.add = self._add_set_element
+        elif not isinstance(requirement, string_types + (tuple,)) and \
+                isinstance(requirement, collections.Sequence):
+            self._values = []
+            self.add = self._values.append
+        else:
+            if callable(requirement) and not isinstance(requirement, type):
+                self._predicate = requirement
+            else:
+                self._predicate = get_predicate(requirement)
+            self._diffs = []
+            self.add = self._add_predicate_value
+        self.requirement = requirement
+
+    def _add_set_element(self, element):
+        if element in self.requirement:
+            self._matching.add(element)
+        else:
+            self._extra.add(element)
+
+    def _add_predicate_value(self, value):
+        diff = _require_predicate(value, self._predicate)
+        if diff:
+            self._diffs.append(diff)
+
+    def differences(self):
+        """Return a list of differences or an empty list if all
+        values were valid. For sequence requirements, return a
+        dictionary of difference lists keyed by slice indexes
+        (see _require_sequence()) or an empty dictionary.
+        """
+        if hasattr(self, '_diffs'):
+            return self._diffs
+
+        if hasattr(self, '_values'):
+            return _require_sequence(self._values, self.requirement) or {}
+
+        missing = self.requirement.difference(self._matching)
+        diffs = [Missing(x) for x in missing]
+        diffs.extend(Extra(x) for x in self._extra)
+        return diffs
+
+
+def _get_schema_invalid_info(data, schema):
+    """Check *data* against a *schema* mapping of field names to
+    requirements in a single pass. If data is invalid, return a
+    2-tuple containing a default-message string and a dictionary of
+    differences keyed by field name. If data is valid, return None.
+
+    A key can also be a tuple of field names, in which case its
+    requirement is checked against tuples of values from each row.
+
+    Differences for sequence requirements are keyed by 2-tuples of
+    the schema key and the slice indexes of the mismatched values.
+    """
+    if not isinstance(schema, collections.Mapping):
+        msg = 'schema must be a mapping, got {0!r}'
+        raise TypeError(msg.format(schema.__class__.__name__))
+
+    fields = []
+    for key in schema:
+        for field in ([key] if isinstance(key, string_types) else key):
+            if field not in fields:
+                fields.append(field)
+
+    if isinstance(data, Selector):
+        rows = data([tuple(fields)]).execute()  # <- One query for all fields.
+    else:
+        rows = (tuple(row[x] for x in fields) for row in data)
+
+    # Build a getter and a collector for each key of the schema.
+    checks = []
+    for key, requirement in getattr(schema, 'iteritems', schema.items)():
+        if isinstance(key, string_types):
+            index = fields.index(key)
+            getter = lambda row, index=index: row[index]
+        else:
+            indexes = tuple(fields.index(x) for x in key)
+            getter = lambda row, indexes=indexes: tuple(row[i] for i in indexes)
+        checks.append((key, getter, _SchemaColumn(requirement)))
+
+    for row in rows:
+        for _, getter, column in checks:
+            column.add(getter(row))
+
+    differences = {}
+    for key, _, column in checks:
+        diffs = column.differences()
+        if isinstance(diffs, dict):
+            for index in sorted(diffs):  # <- Keep sequence positions.
+                differences[(key, index)] = diffs[index]
+        elif diffs:
+            differences[key] = diffs
+
+    if not differences:
+        return None
+    return ('does not satisfy schema requirement', differences)
+
+
+def _iter_sorted(iterable, key):
+    """Generate items from *iterable* in the same order as
+    ``sorted(iterable, key=key)`` but without sorting everything
+    up front. Items are arranged in a heap and popped as needed
+    so that taking the first *k* items costs O(n + k log n).
+    """
+    heap = [(key(x), i, x) for i, x in enumerate(iterable)]  # Index breaks
+    heapq.heapify(heap)                                       # ties (keeps
+    while heap:                                               # sort stable).
+        yield heapq.heappop(heap)[2]
+
+
+class _DifferenceStore(collections.Sequence):
+    """A compact, read-only sequence of differences.
+
+    Rather than holding a full object for every difference, the
+    store keeps a difference-kind code (in a typed array) plus the
+    difference arguments in two parallel lists. Difference objects
+    are rebuilt when they are accessed. Objects that are not one of
+    the basic difference types are stored as-is.
+    """
+    _OBJECT, _MISSING, _EXTRA, _INVALID, _DEVIATION = range(5)
+
+    def __init__(self, iterable):
+        kinds = array('B')
+        first_args = []
+        second_args = []
+        for diff in iterable:
+            cls = diff.__class__
+            if cls is Missing:
+                kinds.append(self._MISSING)
+                first_args.append(diff._args[0])
+                second_args.append(None)
+            elif cls is Extra:
+                kinds.append(self._EXTRA)
+                first_args.append(diff._args[0])
+                second_args.append(None)
+            elif cls is Invalid:
+                kinds.append(self._INVALID)
+                first_args.append(diff.invalid)
+                second_args.append(diff.expected)
+            elif cls is Deviation:
+                kinds.append(self._DEVIATION)
+                first_args.append(diff.deviation)
+                second_args.append(diff.expected)
+            else:
+                kinds.append(self._OBJECT)
+                first_args.append(diff)
+                second_args.append(None)
+        self._kinds = kinds
+        self._first_args = first_args
+        self._second_args = second_args
+
+    def _compress(self, selectors):
+        """Return a new store with only those differences whose
+        corresponding *selectors* value is true.
+        """
+        selectors = list(selectors)
+        select = lambda column: [x for x, y in zip(column, selectors) if y]
+        new_store = self.__class__(())
+        new_store._kinds = array('B', select(self._kinds))
+        new_store._first_args = select(self._first_args)
+        new_store._second_args = select(self._second_args)
+        return new_store
+
+    def _make(self, kind, first, second):
+        if kind == self._MISSING:
+            return Missing(first)
+        if kind == self._EXTRA:
+            return Extra(first)
+        if kind == self._INVALID:
+            return Invalid(first, second)
+        if kind == self._DEVIATION:
+            return Deviation(first, second)
+        return first
+
+    def __len__(self):
+        return len(self._kinds)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return self._make(self._kinds[index],
+                          self._first_args[index],
+                          self._second_args[index])
+
+    def __iter__(self):
+        make = self._make
+        columns = zip(self._kinds, self._first_args, self._second_args)
+        for kind, first, second in columns:
+            yield make(kind, first, second)
+
+    def __eq__(self, other):
+        if isinstance(other, _DifferenceStore):
+            return (self._kinds == other._kinds
+                    and self._first_args == other._first_args
+                    and self._second_args == other._second_args)
+        if isinstance(other, (list, tuple)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __ne__(self, other):  # <- For Python 2.x compatibility.
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    __hash__ = None  # <- Unhashable like a list.
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+def _deserialize_items(items, singles=None):
+    """Group serialized (key, difference) items into a dictionary.
+    Groups with a single difference use the difference itself as
+    the value, otherwise the value is a list of differences.
+
+    When a *singles* set is given, only the groups whose keys are
+    in the set use the difference itself--all others are lists.
+    """
+    def make_key(item):
+        return item[0]
+
+    grouped = itertools.groupby(items, key=make_key)
+
+    def make_value(key, group):
+        value = [item[1] for item in group]
+        if singles is None:
+            is_single = len(value) == 1
+        else:
+            is_single = key in singles
+        if is_single:
+            return value.pop()
+        return value
+
+    return dict((key, make_value(key, group)) for key, group in grouped)
+
+
+class _SerializedDifferences(object):
+    """Compact storage for serialized (key, difference) items (as
+    produced when allowances filter differences). Differences are
+    kept in a _DifferenceStore and keys (for mappings) are kept in a
+    parallel list. Items can be iterated without loading them into
+    a full differences container---see load().
+    """
+    _singles = None  # <- Set of keys whose values are not lists.
+
+    def __init__(self, items, is_mapping):
+        self.is_mapping = is_mapping
+        self._keys = keys = [] if is_mapping else None
+
+        def values():
+            for key, value in items:
+                if keys is not None:
+                    keys.append(key)
+                yield value
+        self._store = _DifferenceStore(values())
+
+    @classmethod
+    def _from_store(cls, store, keys):
+        """Make new instance from a _DifferenceStore and a parallel
+        list of *keys* (or None if the differences are not mapped).
+        """
+        new_instance = cls((), keys is not None)
+        new_instance._keys = keys
+        new_instance._store = store
+        return new_instance
+
+    @classmethod
+    def _from_mapping_items(cls, items):
+        """Make new instance from the (key, value) *items* of a mapping
+        of differences. Each value is a single difference or a list of
+        differences and each key must be unique. The keys of single
+        differences are kept so that load() returns the same mapping.
+        """
+        singles = set()
+
+        def serialized_items():
+            for key, value in items:
+                if isinstance(value, (BaseElement, Exception)):
+                    singles.add(key)
+                    yield (key, value)
+                else:
+                    for diff in value:
+                        yield (key, diff)
+
+        new_instance = cls(serialized_items(), True)
+        new_instance._singles = singles
+        return new_instance
+
+    def __len__(self):
+        return len(self._store)
+
+    def __iter__(self):
+        if self._keys is None:
+            return ((None, value) for value in self._store)
+        return zip(self._keys, self._store)
+
+    def load(self):
+        """Return a differences container for ValidationError."""
+        if self.is_mapping:
+            return _deserialize_items(self, self._singles)
+        return self._store
+
+
+class _FileDifferences(_SerializedDifferences):
+    """Serialized differences that are read, as needed, from a file
+    written with _jsonl.dump() (see ValidationError.load()). Each
+    pass over the differences reads the file again.
+    """
+    _store = None  # <- No columnar store, differences are streamed.
+    _keys = None
+
+    def __init__(self, path, is_mapping):
+        self.path = path
+        self.is_mapping = is_mapping
+
+    def _iter_file(self):
+        return _jsonl._iter_differences(self.path, self.is_mapping)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __bool__(self):
+        return next(iter(self), None) is not None
+
+    __nonzero__ = __bool__  # <- For Python 2.x compatibility.
+
+    def __iter__(self):
+        if not self.is_mapping:
+            return ((None, diff) for diff in self._iter_file())
+        return ((key, diff) for key, value in self._iter_file()
+                for diff in (value if isinstance(value, list) else [value]))
+
+    def load(self):
+        """Return a differences container for ValidationError."""
+        if self.is_mapping:
+            return dict(self._iter_file())
+        return _DifferenceStore(self._iter_file())
+
+
 class ValidationError(AssertionError):
     """This exception is raised when data validation fails."""
 
     __module__ = 'datatest'
 
     def __init__(self, differences, description=None):
-        if isinstance(differences, BaseDifference):
+        self._pending = None
+        self._owned = True  # <- False when others can hold the container.
+        if isinstance(differences, _SerializedDifferences):
+            self._pending = differences  # <- Loaded when first needed.
+        elif isinstance(differences, BaseDifference):
             differences = [differences]
         elif not nonstringiter(differences):
             msg = 'expected an iterable of differences, got {0!r}'
             raise TypeError(msg.format(differences.__class__.__name__))
-
-        # Normalize *differences* argument.
-        if _is_collection_of_items(differences):
-            differences = dict(differences)
+        elif not (_is_collection_of_items(differences)
+                  or exhaustible(differences)):
+            self._owned = False  # <- Given container is used as-is.
+
+        # Normalize *differences* argument. Exhaustible iterators
+        # and mapping items are loaded into a compact store (they can
+        # contain a very large number of differences). A store is only
+        # converted into a list--or, for mapping items, a dictionary--
+        # when the differences are needed.
+        if self._pending is not None:
+            differences = None
+        elif _is_collection_of_items(differences):
+            self._pending = _SerializedDifferences._from_mapping_items(differences)
+            differences = None
         elif exhaustible(differences):
-            differences = list(differences)
+            differences = _DifferenceStore(differences)
 
-        if not differences:
+        if not (differences or self._pending):
             raise ValueError('differences container must not be empty')
 
         # Initialize properties.
@@ -392,12 +1119,31 @@ class ValidationError(AssertionError):
         self._should_truncate = None
         self._truncation_notice = None
 
+    def _load_pending(self):
+        if self._pending is not None:
+            self._differences = self._pending.load()
+            self._pending = None
+
+    def _get_differences(self):
+        """Return the differences without converting a compact store
+        into a list (used internally to format, dump, and re-raise
+        errors).
+        """
+        self._load_pending()
+        return self._differences
+
     @property
     def differences(self):
         """A collection of "difference" objects to describe elements
         in the data under test that do not satisfy the requirement.
         """
-        return self._differences
+        differences = self._get_differences()
+        if isinstance(differences, _DifferenceStore):
+            differences = list(differences)  # <- Keep public type a list.
+            self._differences = differences
+        self._owned = False  # <- Can be changed in place from now on.
+        self._clear_str_cache()
+        return differences
 
     @property
     def description(self):
@@ -407,13 +1153,92 @@ class ValidationError(AssertionError):
     @property
     def args(self):
         """The tuple of arguments given to the exception constructor."""
-        return (self._differences, self._description)
+        return (self.differences, self._description)
+
+    def dump(self, path):
+        """Write the differences and description to the file at
+        *path* so they can be archived or compared between runs.
+
+        The file uses JSON Lines (one line per difference or, for
+        a mapping of differences, one line per key) and is written
+        incrementally. If *path* ends with ".gz", the file is gzip
+        compressed::
+
+            try:
+                datatest.validate(data, requirement)
+            except datatest.ValidationError as err:
+                err.dump('failures.jsonl.gz')
+                raise
+
+        Values that cannot be represented in JSON (like tuples,
+        sets, dates and decimals) are tagged with their types so
+        that they can be restored. Other objects are saved using
+        their repr() strings.
+        """
+        _jsonl.dump(path, self._get_differences(), self._description)
+
+    @classmethod
+    def load(cls, path):
+        """Return a new ValidationError using the differences and
+        description from a file created with :meth:`dump`::
+
+            err = datatest.ValidationError.load('failures.jsonl.gz')
+
+        Only the header is read right away. Differences are read
+        from the file when they are needed (allowances check them
+        as they are read) so the file should not be changed until
+        the error has been handled.
+
+        Differences of types other than the basic ones (Missing,
+        Extra, Invalid and Deviation) are only loaded if their
+        module has already been imported. Loading a file never
+        imports modules, so files from untrusted sources can't run
+        code. Other type names raise a ValueError.
+        """
+        _, description, is_mapping = _jsonl.load(path)  # <- Reads header.
+        return cls(_FileDifferences(path, is_mapping), description)
+
+    def _clear_str_cache(self):
+        """Release the rendered string cached by __str__()."""
+        self._str_cache = None
 
     def __str__(self):
+        # Rendering can be expensive for large errors, so the output
+        # is cached. The cache is only used while no other code can
+        # hold the differences container (which could be changed in
+        # place) and while the description and truncation settings
+        # remain the same.
+        differences = self._get_differences()
+        state = (len(differences), self._description,
+                 self._should_truncate, self._truncation_notice)
+        cached = getattr(self, '_str_cache', None)
+        if cached and cached[0] is differences and cached[1] == state \
+                and self._owned:
+            return cached[2]  # <- EXIT!
+
+        profile = getattr(self, '_profile', None)
+        if profile is not None and _profile.recorder is not None:
+            start = _profile.timer()
+            output = self._format()
+            profile.format += _profile.timer() - start
+        else:
+            output = self._format()
+        if self._owned:
+            self._str_cache = (differences, state, output)
+        return output
+
+    def _format(self):
+        # When output will be truncated, a heap is used to generate
+        # differences in sorted order without sorting all of them.
+        if self._should_truncate:
+            ordered = _iter_sorted
+        else:
+            ordered = lambda iterable, key: iter(sorted(iterable, key=key))
+
         # Prepare a format-differences callable.
         if isinstance(self._differences, dict):
             begin, end = '{', '}'
-            all_keys = sorted(self._differences.keys(), key=_safesort_key)
+            all_keys = ordered(self._differences.keys(), key=_safesort_key)
             def sorted_value(key):
                 value = self._differences[key]
                 if nonstringiter(value):
@@ -425,7 +1250,7 @@ class ValidationError(AssertionError):
         else:
             begin, end = '[', ']'
             sort_args = lambda diff: _safesort_key(diff.args)
-            iterator = iter(sorted(self._differences, key=sort_args))
+            iterator = ordered(self._differences, key=sort_args)
             format_diff = lambda x: '    {0!r},'.format(x)
 
         # Format differences as a list of strings and get line count.
@@ -438,7 +1263,7 @@ class ValidationError(AssertionError):
                 diff_string = format_diff(x)    # memory (in case the iter of
                 char_count += len(diff_string)  # diffs is extremely long).
                 if self._should_truncate(line_count, char_count):
-                    line_count += sum(1 for x in iterator)
+                    line_count = len(self._differences)  # <- One line each.
                     end = '    ...'
                     if self._truncation_notice:
                         end += '\n\n{0}'.format(self._truncation_notice)
@@ -471,12 +1296,136 @@ class ValidationError(AssertionError):
 
     def __repr__(self):
         cls_name = self.__class__.__name__
+        differences = self._get_differences()
         if self.description:
-            return '{0}({1!r}, {2!r})'.format(cls_name, self.differences, self.description)
-        return '{0}({1!r})'.format(cls_name, self.differences)
+            return '{0}({1!r}, {2!r})'.format(cls_name, differences, self.description)
+        return '{0}({1!r})'.format(cls_name, differences)
+
+
+def _new_error(differences, description):
+    """Return a ValidationError for a *differences* container created
+    by datatest itself. Since no other code holds the container, the
+    error's rendered string can be cached (see ValidationError.__str__).
+    """
+    err = ValidationError(differences, description)
+    err._owned = True
+    return err
+
+
+def _get_allowance_error(allowance, differences, description):
+    """Return a ValidationError for the *differences* not accepted by
+    *allowance* or None if all are accepted. Differences are checked
+    as they are generated (see BaseAllowance._get_error() for details).
+    """
+    try:
+        get_error = allowance._get_error
+    except AttributeError:
+        msg = 'allow must be an allowance, got {0!r}'
+        raise TypeError(msg.format(allowance.__class__.__name__))
+    return get_error(differences, description)
+
+
+def _get_validation_error(data, requirement, msg=None, cache=None, allow=None):
+    """Return a ValidationError if *data* does not satisfy *requirement*
+    (after applying *allow*, if given) or None if data is valid. See
+    validate() for details.
+    """
+    recorder = _profile.recorder
+    if recorder is not None:
+        return _get_profiled_error(recorder, data, requirement, msg, cache, allow)
+
+    invalid_info = _get_invalid_info(data, requirement, cache)
+    if allow is not None:
+        default_msg, differences = invalid_info or (None, [])
+        return _get_allowance_error(allow, differences, msg or default_msg)
+
+    if invalid_info:
+        default_msg, differences = invalid_info  # Unpack values.
+        return _new_error(differences, msg or default_msg)
+    return None
+
+
+def _time_differences(differences, elapsed):
+    """Return *differences* so that the time spent generating them,
+    if they are generated lazily, is added to elapsed[0].
+    """
+    if isinstance(differences, DictItems):
+        wrap = DictItems
+    elif isinstance(differences, collections.Iterator):
+        wrap = iter
+    else:
+        return differences  # <- EXIT! (already evaluated)
+
+    timer = _profile.timer
 
+    def generate(iterator):
+        while True:
+            start = timer()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                elapsed[0] += timer() - start
+            yield item
 
-def validate(data, requirement, msg=None):
+    return wrap(generate(differences))
+
+
+def _count_differences(differences):
+    """Return the number of differences in a ValidationError's
+    *differences* (counting each difference in a mapping's lists).
+    """
+    if isinstance(differences, collections.Mapping):
+        values = getattr(differences, 'itervalues', differences.values)()
+        return sum(1 if isinstance(x, (BaseElement, Exception)) else len(x)
+                   for x in values)
+    return len(differences)
+
+
+def _get_profiled_error(recorder, data, requirement, msg, cache, allow):
+    """Same as _get_validation_error() but records the time spent in
+    each step with the given profile *recorder*.
+    """
+    record = recorder.start_validation()
+    try:
+        start = _profile.timer()
+        invalid_info = _get_invalid_info(data, requirement, cache)
+        default_msg, differences = invalid_info or (None, [])
+        if allow is not None:
+            # Allowances consume differences as they are generated, so
+            # the time spent generating them is moved from the allowance
+            # step to the comparison step.
+            generating = [0.0]
+            differences = _time_differences(differences, generating)
+            compare_end = _profile.timer()
+            generating[0] = 0.0  # <- Reset, DictItems peeks first item.
+            err = _get_allowance_error(allow, differences, msg or default_msg)
+            compare_end += generating[0]
+            record.allowance = max(record.allowance - generating[0], 0.0)
+        else:
+            err = _new_error(differences, msg or default_msg) \
+                  if invalid_info else None
+            compare_end = _profile.timer()
+
+        # Query time is recorded as it happens, so it's subtracted
+        # from the time measured for the comparison step.
+        record.compare = max(compare_end - start - record.query, 0.0)
+        record.description = msg or default_msg
+        if isinstance(data, collections.Sized) \
+                and not isinstance(data, string_types):
+            record.items = len(data)  # <- Otherwise, counts rows read.
+        if err is not None:
+            pending = err._pending  # <- Count without loading.
+            record.differences = len(pending) if pending is not None \
+                                 else _count_differences(err._differences)
+            err._profile = record
+        return err
+    finally:
+        recorder.stop_validation(record)
+
+
+def validate(data, requirement, msg=None, cache=None, allow=None):
     """Raise a :exc:`ValidationError` if *data* does not satisfy
     *requirement* or pass without error if data is valid.
 
@@ -529,15 +1478,41 @@ def validate(data, requirement, msg=None):
         requirement = ['A', 'B', 'C', ...]  # <- Sequence of predicates
 
         datatest.validate(data, requirement)
+
+    **Incremental Validation:** When *cache* is given as a file path,
+    a :class:`Query` of values from a :class:`Selector` that is
+    checked against a single predicate is validated incrementally.
+    The differences for each chunk of data are saved to the *cache*
+    file and later runs only check those chunks that have changed::
+
+        select = datatest.Selector('mydata.csv')
+
+        datatest.validate(select('A'), iseven, cache='.datatest_cache')
+
+    Cached results are invalidated when the selection or the
+    predicate changes (functions are identified by their code,
+    default values, and closures). Changes to other functions called
+    by a predicate are not detected---delete the cache file to force
+    a full validation. Other data and requirements are always
+    validated normally.
+
+    **Allowances:** When *allow* is given as an allowance, the
+    differences are checked against it as they are generated and
+    only those that are not allowed are kept. The result is the same
+    as using the allowance as a context manager but accepted
+    differences are never stored::
+
+        allowance = datatest.allowed.missing()
+
+        datatest.validate(data, requirement, allow=allowance)
     """
     # Setup traceback-hiding for pytest integration.
     __tracebackhide__ = lambda excinfo: excinfo.errisinstance(ValidationError)
 
     # Perform validation.
-    invalid_info = _get_invalid_info(data, requirement)
-    if invalid_info:
-        default_msg, differences = invalid_info  # Unpack values.
-        raise ValidationError(differences, msg or default_msg)
+    err = _get_validation_error(data, requirement, msg, cache, allow)
+    if err is not None:
+        raise err
 
     # Return Value: This function should not return an explicit value.
     # If users need to test for True/False, they should use the valid()
@@ -553,3 +1528,50 @@ def valid(data, requirement):
     if _get_invalid_info(data, requirement):
         return False
     return True
+
+
+def validate_schema(data, schema, msg=None):
+    """Raise a :exc:`ValidationError` if any field in *data* does
+    not satisfy its requirement in *schema* or pass without error
+    if data is valid.
+
+    The *data* can be a :class:`Selector` or an iterable of
+    dictionary rows (like :py:class:`csv.DictReader`). The *schema*
+    is a mapping of field names to requirements---each requirement
+    is handled the same way as it is by :func:`validate`. All fields
+    are checked in a single pass over the data::
+
+        select = datatest.Selector('example.csv')
+
+        schema = {
+            'A': {'x', 'y', 'z'},
+            'B': re.compile('^[0-9]+$'),
+            'C': str,
+        }
+
+        datatest.validate_schema(select, schema)
+
+    This is equivalent to calling :func:`validate` once for each
+    field but the data is only read once. Differences are collected
+    in a single :exc:`ValidationError` and grouped by field name.
+
+    A schema key can also be a tuple of field names to check
+    requirements that depend on several values from the same row::
+
+        def valid_range(row):
+            low, high = row
+            return float(low) <= float(high)
+
+        schema = {('low', 'high'): valid_range}
+
+    Differences for a sequence requirement are grouped by the field
+    name and the slice indexes of the values that don't match (e.g.,
+    ``('A', (1, 2))``).
+    """
+    # Setup traceback-hiding for pytest integration.
+    __tracebackhide__ = lambda excinfo: excinfo.errisinstance(ValidationError)
+
+    invalid_info = _get_schema_invalid_info(data, schema)
+    if invalid_info:
+        default_msg, differences = invalid_info  # Unpack values.
+        raise _new_error(differences, msg or default_msg)
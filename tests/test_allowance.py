@@ -1,11 +1,15 @@
 # -*- coding: utf-8 -*-
+import re
 import inspect
 import sys
+from math import isnan
 from . import _unittest as unittest
+from .common import MkdtempTestCase
 from datatest._compatibility.builtins import *
 from datatest._compatibility import collections
 from datatest._compatibility import contextlib
 from datatest._compatibility import itertools
+from datatest._compatibility.decimal import Decimal
 
 from datatest.allowance import BaseAllowance
 from datatest.allowance import CombinedAllowance
@@ -19,9 +23,14 @@ from datatest.allowance import allowed_args
 from datatest.allowance import allowed_deviation
 from datatest.allowance import allowed_percent
 from datatest.allowance import allowed_specific
+from datatest.allowance import allowed_baseline
 from datatest.allowance import allowed_limit
+from datatest.allowance import _next_float
+from datatest.allowance import _get_float_bounds
 
 from datatest.validation import ValidationError
+from datatest.validation import validate
+from datatest.validation import _DifferenceStore
 from datatest.difference import Missing
 from datatest.difference import Extra
 from datatest.difference import Invalid
@@ -144,6 +153,48 @@ class TestBaseAllowance(unittest.TestCase):
         self.assertEqual(description, 'allowance message')
 
 
+    def test_exit_context_nested(self):
+        """Nested allowances should pass differences along without
+        loading them into a full container at each level.
+        """
+        differences = {
+            'foo': [Missing('A'), Extra('B')],
+            'bar': Missing('C'),
+            'baz': [Extra('D'), Extra('E')],
+        }
+        with self.assertRaises(ValidationError) as cm:
+            with allowed_extra():
+                with allowed_specific({'foo': Missing('A')}):
+                    raise ValidationError(differences)
+
+        error = cm.exception
+        self.assertIsNotNone(error._pending, msg='not loaded until inspected')
+        self.assertEqual(error.differences, {'bar': Missing('C')})
+
+        with self.assertRaises(ValidationError) as cm:
+            with allowed_extra():
+                with allowed_missing():
+                    raise ValidationError([Missing('A'), Extra('B'), Invalid('C')])
+        self.assertEqual(cm.exception.differences, [Invalid('C')])
+
+
+class TestAllowLoadedError(MkdtempTestCase):
+    def test_list(self):
+        ValidationError([Missing('A'), Extra('B')]).dump('diffs.jsonl')
+        with self.assertRaises(ValidationError) as cm:
+            with allowed_missing():
+                raise ValidationError.load('diffs.jsonl')
+        self.assertEqual(cm.exception.differences, [Extra('B')])
+
+    def test_mapping(self):
+        differences = {'foo': [Missing('A'), Extra('B')], 'bar': Missing('C')}
+        ValidationError(differences).dump('diffs.jsonl')
+        with self.assertRaises(ValidationError) as cm:
+            with allowed_missing():
+                raise ValidationError.load('diffs.jsonl')
+        self.assertEqual(cm.exception.differences, {'foo': Extra('B')})
+
+
 class TestAllowanceProtocol(unittest.TestCase):
     def setUp(self):
         class LoggingAllowance(MinimalAllowance):
@@ -475,6 +526,106 @@ class TestAllowedDeviation(unittest.TestCase):
                 raise ValidationError(Deviation(float('nan'), 0))
 
 
+class TestDeviationFastPaths(unittest.TestCase):
+    def test_next_float(self):
+        self.assertGreater(_next_float(1.0, up=True), 1.0)
+        self.assertLess(_next_float(1.0, up=False), 1.0)
+        self.assertGreater(_next_float(-1.0, up=True), -1.0)
+        self.assertLess(_next_float(-1.0, up=False), -1.0)
+        self.assertEqual(_next_float(0.0, up=True), 5e-324)
+        self.assertEqual(_next_float(float('inf'), up=True), float('inf'))
+        self.assertEqual(_next_float(_next_float(2.5, True), False), 2.5)
+
+    def test_float_bounds(self):
+        lower, upper = Decimal('-0.1'), Decimal('0.1')
+        float_lower, float_upper = _get_float_bounds(lower, upper)
+        self.assertLessEqual(lower, float_lower)  # Rounded inward.
+        self.assertLessEqual(float_upper, upper)
+        self.assertGreater(_next_float(float_upper, up=True), upper)
+        self.assertLess(_next_float(float_lower, up=False), lower)
+
+        self.assertEqual(_get_float_bounds(Decimal(-2), Decimal(3)), (-2.0, 3.0))
+
+    def test_same_as_decimal_comparison(self):
+        values = [0.1, -0.1, 0.3, 0.30000000000000004, 0.2999999999999999,
+                  1e-320, float('inf'), float('-inf'), float('nan')]
+        allowances = [allowed_deviation(0.1), allowed_deviation(0.3),
+                      allowed_percent(0.1), allowed_percent(-0.1, 0.3)]
+        for allowance in allowances:
+            for value in values:
+                diff = Deviation(value, 1.0)
+                if allowance.__class__ is allowed_deviation:
+                    expected = not isnan(value) and \
+                        allowance.lower <= value <= allowance.upper
+                else:
+                    expected = not isnan(value) and \
+                        allowance.lower <= value / 1.0 <= allowance.upper
+                actual = allowance.call_predicate((None, diff))
+                self.assertEqual(actual, expected, (allowance, value))
+
+    def test_batch_same_as_protocol(self):
+        values = [0.5, 1.5, 2.5, -0.25, float('nan'), 3, Decimal('0.75'), 0.1]
+        differences = [Deviation(x, 10) for x in values]
+        allowances = [
+            lambda: allowed_deviation(1),
+            lambda: allowed_percent(0.1),
+            lambda: allowed_deviation(1) | allowed_percent(0.2),
+            lambda: allowed_deviation(1) & allowed_percent(0.06),
+        ]
+        for make_allowance in allowances:
+            with self.assertRaises(ValidationError) as cm:
+                with make_allowance():  # <- Batch (from columnar store).
+                    raise ValidationError(iter(differences))
+            batch_result = cm.exception.differences
+
+            with self.assertRaises(ValidationError) as cm:
+                with make_allowance():  # <- Allowance protocol.
+                    raise ValidationError(list(differences))
+            self.assertEqual(batch_result, cm.exception.differences)
+
+            with self.assertRaises(ValidationError) as cm:
+                with make_allowance():  # <- Mapping of columnar store.
+                    with allowed_limit(0):
+                        raise ValidationError(dict(enumerate(differences)))
+            self.assertEqual(len(cm.exception.differences), len(batch_result))
+
+    def test_batch_float_columns(self):
+        values = [0.5, 1.5, -0.25, float('nan'), float('inf'), 0.1]
+        allowances = [
+            lambda: allowed_deviation(1),
+            lambda: allowed_percent(0.1),
+        ]
+        for expected in [10, 10.0, 0, 0.0]:
+            differences = [Deviation(x, expected) for x in values]
+            for make_allowance in allowances:
+                with self.assertRaises(ValidationError) as cm:
+                    with make_allowance():  # <- Batch (from columnar store).
+                        raise ValidationError(iter(differences))
+                batch_result = cm.exception.differences
+
+                with self.assertRaises(ValidationError) as cm:
+                    with make_allowance():  # <- Allowance protocol.
+                        raise ValidationError(list(differences))
+                self.assertEqual(batch_result, cm.exception.differences,
+                                 (make_allowance(), expected))
+
+    def test_float_columns_compared_in_one_pass(self):
+        store = _DifferenceStore([Deviation(0.5, 10), Deviation(-1.5, 10.0)])
+
+        allowance = allowed_deviation(1)
+        allowance._is_within = None  # <- Fails if called for each value.
+        self.assertEqual(allowance._check_columns(store), [True, False])
+
+        allowance = allowed_percent(0.1)
+        allowance._is_within = None
+        self.assertEqual(allowance._check_columns(store), [True, False])
+
+    def test_batch_other_differences(self):
+        with self.assertRaises(AttributeError):  # <- Same as protocol.
+            with allowed_deviation(1):
+                raise ValidationError(iter([Deviation(0.5, 10), Missing('A')]))
+
+
 class TestAllowedPercentDeviation(unittest.TestCase):
     def setUp(self):
         self.differences = {
@@ -562,6 +713,13 @@ class TestAllowedSpecific(unittest.TestCase):
         expected = [Missing('yyy')]
         self.assertEqual(actual, expected)
 
+    def test_differences_from_error(self):
+        """Should accept the differences from an earlier error."""
+        previous = ValidationError(iter([Extra('xxx'), Missing('yyy')]))
+
+        with allowed_specific(previous.differences):
+            raise ValidationError(iter([Missing('yyy'), Extra('xxx')]))
+
     def test_excess_allowed(self):
         diffs = [Extra('xxx')]
         allowed = [Extra('xxx'), Missing('yyy')]  # <- More allowed than
@@ -597,6 +755,36 @@ class TestAllowedSpecific(unittest.TestCase):
         with allowed_specific(allowed):
             raise ValidationError(differences)
 
+    def test_unhashable_and_nan_args(self):
+        nan = float('nan')
+        differences = [Invalid(['a']), Invalid(nan), Invalid(['b']), Invalid(nan)]
+        allowed = [Invalid(float('nan')), Invalid(['a'])]
+
+        with self.assertRaises(ValidationError) as cm:
+            with allowed_specific(allowed):
+                raise ValidationError(differences)
+
+        actual = list(cm.exception.differences)
+        self.assertEqual(actual, [Invalid(['b']), Invalid(nan)])
+
+    def test_custom_equality(self):
+        """Differences that define their own __eq__() should still
+        be matched correctly.
+        """
+        class CaseInsensitive(Extra):
+            def __eq__(self, other):
+                return self.args[0].lower() == other.args[0].lower()
+
+        differences = [CaseInsensitive('XXX'), Extra('yyy')]
+        allowed = [Extra('xxx')]  # <- Matched by CaseInsensitive.__eq__().
+
+        with self.assertRaises(ValidationError) as cm:
+            with allowed_specific(allowed):
+                raise ValidationError(differences)
+
+        actual = list(cm.exception.differences)
+        self.assertEqual(actual, [Extra('yyy')])
+
     def test_dict_and_list(self):
         """List of allowed differences applied to each group separately."""
         differences = {'foo': Extra('xxx'), 'bar': [Extra('xxx'), Missing('yyy')]}
@@ -673,6 +861,90 @@ class TestAllowedSpecific(unittest.TestCase):
             with allowed_specific(allowed):
                 raise ValidationError(differences)
 
+    def test_many_regex_keys(self):
+        """Regex keys are indexed, check that all matches are found."""
+        allowed = dict((re.compile('^item{0}$'.format(i)), Missing(i))
+                       for i in range(100))
+        allowed[re.compile(r'^(item)9\1$')] = Missing('x')  # <- Backreference.
+        allowed[re.compile('^ITEM7$', re.IGNORECASE)] = Missing('y')
+
+        differences = dict(('item{0}'.format(i), Missing(i))
+                           for i in range(100) if i != 7)
+        differences['item9item'] = Missing('x')
+        differences['unknown'] = Missing('z')
+        with self.assertRaises(ValidationError) as cm:
+            with allowed_specific(allowed):
+                raise ValidationError(differences)
+        self.assertEqual(cm.exception.differences, {'unknown': Missing('z')})
+
+        # The ignore-case pattern makes "item7" ambiguous.
+        differences = {'item7': Missing('y')}
+        regex = "the key 'item7' matches multiple predicates"
+        with self.assertRaisesRegex(KeyError, regex):
+            with allowed_specific(allowed):
+                raise ValidationError(differences)
+
+    def test_tuple_keys(self):
+        """Tuple keys are indexed by literal values, check that all
+        matches are found.
+        """
+        allowed = {
+            ('a', Ellipsis): Missing(1),
+            ('b', Ellipsis): Missing(2),
+            (str, 'x'): Missing(3),
+            (str, str, str): Missing(4),
+        }
+        differences = {
+            ('a', 1): Missing(1),
+            ('b', 1): Missing(2),
+            (1, 'x'): Missing(3),
+            ('c', 'd', 'e'): Missing(4),
+        }
+        with self.assertRaises(ValidationError) as cm:
+            with allowed_specific(allowed):
+                raise ValidationError(differences)
+        self.assertEqual(cm.exception.differences, {(1, 'x'): Missing(3)})
+
+        differences = {('a', 'x'): Missing(1)}
+        regex = r"the key \('a', 'x'\) matches multiple predicates"
+        with self.assertRaisesRegex(KeyError, regex):
+            with allowed_specific(allowed):
+                raise ValidationError(differences)
+
+    def test_set_keys(self):
+        """Frozenset keys match their members (using the index of
+        exact values) and are treated as a single group.
+        """
+        allowed = {
+            frozenset(['a', 'b']): [Missing(1), Missing(1)],
+            frozenset(['c']): Missing(2),
+            frozenset(['x', 'y']): Missing(3),  # <- Matched exactly, below.
+        }
+        differences = {
+            'a': Missing(1),
+            'b': [Missing(1), Missing(2)],
+            'c': Missing(2),
+            frozenset(['x', 'y']): Missing(3),
+        }
+        with self.assertRaises(ValidationError) as cm:
+            with allowed_specific(allowed):
+                raise ValidationError(differences)
+        self.assertEqual(cm.exception.differences, {'b': Missing(2)})
+
+        allowed[frozenset(['b', 'c'])] = Missing(2)
+        differences = {'b': Missing(2)}
+        regex = "the key 'b' matches multiple predicates"
+        with self.assertRaisesRegex(KeyError, regex):
+            with allowed_specific(allowed):
+                raise ValidationError(differences)
+
+        index = allowed_specific(allowed)
+        index.start_collection()
+        index = index._predicate_index
+        self.assertEqual(index._others, [])
+        self.assertEqual(sorted(index._exact['b'], key=sorted),
+                         [frozenset(['a', 'b']), frozenset(['b', 'c'])])
+
     def test_dict_global_wildcard_predicate(self):
         """Ellipsis wildcard key matches all, treats as a single group."""
         differences = {'foo': Extra('xxx'), 'bar': [Extra('xxx'), Missing('yyy')]}
@@ -769,6 +1041,7 @@ class TestUniversalComposability(unittest.TestCase):
             ntup(cls=allowed_keys,      args=(lambda args: True,),     priority=100),
             ntup(cls=allowed_args,      args=(lambda *args: True,),    priority=100),
             ntup(cls=allowed_specific,  args=({'X': [Invalid('A')]},), priority=200),
+            ntup(cls=allowed_baseline,  args=('known.baseline',),      priority=200),
             ntup(cls=allowed_limit,     args=(4,),                     priority=300),
         ]
 
@@ -777,7 +1050,7 @@ class TestUniversalComposability(unittest.TestCase):
         defined in datatest.
         """
         import datatest
-        actual = datatest.allowance.__all__
+        actual = list(datatest.allowance.__all__)
         actual.remove('allowed_percent_deviation')  # This is just an alias
                                                     # for allowed_percent().
         actual.remove('allowed')  # Factory class.
@@ -879,3 +1152,144 @@ class TestUniversalComposability(unittest.TestCase):
 
         remaining = cm.exception.differences
         self.assertEqual(remaining, [Extra('C'), Missing('D')])
+
+
+class TestValidateAllow(unittest.TestCase):
+    """The *allow* argument of validate() should give the same results
+    as using the allowance as a context manager.
+    """
+    def assertSameResult(self, data, requirement, make_allowance):
+        try:
+            with make_allowance():
+                validate(data, requirement, 'desc')
+            expected = None
+        except ValidationError as err:
+            expected = (err.differences, err.description)
+
+        try:
+            validate(data, requirement, 'desc', allow=make_allowance())
+            actual = None
+        except ValidationError as err:
+            actual = (err.differences, err.description)
+
+        self.assertEqual(actual, expected)
+
+    def test_matches_context_manager(self):
+        data = ['a', 'b', 'c', 'x', 'y']
+        requirement = set(['a', 'b', 'c', 'd'])
+        allowances = [
+            lambda: allowed_missing(),
+            lambda: allowed_extra('some msg'),
+            lambda: allowed_limit(1),
+            lambda: allowed_limit(5),
+            lambda: allowed_specific([Extra('x'), Missing('d')]),
+            lambda: allowed_specific(Extra('y')) | allowed_limit(1),
+            lambda: allowed_extra() & allowed_limit(1),
+        ]
+        for make_allowance in allowances:
+            self.assertSameResult(data, requirement, make_allowance)
+
+    def test_mapping(self):
+        data = {'A': 'x', 'B': 2, 'C': ['a', 'b'], 'D': 4}
+        requirement = {'A': 'y', 'B': 3, 'C': 'a', 'D': 4}
+        allowances = [
+            lambda: allowed_invalid() | allowed_deviation(1),
+            lambda: allowed_keys('A'),
+            lambda: allowed_specific({'C': [Invalid('b')], 'B': Deviation(-1, 3)}),
+            lambda: allowed_limit(4),
+            lambda: allowed_limit(1) & allowed_keys('C'),
+            lambda: allowed_invalid(),
+        ]
+        for make_allowance in allowances:
+            self.assertSameResult(data, requirement, make_allowance)
+
+    def test_checked_as_generated(self):
+        log = []
+
+        def data():
+            for x in ['a', 'b', 'x']:
+                log.append('data ' + x)
+                yield x
+
+        class LoggingAllowance(MinimalAllowance):
+            def call_predicate(_self, item):
+                log.append('allowance ' + item[1].args[0])
+                return False
+
+        with self.assertRaises(ValidationError):
+            validate(data(), 'a', allow=LoggingAllowance())
+
+        expected = ['data a', 'data b', 'allowance b', 'data x', 'allowance x']
+        self.assertEqual(log, expected)
+
+    def test_valid_data(self):
+        allowance = allowed_limit(2)
+        validate([1, 2], int, allow=allowance)
+        self.assertEqual(allowance._count, 0)  # <- Collection was started.
+
+    def test_bad_allowance(self):
+        with self.assertRaises(TypeError):
+            validate([1, 2], str, allow='foo')
+
+
+class TestAllowanceStats(unittest.TestCase):
+    def test_not_tracked(self):
+        allowance = allowed_missing()
+        with allowance:
+            raise ValidationError([Missing('A')])
+        self.assertIsNone(allowance.stats)
+
+    def test_composed(self):
+        allowance = allowed_missing() | allowed_keys('A') & allowed_limit(1)
+        differences = {
+            'A': [Missing('x'), Extra('y'), Extra('z')],
+            'B': [Missing('x'), Extra('y')],
+        }
+        with self.assertRaises(ValidationError):
+            with allowance.track_stats():
+                raise ValidationError(differences)
+
+        stats = allowance.stats
+        self.assertEqual((stats.seen, stats.accepted, stats.passed), (5, 3, 2))
+
+        missing, keys_and_limit = stats.children
+        self.assertEqual((missing.seen, missing.accepted), (5, 2))
+        self.assertEqual((keys_and_limit.seen, keys_and_limit.accepted), (3, 1))
+
+        keys, limit = keys_and_limit.children
+        self.assertEqual((keys.seen, keys.accepted), (3, 2))
+        self.assertEqual((limit.seen, limit.accepted), (2, 1))
+
+        self.assertGreaterEqual(stats.time, missing.time)
+
+        lines = str(stats).splitlines()
+        self.assertEqual(len(lines), 5)
+        self.assertTrue(lines[1].startswith('    allowed_missing(): seen 5, accepted 2, passed 3'))
+        self.assertTrue(lines[3].startswith("        allowed_keys('A'): seen 3"))
+
+    def test_accumulate_and_reset(self):
+        allowance = allowed_missing().track_stats()
+        for _ in range(2):
+            with allowance:
+                raise ValidationError([Missing('A')])
+        self.assertEqual(allowance.stats.seen, 2)
+
+        allowance.track_stats()
+        self.assertEqual(allowance.stats.seen, 0)
+
+    def test_validate_allow(self):
+        allowance = allowed_extra().track_stats()
+        validate(['a', 'b', 'c'], set(['a']), allow=allowance)
+        self.assertEqual(allowance.stats.accepted, 2)
+
+    def test_stats_log(self):
+        from datatest import allowance as allowance_module
+        allowance_module._stats_log = []
+        try:
+            allowance = allowed_missing()
+            with allowance:
+                raise ValidationError([Missing('A')])
+            self.assertEqual(allowance_module._stats_log, [allowance.stats])
+            self.assertEqual(allowance.stats.accepted, 1)
+        finally:
+            allowance_module._stats_log = None
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+import os
+import warnings
+from . import _unittest as unittest
+from .common import MkdtempTestCase
+from datatest.difference import Missing
+from datatest.difference import Extra
+from datatest.difference import Invalid
+from datatest.difference import Deviation
+from datatest.validation import ValidationError
+from datatest.validation import validate
+from datatest.allowance import allowed_baseline
+from datatest.allowance import allowed_missing
+
+from datatest._baseline import BaselineWriter
+from datatest._baseline import BaselineFile
+from datatest._compatibility.decimal import Decimal
+
+
+def write_baseline(path, items):
+    writer = BaselineWriter(path)
+    for key, diff in items:
+        writer.add(key, diff)
+    writer.close()
+
+
+class TestBaselineFile(MkdtempTestCase):
+    def test_take(self):
+        write_baseline('known.baseline', [
+            (None, Missing('A')),
+            (None, Extra(set(['x', 'y']))),
+            ('key', Deviation(-1, 3)),
+        ])
+        baseline = BaselineFile('known.baseline')
+        self.assertEqual(baseline.entry_count, 3)
+
+        self.assertTrue(baseline.take(None, Missing('A')))
+        self.assertFalse(baseline.take(None, Missing('A')), 'taken once')
+        self.assertTrue(baseline.take(None, Extra(set(['y', 'x']))))
+        self.assertFalse(baseline.take(None, Deviation(-1, 3)), 'wrong key')
+        self.assertFalse(baseline.take('key', Deviation(+1, 3)))
+        self.assertFalse(baseline.take(None, 'not a difference'))
+        self.assertEqual(baseline.unseen(), [('key', Deviation(-1, 3))])
+        baseline.close()
+
+    def test_repeated_differences(self):
+        write_baseline('known.baseline', [(None, Invalid('x'))] * 3)
+        baseline = BaselineFile('known.baseline')
+        self.assertEqual([baseline.take(None, Invalid('x')) for _ in range(4)],
+                         [True, True, True, False])
+        self.assertEqual(baseline.unseen(), [])
+        baseline.close()
+
+    def test_many_entries(self):
+        items = [(i % 7, Invalid(i)) for i in range(1000)]
+        write_baseline('known.baseline', items)
+        baseline = BaselineFile('known.baseline')
+        for key, diff in items[::2]:
+            self.assertTrue(baseline.take(key, diff))
+        self.assertEqual(baseline.unseen(), items[1::2])
+        baseline.close()
+
+    def test_empty(self):
+        write_baseline('known.baseline', [])
+        baseline = BaselineFile('known.baseline')
+        self.assertFalse(baseline.take(None, Missing('A')))
+        self.assertEqual(baseline.unseen(), [])
+        baseline.close()
+
+    def test_bad_file(self):
+        with open('bad.baseline', 'wb') as fh:
+            fh.write(b'not a baseline file')
+        with self.assertRaises(ValueError):
+            BaselineFile('bad.baseline')
+
+    def test_replace_file(self):
+        write_baseline('known.baseline', [(None, Missing('A'))])
+        write_baseline('known.baseline', [(None, Missing('B'))])
+        self.assertEqual(os.listdir('.'), ['known.baseline'])
+        baseline = BaselineFile('known.baseline')
+        self.assertFalse(baseline.take(None, Missing('A')))
+        self.assertTrue(baseline.take(None, Missing('B')))
+        baseline.close()
+
+    def test_context_manager(self):
+        with BaselineWriter('known.baseline') as writer:
+            writer.add(None, Missing('A'))
+        baseline = BaselineFile('known.baseline')
+        self.assertTrue(baseline.take(None, Missing('A')))
+        baseline.close()
+
+        with self.assertRaises(TypeError):
+            with BaselineWriter('known.baseline') as writer:
+                writer.add(None, Missing('B'))
+                writer.add(None, 'not a difference')  # <- Raises error.
+        self.assertEqual(os.listdir('.'), ['known.baseline'], 'temp file removed')
+        baseline = BaselineFile('known.baseline')
+        self.assertTrue(baseline.take(None, Missing('A')), 'should be unchanged')
+        baseline.close()
+
+    def test_concurrent_writers(self):
+        writer1 = BaselineWriter('known.baseline')
+        writer2 = BaselineWriter('known.baseline')
+        writer1.add(None, Missing('A'))
+        writer2.add(None, Missing('B'))
+        writer1.close()
+        writer2.close()
+
+        self.assertEqual(os.listdir('.'), ['known.baseline'])
+        baseline = BaselineFile('known.baseline')
+        self.assertEqual(baseline.entry_count, 1)
+        self.assertTrue(baseline.take(None, Missing('B')))
+        baseline.close()
+
+    def test_equal_numbers(self):
+        write_baseline('known.baseline', [
+            (None, Deviation(1, 10)),
+            (None, Deviation(Decimal('2.5'), 10)),
+            ('a', Invalid(set([1.0, 'x']))),
+        ])
+        baseline = BaselineFile('known.baseline')
+        self.assertTrue(baseline.take(None, Deviation(1.0, 10)))
+        self.assertTrue(baseline.take(None, Deviation(2.5, 10.0)))
+        self.assertTrue(baseline.take('a', Invalid(set([1, 'x']))))
+        self.assertFalse(baseline.take(None, Deviation(1.5, 10)))
+        self.assertEqual(baseline.unseen(), [])
+        baseline.close()
+
+
+class TestAllowedBaseline(MkdtempTestCase):
+    def test_record_and_allow(self):
+        data = {'A': ['x', 'y', 'q'], 'B': ['x', 'y']}
+        requirement = set(['x', 'y', 'z'])
+
+        with allowed_baseline('known.baseline', update=True):
+            validate(data, requirement)
+
+        with allowed_baseline('known.baseline'):  # <- Passes.
+            validate(data, requirement)
+
+        data['B'].append('r')
+        with self.assertRaises(ValidationError) as cm:
+            with allowed_baseline('known.baseline'):
+                validate(data, requirement)
+        self.assertEqual(cm.exception.differences, {'B': Extra('r')})
+
+    def test_error_while_updating(self):
+        with allowed_baseline('known.baseline', update=True):
+            validate(['x', 'y'], set(['x']))
+
+        def isdigit(x):
+            if x == 'error':
+                raise RuntimeError('unexpected value')
+            return x.isdigit()
+
+        allowance = allowed_baseline('known.baseline', update=True)
+        with self.assertRaises(RuntimeError):
+            validate(iter(['a', 'b', 'error', 'c']), isdigit, allow=allowance)
+        self.assertEqual(os.listdir('.'), ['known.baseline'], 'temp file removed')
+
+        with allowed_baseline('known.baseline'):  # <- Still the old baseline.
+            validate(['x', 'y'], set(['x']))
+
+    def test_unseen(self):
+        data = ['x', 'y', 'q']
+        requirement = set(['x', 'y', 'z'])
+        with allowed_baseline('known.baseline', update=True):
+            validate(data, requirement)
+
+        allowance = allowed_baseline('known.baseline')
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            with allowance:
+                validate(['x', 'y'], requirement)
+
+        self.assertEqual(allowance.unseen, [(None, Extra('q'))])
+        self.assertEqual(len(caught), 1)
+        self.assertIn('1 baseline differences', str(caught[0].message))
+
+    def test_validate_allow(self):
+        data = ['x', 'y', 'q', 'r']
+        requirement = set(['x', 'y', 'z'])
+        validate(data, requirement, allow=allowed_baseline('known.baseline', update=True))
+
+        allowance = allowed_baseline('known.baseline') | allowed_missing()
+        validate(data, requirement, allow=allowance)
+
+    def test_missing_file(self):
+        with self.assertRaises(IOError):
+            with allowed_baseline('missing.baseline'):
+                validate(['x'], 'y')
+
+    def test_repr(self):
+        self.assertEqual(repr(allowed_baseline('a.baseline')),
+                         "allowed_baseline('a.baseline')")
+        self.assertEqual(repr(allowed_baseline('a.baseline', msg='m', update=True)),
+                         "allowed_baseline('a.baseline', msg='m', update=True)")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import re
+from . import _unittest as unittest
+from .common import MkdtempTestCase
+from datatest.difference import Invalid
+from datatest._query.query import Selector
+from datatest.validation import _get_invalid_info
+
+from datatest._cache import fingerprint
+from datatest._cache import iterchunks
+from datatest._cache import ChunkCache
+from datatest._cache import recording_inputs
+from datatest._cache import file_digest
+
+
+LIMIT = 100  # <- Global used by helper function below.
+
+
+def below_limit(x):
+    return int(x) < LIMIT
+
+
+def check_value(x):  # <- Predicate that calls a helper function.
+    return below_limit(x)
+
+
+class Unstable(object):
+    pass  # <- Default repr() includes the object's address.
+
+
+class TestFingerprint(unittest.TestCase):
+    def test_stable_values(self):
+        self.assertEqual(fingerprint('abc'), fingerprint('abc'))
+        self.assertEqual(fingerprint(set(['a', 'b'])), fingerprint(set(['b', 'a'])))
+        self.assertEqual(fingerprint({'a': 1, 'b': 2}), fingerprint({'b': 2, 'a': 1}))
+        self.assertNotEqual(fingerprint('abc'), fingerprint('abd'))
+        self.assertNotEqual(fingerprint((1, 2)), fingerprint([1, 2]))
+
+    def test_regex(self):
+        self.assertEqual(fingerprint(re.compile('a')), fingerprint(re.compile('a')))
+        self.assertNotEqual(fingerprint(re.compile('a')), fingerprint(re.compile('b')))
+        self.assertNotEqual(fingerprint(re.compile('a')), fingerprint(re.compile('a', re.I)))
+
+    def test_functions(self):
+        def make_func(n):
+            def func(x):
+                return x > n
+            return func
+
+        self.assertEqual(fingerprint(make_func(1)), fingerprint(make_func(1)))
+        self.assertNotEqual(fingerprint(make_func(1)), fingerprint(make_func(2)))
+
+        func1 = lambda x: x > 1
+        func2 = lambda x: x < 1
+        self.assertNotEqual(fingerprint(func1), fingerprint(func2))
+
+    def test_globals(self):
+        global LIMIT
+        original = LIMIT
+        try:
+            before = fingerprint(check_value)
+            LIMIT = 5
+            self.assertNotEqual(fingerprint(check_value), before)
+            LIMIT = original
+            self.assertEqual(fingerprint(check_value), before)
+        finally:
+            LIMIT = original
+
+    def test_modules_by_name(self):
+        func = lambda x: re.match('a', x)
+        self.assertEqual(fingerprint(func), fingerprint(func))
+
+    def test_unstable(self):
+        self.assertIsNone(fingerprint(Unstable()))
+        self.assertIsNone(fingerprint([1, Unstable()]))
+
+        obj = Unstable()
+        func = lambda x: x == obj
+        self.assertIsNone(fingerprint(func))
+
+    def test_recursive_container(self):
+        container = [1, 2]
+        container.append(container)
+        fingerprint(container)  # <- Should not raise error.
+
+
+class TestIterChunks(unittest.TestCase):
+    def test_all_values_included(self):
+        values = list(range(5000))
+        chunks = list(iterchunks(values, size=16))
+        self.assertEqual([x for _, chunk in chunks for x in chunk], values)
+
+    def test_local_changes(self):
+        """Changing a single value should only affect its own chunk."""
+        values = list(range(5000))
+        digests1 = [digest for digest, _ in iterchunks(values, size=16)]
+
+        values[2500] = 'changed'
+        digests2 = [digest for digest, _ in iterchunks(values, size=16)]
+
+        self.assertEqual(len(set(digests1) - set(digests2)), 1)
+
+    def test_max_length(self):
+        values = ['same'] * 100
+        chunks = list(iterchunks(values, size=4))
+        self.assertTrue(all(len(chunk) <= 32 for _, chunk in chunks))
+
+
+class TestChunkCache(MkdtempTestCase):
+    def test_save_and_load(self):
+        cache = ChunkCache('cachefile', 'key1')
+        self.assertIsNone(cache.get('abc'))
+        cache.set('abc', [Invalid('x')])
+        cache.save()
+
+        cache = ChunkCache('cachefile', 'key1')
+        self.assertEqual(cache.get('abc'), [Invalid('x')])
+
+        cache = ChunkCache('cachefile', 'key2')  # <- Different key.
+        self.assertIsNone(cache.get('abc'))
+
+    def test_unused_chunks_removed(self):
+        cache = ChunkCache('cachefile', 'key1')
+        cache.set('abc', [])
+        cache.save()
+
+        cache = ChunkCache('cachefile', 'key1')
+        cache.set('def', [])
+        cache.save()
+
+        cache = ChunkCache('cachefile', 'key1')
+        self.assertIsNone(cache.get('abc'))
+        self.assertEqual(cache.get('def'), [])
+
+    def test_unreadable_file(self):
+        with open('cachefile', 'w') as fh:
+            fh.write('not a cache file')
+        cache = ChunkCache('cachefile', 'key1')
+        self.assertIsNone(cache.get('abc'))
+
+    def test_data_only_format(self):
+        """The file is JSON and loading it must not call objects."""
+        cache = ChunkCache('cachefile', 'key1')
+        cache.set('abc', [Invalid('x', 5)])
+        cache.save()
+        with open('cachefile', 'rb') as fh:
+            data = json.loads(fh.read().decode('utf-8'))
+        self.assertEqual(data['entries'], {'key1': {'abc': [['Invalid', 'x', 5]]}})
+
+        data['entries']['key1']['abc'] = [['os.system', 'echo unsafe']]
+        with open('cachefile', 'wb') as fh:
+            fh.write(json.dumps(data).encode('utf-8'))
+        cache = ChunkCache('cachefile', 'key1')
+        self.assertIsNone(cache.get('abc'), 'unknown types are not loaded')
+
+    def test_inexact_differences_not_stored(self):
+        cache = ChunkCache('cachefile', 'key1')
+        cache.set('abc', [Invalid('x', object)])  # <- Saved as repr string.
+        cache.save()
+        cache = ChunkCache('cachefile', 'key1')
+        self.assertIsNone(cache.get('abc'))
+
+    def test_save_replaces_file(self):
+        cache = ChunkCache('cachefile', 'key1')
+        cache.set('abc', [])
+        cache.save()
+        cache.save()  # <- Replaces existing file.
+        self.assertEqual(os.listdir('.'), ['cachefile'], 'no temporary files left')
+        self.assertEqual(ChunkCache('cachefile', 'key1').get('abc'), [])
+
+
+class TestIncrementalValidation(MkdtempTestCase):
+    def test_unchanged_data(self):
+        checked = []
+        def isdigit(x):
+            checked.append(x)
+            return x.isdigit()
+
+        rows = [['A']] + [[str(x)] for x in range(100)] + [['x']]
+        select = Selector(rows)
+
+        msg, diffs = _get_invalid_info(select('A'), isdigit, cache='cachefile')
+        self.assertEqual(list(diffs), [Invalid('x')])
+        self.assertEqual(len(checked), 101)
+        self.assertTrue(os.path.exists('cachefile'))
+
+        checked[:] = []
+        msg, diffs = _get_invalid_info(select('A'), isdigit, cache='cachefile')
+        self.assertEqual(list(diffs), [Invalid('x')])
+        self.assertEqual(checked, [], msg='values should not be checked again')
+
+    def test_changed_requirement(self):
+        select = Selector([['A'], ['1'], ['2'], ['x']])
+
+        msg, diffs = _get_invalid_info(select('A'), '1', cache='cachefile')
+        self.assertEqual(list(diffs), [Invalid('2'), Invalid('x')])
+
+        msg, diffs = _get_invalid_info(select('A'), '2', cache='cachefile')
+        self.assertEqual(list(diffs), [Invalid('1'), Invalid('x')])
+
+        result = _get_invalid_info(select('A'), re.compile('.'), cache='cachefile')
+        self.assertIsNone(result)
+
+    def test_changed_global(self):
+        global LIMIT
+        select = Selector([['A']] + [[str(x)] for x in range(10)])
+
+        original = LIMIT
+        try:
+            result = _get_invalid_info(select('A'), check_value, cache='cachefile')
+            self.assertIsNone(result)
+
+            LIMIT = 5  # <- Used by helper function, invalidates cache.
+            msg, diffs = _get_invalid_info(select('A'), check_value, cache='cachefile')
+            self.assertEqual(len(list(diffs)), 5)
+        finally:
+            LIMIT = original
+
+    def test_unstable_requirement(self):
+        obj = Unstable()
+        def requirement(x):
+            return obj is not None and x.isdigit()
+
+        select = Selector([['A'], ['1'], ['x']])
+        msg, diffs = _get_invalid_info(select('A'), requirement, cache='cachefile')
+        self.assertEqual(list(diffs), [Invalid('x')])
+        self.assertFalse(os.path.exists('cachefile'), msg='should not cache')
+
+
+class TestRecordingInputs(MkdtempTestCase):
+    def setUp(self):
+        super(TestRecordingInputs, self).setUp()
+        with open('mydata.csv', 'w') as fh:
+            fh.write('A,B\nx,1\ny,2\n')
+        self.path = os.path.abspath('mydata.csv')
+
+    def test_selector(self):
+        with recording_inputs() as outer:
+            select = Selector('mydata.csv')
+            with recording_inputs() as inner:
+                select('A').fetch()  # <- Querying records loaded files.
+
+        self.assertEqual(set(outer), set([self.path]))
+        self.assertEqual(set(inner), set([self.path]))
+
+    def test_non_file_input(self):
+        with recording_inputs() as paths:
+            select = Selector([['A'], ['x']])
+            select('A').fetch()
+        self.assertEqual(set(paths), set([None]))
+
+    def test_file_digest(self):
+        digest = file_digest('mydata.csv')
+        self.assertEqual(digest[0], os.path.getsize('mydata.csv'))
+        self.assertEqual(file_digest('mydata.csv', digest), digest)
+
+        known = (digest[0], digest[1], 'abc123')  # <- Reused when size
+        self.assertEqual(file_digest('mydata.csv', known), known)  # and mtime match.
+
+        with open('mydata.csv', 'w') as fh:
+            fh.write('A,B\nx,1\nz,3\n')
+        os.utime('mydata.csv', (digest[1] + 10, digest[1] + 10))
+        self.assertNotEqual(file_digest('mydata.csv', known)[2], 'abc123')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -30,6 +30,7 @@ from datatest.allowance import allowed_deviation
 from datatest.allowance import allowed_percent
 from datatest.allowance import allowed_limit
 from datatest.allowance import allowed_specific
+from datatest.allowance import allowed_baseline
 
 
 class TestHelperCase(unittest.TestCase):
@@ -82,6 +83,17 @@ class TestAssertValid(DataTestCase):
         differences = cm.exception.differences
         self.assertEqual(differences, [Missing(4), Extra(3)])
 
+    def test_allow(self):
+        with self.assertRaises(ValidationError) as cm:
+            data = set([1, 2, 3])
+            required = set([1, 2, 4])
+            self.assertValid(data, required, allow=self.allowedMissing())
+
+        self.assertEqual(cm.exception.differences, [Extra(3)])
+        self.assertIsNotNone(cm.exception._should_truncate)
+
+        self.assertValid([1, 2], set([1, 2, 3]), allow=self.allowedMissing())
+
     def test_data_mapping(self):
         with self.assertRaises(ValidationError) as cm:
             data = {'a': set([1, 2]), 'b': set([1]), 'c': set([1, 2, 3])}
@@ -164,6 +176,33 @@ class TestAssertValid(DataTestCase):
         self.assertValid(result_obj1, result_obj2)
 
 
+class TestAssertValidSchema(DataTestCase):
+    def test_schema(self):
+        data = [{'A': 'x', 'B': 1}, {'A': 'y', 'B': 2}]
+        self.assertValidSchema(data, {'A': set(['x', 'y']), 'B': int})
+
+        with self.assertRaises(ValidationError) as cm:
+            self.assertValidSchema(data, {'A': 'x', 'B': 1})
+
+        differences = cm.exception.differences
+        self.assertEqual(differences, {'A': [Invalid('y')], 'B': [Deviation(+1, 1)]})
+
+    def test_maxdiff_propagation(self):
+        self.maxDiff = 35
+        data = [{'A': x} for x in range(6)]
+        with self.assertRaises(ValidationError) as cm:
+            self.assertValidSchema(data, {'A': set([0, 1])})
+
+        message = str(cm.exception)
+        self.assertTrue(message.endswith(
+            'Diff is too long. Set self.maxDiff to None to see it.'))
+
+        self.maxDiff = None
+        with self.assertRaises(ValidationError) as cm:
+            self.assertValidSchema(data, {'A': set([0, 1])})
+        self.assertTrue(str(cm.exception).endswith('}'))
+
+
 class TestAssertEqual(unittest.TestCase):
     def test_for_unwrapped_behavior(self):
         """The datatest.DataTestCase class should NOT wrap the
@@ -194,6 +233,10 @@ class TestAllowanceWrappers(unittest.TestCase):
         cm = self.case.allowedSpecific([Missing('foo')])
         self.assertTrue(isinstance(cm, allowed_specific))
 
+    def test_allowedBaseline(self):
+        cm = self.case.allowedBaseline('known.baseline')
+        self.assertTrue(isinstance(cm, allowed_baseline))
+
     def test_allowedMissing(self):
         cm = self.case.allowedMissing()
         self.assertTrue(isinstance(cm, allowed_missing))
@@ -73,6 +73,21 @@ class TestBaseDifference(unittest.TestCase):
         self.assertNotEqual(diff, False)
 
 
+class TestSlots(unittest.TestCase):
+    def test_no_instance_dict(self):
+        """Basic differences should use __slots__ to save memory."""
+        for diff in [Missing('A'), Extra('A'), Invalid('A'), Deviation(1, 2)]:
+            self.assertFalse(hasattr(diff, '__dict__'), msg=repr(diff))
+
+    def test_pickle(self):
+        import pickle
+        diffs = [Missing('A'), Extra('A'), Invalid('A', 'B'),
+                 Deviation(1, 2), MinimalDifference('A', 'B')]
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            unpickled = pickle.loads(pickle.dumps(diffs, protocol))
+            self.assertEqual(unpickled, diffs)
+
+
 class TestSubclassRelationship(unittest.TestCase):
     def test_subclass(self):
         self.assertTrue(issubclass(Extra, BaseDifference))
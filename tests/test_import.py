@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""Test lazy loading of the datatest package's public names."""
+import subprocess
+import sys
+
+from . import _unittest as unittest
+import datatest
+
+
+class TestLazyImport(unittest.TestCase):
+    def get_loaded_modules(self, statement):
+        """Run *statement* in a separate process and return a set of
+        the names of modules that it loaded.
+        """
+        code = '{0}\nimport sys\nprint(" ".join(sys.modules))'.format(statement)
+        command = [sys.executable, '-B', '-c', code]
+        p = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        stdout_bytes, stderr_bytes = p.communicate()
+        if p.returncode != 0:
+            self.fail(stderr_bytes.decode('utf-8'))
+        return set(stdout_bytes.decode('utf-8').split())
+
+    def test_import_datatest(self):
+        modules = self.get_loaded_modules('import datatest')
+        not_loaded = [
+            'datatest.validation',
+            'datatest.runner',
+            'datatest._query.query',
+            'multiprocessing',
+            'sqlite3',
+            'unittest',
+        ]
+        for name in not_loaded:
+            self.assertNotIn(name, modules)
+
+    def test_pytest_plugin_modules(self):
+        modules = self.get_loaded_modules(
+            'import datatest._cache, datatest._profile')
+        self.assertNotIn('datatest.validation', modules)
+        self.assertNotIn('inspect', modules)
+        self.assertNotIn('pickle', modules)
+
+    def test_deferred_connection(self):
+        modules = self.get_loaded_modules(
+            'from datatest._query import query\n'
+            'assert query._default_connection is None\n'
+            'query.Selector()\n'
+            'assert query._default_connection is not None'
+        )
+        self.assertIn('sqlite3', modules)
+
+    @unittest.skipIf(sys.version_info[:2] < (3, 5), 'requires 3.5 or newer')
+    def test_default_connection_alias(self):
+        self.get_loaded_modules(
+            'from datatest._query import query\n'
+            'assert query._default_connection is None\n'
+            'connection = query.DEFAULT_CONNECTION\n'
+            'assert connection is query._get_default_connection()\n'
+            'try:\n'
+            '    query.NO_SUCH_NAME\n'
+            'except AttributeError:\n'
+            '    pass\n'
+            'else:\n'
+            '    raise AssertionError("no error raised")\n'
+        )
+
+    def test_names_match_submodules(self):
+        for module_name, names in datatest._api:
+            getattr(datatest, names[0])  # <- Loads submodule.
+            module = sys.modules['datatest.' + module_name]
+            public = getattr(module, '__all__', None)
+            if public is not None:
+                self.assertEqual(sorted(names), sorted(public))
+            for name in names:
+                self.assertIs(getattr(datatest, name), getattr(module, name))
+
+    def test_submodule_and_name_conflict(self):
+        import datatest.main  # <- Sets 'main' attribute of package.
+        self.assertIs(datatest.main, datatest.DataTestProgram)
+
+    def test_missing_name(self):
+        with self.assertRaises(AttributeError):
+            datatest.no_such_name
+
+
+if __name__ == '__main__':
+    unittest.main()
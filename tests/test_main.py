@@ -1,5 +1,7 @@
 # -*- coding: utf-8 -*-
 import glob
+import json
+import linecache
 import os
 import shutil
 import sys
@@ -77,6 +79,8 @@ class TestDataTestProgram(unittest.TestCase):
         with open(filename, 'w') as fh:
             source_code = textwrap.dedent(source_code)
             fh.write(source_code)
+        sys.modules.pop(modname, None)  # <- Don't reuse old module object.
+        linecache.clearcache()  # <- Discard stale source lines.
         module = load_module_from_file(modname, filename)
         return module
 
@@ -244,6 +248,160 @@ class TestDataTestProgram(unittest.TestCase):
         #self.assertEqual(len(result.errors), 0)
         #self.assertEqual(len(result.failures), 1)
 
+    def run_program(self, module, **kwds):
+        with open(os.devnull, 'w') as devnul:
+            with redirect_stderr(devnul):
+                program = DataTestProgram(module=module, exit=False, argv=[''], **kwds)
+        return program.result
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'requires os.fork()')
+    def test_workers(self):
+        source_code = """
+            import datatest
+
+            class TestA(datatest.DataTestCase):
+                def test_one(self):
+                    self.assertTrue(True)
+
+                def test_two(self):
+                    self.assertTrue(False)  # <- TEST FAILURE!
+
+            class TestB(datatest.DataTestCase):
+                def test_three(self):
+                    raise Exception('three')  # <- TEST ERROR!
+
+                @datatest.skip('not ready')
+                def test_four(self):
+                    pass
+
+            class TestC(datatest.DataTestCase):
+                @classmethod
+                def setUpClass(cls):
+                    raise Exception('fixture')  # <- CLASS FIXTURE ERROR!
+
+                def test_five(self):
+                    pass
+
+            class TestD(datatest.DataTestCase):
+                def test_six(self):
+                    self.assertValid([1, 2], int)
+
+        """
+        module = self.load_module(source_code)
+        serial = self.run_program(module)
+        parallel = self.run_program(module, workers=3)
+
+        self.assertEqual(parallel.testsRun, serial.testsRun)
+        self.assertEqual(len(parallel.skipped), 1)
+
+        get_ids = lambda items: [test.id() for test, _ in items]
+        self.assertEqual(get_ids(parallel.failures), get_ids(serial.failures))
+        self.assertEqual(get_ids(parallel.errors), get_ids(serial.errors))
+        self.assertIn('AssertionError', parallel.failures[0][1])
+        self.assertIn('three', parallel.errors[0][1])
+        self.assertIn('fixture', parallel.errors[1][1])
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'requires os.fork()')
+    def test_workers_mandatory(self):
+        source_code = """
+            import datatest
+
+            class TestA(datatest.DataTestCase):
+                def test_one(self):
+                    self.assertTrue(True)
+
+                @datatest.mandatory  # <- "MANDATORY" DECORATOR
+                def test_two(self):
+                    self.assertTrue(False)  # <- TEST FAILURE!
+
+            class TestB(datatest.DataTestCase):
+                def test_three(self):
+                    self.assertTrue(True)
+
+            class TestC(datatest.DataTestCase):
+                def test_four(self):
+                    self.assertTrue(True)
+
+        """
+        module = self.load_module(source_code)
+
+        result = self.run_program(module, workers=2)
+        self.assertEqual(result.testsRun, 2)  # <- Should stop early, "test_two" is mandatory.
+        self.assertEqual(len(result.failures), 1)
+        self.assertRegex(result.failures[0][1], 'mandatory test failed, stopping early')
+
+        result = self.run_program(module, workers=2, ignore=True)
+        self.assertEqual(result.testsRun, 4)
+
+    def test_profile(self):
+        source_code = """
+            import datatest
+
+            class TestA(datatest.DataTestCase):
+                def test_one(self):
+                    self.assertValid([2, 4], int)
+
+                def test_two(self):
+                    self.assertValid([1, 'x'], int)  # <- TEST FAILURE!
+
+            class TestB(datatest.DataTestCase):
+                def test_three(self):
+                    with self.allowedInvalid():
+                        self.assertValid(['y'], int)
+
+        """
+        module = self.load_module(source_code)
+        workers = [None, 2] if hasattr(os, 'fork') else [None]
+        for count in workers:
+            self.run_program(module, workers=count, profile='profile.json')
+            with open('profile.json') as fh:
+                profile = json.load(fh)
+
+            self.assertEqual(profile['format'], 'datatest-profile')
+            tests = dict((x['test'], x['validations']) for x in profile['tests'])
+            self.assertEqual(len(tests), 3)
+
+            validation, = tests['testmodule.TestA.test_two']
+            self.assertTrue(validation['location'].endswith('testmodule.py:9'))
+            self.assertEqual(validation['differences'], 1)
+            self.assertGreater(validation['format'], 0)
+
+            validation, = tests['testmodule.TestB.test_three']
+            self.assertGreater(validation['allowance'], 0)
+
+    @unittest.skipUnless(hasattr(DataTestProgram.__bases__[0], '_getParentArgParser'),
+                         'requires argparse-based command line (3.4 and newer)')
+    def test_profile_arguments(self):
+        source_code = """
+            import datatest
+
+            class TestA(datatest.DataTestCase):
+                def test_one(self):
+                    self.assertValid([2, 4], int)
+
+                def test_two(self):
+                    self.assertValid([6, 8], int)
+
+        """
+        module = self.load_module(source_code)
+
+        def run(argv):
+            with open(os.devnull, 'w') as devnull:
+                with redirect_stderr(devnull):
+                    return DataTestProgram(module=module, exit=False, argv=argv)
+
+        program = run(['', '--profile', 'TestA.test_one'])  # <- Test name.
+        self.assertIs(program.profile, True)
+        self.assertEqual(program.result.testsRun, 1)
+        self.assertFalse(os.path.exists('TestA.test_one'))
+
+        program = run(['', '--profile-file', 'profile.json', 'TestA.test_two'])
+        self.assertEqual(program.profile, 'profile.json')
+        self.assertEqual(program.result.testsRun, 1)
+        with open('profile.json') as fh:
+            profile = json.load(fh)
+        self.assertEqual(profile['format'], 'datatest-profile')
+
 
 # Patch for setUpClass and tearDownClass on older versions of unittest.
 try:
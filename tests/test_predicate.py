@@ -222,3 +222,28 @@ class TestGetPredicate(unittest.TestCase):
 
         expected = "(mycallable, re.compile('_'), {0!r}, '_', ...)".format(myset)
         self.assertEqual(repr(predicate), expected)
+
+    def test_tuple_comparison_semantics(self):
+        """Compiled tuple predicates should follow the same rules as
+        normal tuple comparisons.
+        """
+        nan = float('nan')
+        predicate = get_predicate((int, nan, Ellipsis))
+
+        self.assertTrue(predicate == (1, nan, 'x'))  # <- Identity before equality.
+        self.assertFalse(predicate == (1, float('nan'), 'x'))
+        self.assertFalse(predicate == (1, nan))  # <- Different lengths.
+        self.assertFalse(predicate == (1, nan, 'x', 'y'))
+        self.assertFalse(predicate == [1, nan, 'x'])  # <- Not a tuple.
+        self.assertTrue(predicate != ('a', nan, 'x'))
+        self.assertFalse(predicate != (1, nan, 'x'))
+
+    def test_tuple_elements_called_once(self):
+        calls = []
+        def func(x):  # <- Helper function.
+            calls.append(x)
+            return True
+
+        predicate = get_predicate((func, Ellipsis, func))
+        self.assertTrue(predicate == ('a', 'b', 'c'))
+        self.assertEqual(calls, ['a', 'c'])
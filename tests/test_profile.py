@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+import json
+from . import _unittest as unittest
+from .common import MkdtempTestCase
+from datatest._query.query import Selector
+from datatest.validation import ValidationError
+from datatest.validation import validate
+from datatest.allowance import allowed_missing
+from datatest.allowance import allowed_extra
+
+from datatest import _profile
+from datatest._profile import Recorder
+
+
+class TestRecorder(MkdtempTestCase):
+    def setUp(self):
+        super(TestRecorder, self).setUp()
+        self.recorder = _profile.recorder = Recorder()
+
+    def tearDown(self):
+        _profile.recorder = None
+        super(TestRecorder, self).tearDown()
+
+    def test_operations(self):
+        select = Selector([['A', 'B'], ['x', 1], ['y', 2], ['z', 3]])
+
+        self.recorder.start_test('test_one')
+        validate(select('B'), int)
+        with self.assertRaises(ValidationError) as cm:
+            validate(['a', 1, 'b'], int, allow=allowed_missing() | allowed_extra())
+        str(cm.exception)  # <- Format error.
+        self.recorder.stop_test()
+
+        outside, test = self.recorder.tests
+        self.assertIsNone(outside.test)
+        self.assertEqual(len(outside.loads), 1)
+        self.assertEqual(outside.loads[0]['rows'], 3)
+
+        self.assertEqual(test.test, 'test_one')
+        self.assertEqual(len(test.queries), 1)
+        self.assertTrue(test.queries[0]['sql'].startswith('SELECT'))
+
+        query_validation, allowed_validation = test.validations
+        self.assertEqual(query_validation.items, 3)  # <- Rows read.
+        self.assertEqual(query_validation.differences, 0)
+        self.assertGreater(query_validation.query, 0)
+
+        self.assertEqual(allowed_validation.items, 3)  # <- Sized data.
+        self.assertEqual(allowed_validation.differences, 2)
+        self.assertEqual(len(allowed_validation.allowances), 1)
+        self.assertGreater(allowed_validation.allowance, 0)
+        self.assertGreater(allowed_validation.format, 0)
+
+        lines = self.recorder.format_tests()
+        self.assertRegex(lines[0], r'^test_one: .*1 query .*2 validations '
+                                   r'\(6 items, 2 differences')
+        self.assertRegex(lines[1], r'^\(outside tests\): 1 load \(3 rows')
+
+    def test_lazy_differences_with_allowance(self):
+        clock = [0.0]
+
+        def fake_timer():
+            return clock[0]
+
+        def slow_int(x):  # <- Each comparison takes 1 second.
+            clock[0] += 1.0
+            return isinstance(x, int)
+
+        original_timer = _profile.timer
+        _profile.timer = fake_timer
+        try:
+            self.recorder.start_test('test_one')
+            with self.assertRaises(ValidationError):
+                validate(iter([1, 'a', 'b']), slow_int, allow=allowed_missing())
+            self.recorder.stop_test()
+        finally:
+            _profile.timer = original_timer
+
+        validation, = self.recorder.tests[0].validations
+        self.assertEqual(validation.compare, 3.0)
+        self.assertEqual(validation.allowance, 0.0)
+        self.assertEqual(validation.differences, 2)
+
+    def test_mapping_differences_counted(self):
+        self.recorder.start_test('test_one')
+        with self.assertRaises(ValidationError):
+            validate({'a': [1, 'x', 'y'], 'b': ['z', 2]}, int)
+        self.recorder.stop_test()
+
+        validation, = self.recorder.tests[0].validations
+        self.assertEqual(validation.differences, 3)  # <- Not 2 keys.
+
+    def test_execute_query_returns_cursor(self):
+        select = Selector([['A', 'B'], ['x', 1], ['y', 2]])
+        cursor = select._execute_query('A')
+        self.assertTrue(hasattr(cursor, 'fetchall'))
+        self.assertEqual(sorted(cursor.fetchall()), [('x',), ('y',)])
+
+    def test_dump(self):
+        self.recorder.start_test('test_one')
+        validate([1, 2], int)
+        self.recorder.stop_test()
+        self.recorder.dump('profile.json')
+
+        with open('profile.json') as fh:
+            profile = json.load(fh)
+        self.assertEqual(profile['format'], 'datatest-profile')
+        validation, = profile['tests'][0]['validations']
+        self.assertEqual(validation['items'], 2)
+        self.assertEqual(validation['allowances'], [])
+
+    def test_not_profiling(self):
+        _profile.recorder = None
+        validate([1, 2], int)
+        self.assertEqual(self.recorder.tests, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,350 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+from . import _unittest as unittest
+from .common import MkdtempTestCase
+from datatest._cache import record_input
+from datatest.difference import Invalid
+from datatest.validation import ValidationError
+
+try:
+    from datatest import _pytest_plugin
+    from _pytest._code.code import ReprEntry
+except ImportError:
+    _pytest_plugin = None  # <- Requires pytest.
+
+
+class FakeCache(object):
+    def __init__(self):
+        self.values = {}
+
+    def get(self, key, default):
+        return self.values.get(key, default)
+
+    def set(self, key, value):
+        self.values[key] = value
+
+
+class FakeConfig(object):
+    def __init__(self, rootdir):
+        self.rootdir = rootdir
+        self.cache = FakeCache()
+
+
+class FakeItem(object):
+    def __init__(self, path, name, markers=()):
+        self.fspath = path
+        self.name = name
+        self.nodeid = '{0}::{1}'.format(os.path.basename(path), name)
+        self.location = (os.path.basename(path), 0, name)
+        self.keywords = {name: 1}
+        self.markers = markers
+
+    def get_closest_marker(self, name):
+        return name if name in self.markers else None
+
+
+def write_file(path, text):
+    with open(path, 'wb') as fh:
+        fh.write(text.encode('utf-8'))
+
+
+@unittest.skipIf(_pytest_plugin is None, 'pytest not found')
+class TestResultCache(MkdtempTestCase):
+    def setUp(self):
+        MkdtempTestCase.setUp(self)
+        self.rootdir = os.getcwd()
+        self.test_path = os.path.join(self.rootdir, 'test_data.py')
+        write_file(self.test_path, 'def test_data(): pass\n')
+        self.data_path = os.path.join(self.rootdir, 'data.csv')
+        write_file(self.data_path, 'A\n1\n')
+        self.config = FakeConfig(self.rootdir)
+
+    def run_item(self, item, inputs):
+        """Run *item* with a new _ResultCache, as a session would,
+        and return the reports it reused or None.
+        """
+        result_cache = _pytest_plugin._ResultCache(self.config)
+        reports = result_cache.get_reports(item)
+        if reports is None:
+            result_cache.start(item)
+            for obj in inputs:
+                record_input(obj)
+            data = {'when': 'call', 'outcome': 'passed', 'longrepr': None,
+                    'sections': [], 'duration': 0.5}
+            report = _pytest_plugin._deserialize_report(item, data)
+            result_cache.pytest_runtest_logreport(report)
+            result_cache.finish(item)
+        result_cache.pytest_sessionfinish(None)
+        return reports
+
+    def test_reuse_marked(self):
+        item = FakeItem(self.test_path, 'test_data', ['result_cache'])
+        self.assertIsNone(self.run_item(item, [self.data_path]))
+
+        reports = self.run_item(item, [self.data_path])
+        self.assertEqual(len(reports), 1)
+        self.assertEqual(reports[0].nodeid, item.nodeid)
+        self.assertEqual(reports[0].outcome, 'passed')
+        self.assertEqual(reports[0].duration, 0.5)
+
+    def test_unmarked(self):
+        item = FakeItem(self.test_path, 'test_data')
+        self.run_item(item, [self.data_path])
+        self.assertEqual(self.config.cache.values, {'datatest/results-v2': {}})
+        self.assertIsNone(self.run_item(item, [self.data_path]))
+
+    def test_rerun(self):
+        item = FakeItem(self.test_path, 'test_data', ['result_cache'])
+        self.run_item(item, [self.data_path])
+
+        result_cache = _pytest_plugin._ResultCache(self.config, rerun=True)
+        self.assertIsNone(result_cache.get_reports(item))
+
+    def test_marker_removed(self):
+        item = FakeItem(self.test_path, 'test_data', ['result_cache'])
+        self.run_item(item, [self.data_path])
+
+        item = FakeItem(self.test_path, 'test_data')
+        self.assertIsNone(self.run_item(item, [self.data_path]))
+
+    def test_untracked_inputs(self):
+        item = FakeItem(self.test_path, 'test_data', ['result_cache'])
+        self.run_item(item, [])  # <- No file inputs.
+        self.assertIsNone(self.run_item(item, []))
+
+        self.run_item(item, [self.data_path, object()])  # <- Not a file.
+        self.assertIsNone(self.run_item(item, [self.data_path]))
+
+    def test_input_changed(self):
+        item = FakeItem(self.test_path, 'test_data', ['result_cache'])
+        self.run_item(item, [self.data_path])
+
+        write_file(self.data_path, 'A\n1\n2\n')
+        self.assertIsNone(self.run_item(item, [self.data_path]))
+        self.assertIsNotNone(self.run_item(item, [self.data_path]))
+
+        os.remove(self.data_path)
+        self.assertIsNone(self.run_item(item, []))
+
+    def test_test_module_changed(self):
+        item = FakeItem(self.test_path, 'test_data', ['result_cache'])
+        self.run_item(item, [self.data_path])
+
+        write_file(self.test_path, 'def test_data(): assert False\n')
+        self.assertIsNone(self.run_item(item, [self.data_path]))
+
+    def test_conftest_changed(self):
+        conftest_path = os.path.join(self.rootdir, 'conftest.py')
+        write_file(conftest_path, '')
+        item = FakeItem(self.test_path, 'test_data', ['result_cache'])
+        self.run_item(item, [self.data_path])
+
+        write_file(conftest_path, 'import datatest\n')
+        self.assertIsNone(self.run_item(item, [self.data_path]))
+
+    def test_project_module_changed(self):
+        helper_path = os.path.join(self.rootdir, 'datatest_helper_mod.py')
+        write_file(helper_path, 'VALUE = 1\n')
+        sys.path.insert(0, self.rootdir)
+        try:
+            __import__('datatest_helper_mod')
+            item = FakeItem(self.test_path, 'test_data', ['result_cache'])
+            self.run_item(item, [self.data_path])
+            entry = self.config.cache.values['datatest/results-v2'][item.nodeid]
+            self.assertIn(helper_path, entry['modules'])
+
+            write_file(helper_path, 'VALUE = 12\n')
+            self.assertIsNone(self.run_item(item, [self.data_path]))
+        finally:
+            sys.path.remove(self.rootdir)
+            sys.modules.pop('datatest_helper_mod', None)
+
+    def test_datatest_modules_included(self):
+        item = FakeItem(self.test_path, 'test_data', ['result_cache'])
+        self.run_item(item, [self.data_path])
+        entry = self.config.cache.values['datatest/results-v2'][item.nodeid]
+        self.assertIn(os.path.abspath(_pytest_plugin.__file__).rstrip('co'),
+                      entry['modules'])
+
+
+@unittest.skipIf(_pytest_plugin is None, 'pytest not found')
+class TestConfigure(unittest.TestCase):
+    class FakeConfig(object):
+        def __init__(self, **options):
+            self.options = options
+
+        def addinivalue_line(self, name, line):
+            pass
+
+        def getoption(self, name, default=None):
+            return self.options.get(name, default)
+
+    def test_allowance_stats_reset(self):
+        from datatest import allowance
+        config = self.FakeConfig(**{'--datatest-allowance-stats': True})
+
+        _pytest_plugin.pytest_configure(config)
+        self.assertEqual(allowance._stats_log, [])
+        _pytest_plugin._allowance_stats.append(('test_a.py::test_a', None))
+
+        _pytest_plugin.pytest_unconfigure(config)
+        self.assertEqual(_pytest_plugin._allowance_stats, [])
+        self.assertIsNone(allowance._stats_log)
+
+        _pytest_plugin._allowance_stats.append(('test_b.py::test_b', None))
+        _pytest_plugin.pytest_configure(self.FakeConfig())  # <- Stats disabled.
+        try:
+            self.assertEqual(_pytest_plugin._allowance_stats, [])
+            self.assertIsNone(allowance._stats_log)
+        finally:
+            _pytest_plugin.pytest_unconfigure(config)
+
+
+class FakeTerminalWriter(object):
+    def __init__(self):
+        self.calls = []
+
+    def line(self, text, **markup):
+        self.calls.append((text, markup.get('red', False)))
+
+
+def make_entry(lines):
+    return _pytest_plugin.DatatestReprEntry(
+        ReprEntry(lines, None, None, None, 'long'))
+
+
+@unittest.skipIf(_pytest_plugin is None, 'pytest not found')
+class TestDatatestReprEntry(unittest.TestCase):
+    def setUp(self):
+        self.lines = [
+            '    def test_data():',
+            '>       validate(data, int)',
+            'E   datatest.ValidationError: does not satisfy int (2 differences): [',
+            "E       Invalid('a'),",
+            "E       Invalid('b'),",
+            'E   ]',
+            '',
+            'test_data.py:3: ValidationError',
+        ]
+
+    def test_iterlines(self):
+        entry = make_entry(self.lines)
+        expected = [
+            ('    def test_data():', False),
+            ('>       validate(data, int)', False),
+            ('E   ValidationError: does not satisfy int (2 differences): [', True),
+            ("        Invalid('a'),", True),
+            ("        Invalid('b'),", True),
+            ('    ]', True),
+            ('', False),
+            ('test_data.py:3: ValidationError', False),
+        ]
+        self.assertEqual(list(entry._iterlines()), expected)
+
+    def test_iterlines_no_differences(self):
+        lines = [
+            '>       assert 1 == 2',
+            'E       assert 1 == 2',
+        ]
+        entry = make_entry(lines)
+        expected = [(lines[0], False), (lines[1], True)]
+        self.assertEqual(list(entry._iterlines()), expected)
+
+        lines = self.lines[:5]  # <- Start found but no stop.
+        entry = make_entry(lines)
+        self.assertEqual([x for x, _ in entry._iterlines()], lines)
+
+    def test_writelines_by_markup(self):
+        tw = FakeTerminalWriter()
+        make_entry(self.lines)._writelines(tw)
+        expected = [
+            ('    def test_data():\n>       validate(data, int)', False),
+            ('E   ValidationError: does not satisfy int (2 differences): [\n'
+             "        Invalid('a'),\n"
+             "        Invalid('b'),\n"
+             '    ]', True),
+            ('\ntest_data.py:3: ValidationError', False),
+        ]
+        self.assertEqual(tw.calls, expected)
+
+    def test_writelines_chunk_size(self):
+        original_size = _pytest_plugin._chunk_size
+        _pytest_plugin._chunk_size = 2
+        try:
+            tw = FakeTerminalWriter()
+            make_entry(['E   1', 'E   2', 'E   3', 'x', 'E   4', 'E   5'])._writelines(tw)
+        finally:
+            _pytest_plugin._chunk_size = original_size
+
+        expected = [
+            ('E   1\nE   2', True),
+            ('E   3', True),
+            ('x', False),
+            ('E   4\nE   5', True),
+        ]
+        self.assertEqual(tw.calls, expected)
+
+    def test_writelines_empty(self):
+        tw = FakeTerminalWriter()
+        make_entry([])._writelines(tw)
+        self.assertEqual(tw.calls, [])
+
+
+@unittest.skipIf(_pytest_plugin is None, 'pytest not found')
+class TestMakeReport(unittest.TestCase):
+    class FakeExcInfo(object):
+        def __init__(self, value):
+            self.value = value
+
+        def errisinstance(self, exc_type):
+            return isinstance(self.value, exc_type)
+
+    class FakeOutcome(object):
+        def __init__(self, result):
+            self.result = result
+
+        def get_result(self):
+            return self.result
+
+    class FakeObject(object):
+        def __init__(self, **kwds):
+            self.__dict__.update(kwds)
+
+    def run_hook(self, entries):
+        """Run the pytest_runtest_makereport() hook wrapper for a
+        failed test and return the resulting report entries.
+        """
+        obj = self.FakeObject
+        config = obj(option=obj(verbose=2), getoption=lambda *args: False)
+        item = obj(config=config, nodeid='test_data.py::test_data',
+                   name='test_data', get_marker=lambda name: None)
+        error = ValidationError([Invalid('a')], 'does not satisfy int')
+        call = obj(when='call', excinfo=self.FakeExcInfo(error))
+        result = obj(longrepr=obj(reprtraceback=obj(reprentries=entries)))
+
+        hook = _pytest_plugin.pytest_runtest_makereport(item, call)
+        next(hook)
+        with self.assertRaises(StopIteration):
+            hook.send(self.FakeOutcome(result))
+        return entries
+
+    def test_wraps_last_entry(self):
+        first = ReprEntry(['    first()'], None, None, None, 'long')
+        last = ReprEntry(['E   error'], None, None, None, 'long')
+        entries = self.run_hook([first, last])
+
+        self.assertIs(entries[0], first)
+        self.assertIsInstance(entries[1], _pytest_plugin.DatatestReprEntry)
+        self.assertEqual(entries[1].lines, ['E   error'])
+
+    def test_other_last_entry(self):
+        first = ReprEntry(['    first()'], None, None, None, 'long')
+        last = object()  # <- Not a ReprEntry (e.g., native traceback).
+        entries = self.run_hook([first, last])
+        self.assertIs(entries[0], first)
+        self.assertIs(entries[1], last)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,7 +3,9 @@ from __future__ import absolute_import
 from __future__ import division
 import os
 import re
+import shutil
 import sqlite3
+import sys
 import tempfile
 import textwrap
 from . import _io as io
@@ -14,6 +16,7 @@ from datatest._compatibility import collections
 from datatest._utils import nonstringiter
 
 from datatest._load.working_directory import working_directory
+from datatest._query import query as query_module
 from datatest._query.query import (
     BaseElement,
     _is_collection_of_items,
@@ -1312,3 +1315,74 @@ class TestSelector(unittest.TestCase):
         expected = {'a': ['x', 'x', 'y', 'z'], 'b': ['z', 'y', 'x']}
         self.assertIsInstance(query, Query)
         self.assertEqual(query.fetch(), expected)
+
+
+class TestSharedDatabase(unittest.TestCase):
+    def setUp(self):
+        self.temporary_dir = tempfile.mkdtemp()
+        self.csv_path = os.path.join(self.temporary_dir, 'data.csv')
+        with open(self.csv_path, 'wb') as fh:
+            fh.write(b'A,B\nx,1\ny,2\nx,3\n')
+
+        self.db_path = os.path.join(self.temporary_dir, 'shared.db')
+        query_module._create_shared_database(self.db_path)
+        query_module._use_shared_database(self.db_path)
+
+    def tearDown(self):
+        query_module._use_shared_database(None)
+        shutil.rmtree(self.temporary_dir)
+
+    def test_load_once(self):
+        select = Selector(self.csv_path)
+        self.assertTrue(select._table.startswith('shared_'))
+        self.assertEqual(select('A').fetch(), ['x', 'y', 'x'])
+
+        # Simulate another process (with its own connections) and
+        # check that it reuses the table instead of building it.
+        query_module._use_shared_database(self.db_path)
+        build_shared_table = query_module._build_shared_table
+        def fail(*args, **kwds):
+            raise AssertionError('should not build table again')
+        query_module._build_shared_table = fail
+        try:
+            other = Selector(self.csv_path)
+        finally:
+            query_module._build_shared_table = build_shared_table
+        self.assertEqual(other._table, select._table)
+        self.assertEqual(other({'A': 'B'}).fetch(), {'x': ['1', '3'], 'y': ['2']})
+
+    def test_table_names(self):
+        select1 = Selector(self.csv_path)
+        select2 = Selector(self.csv_path, encoding='utf-8')  # <- Other args.
+        self.assertNotEqual(select1._table, select2._table)
+
+    def test_non_file_data(self):
+        select = Selector([['A', 'B'], ['x', '1']])
+        self.assertFalse(select._table.startswith('shared_'))
+
+    def test_load_more_data(self):
+        select = Selector(self.csv_path)
+        shared_table = select._table
+        select.create_index('A')
+        select.load_data([['A', 'B'], ['z', '4']])
+
+        self.assertNotEqual(select._table, shared_table)
+        self.assertEqual(sorted(select('A').fetch()), ['x', 'x', 'y', 'z'])
+        self.assertEqual(select._indexes, [('A',)])
+
+        other = Selector(self.csv_path)  # <- Shared table is unchanged.
+        self.assertEqual(other._table, shared_table)
+        self.assertEqual(sorted(other('A').fetch()), ['x', 'x', 'y'])
+
+    def test_create_index(self):
+        select = Selector(self.csv_path)
+        select.create_index('A')
+        cursor = select._connection.cursor()
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='index'")
+        self.assertEqual(cursor.fetchall(), [('idx_{0}_A'.format(select._table),)])
+
+    @unittest.skipIf(sys.version_info[:2] < (3, 4), 'requires URI support')
+    def test_read_only(self):
+        select = Selector(self.csv_path)
+        with self.assertRaises(sqlite3.OperationalError):
+            select._connection.execute('CREATE TABLE foo (a)')
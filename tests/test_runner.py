@@ -1,13 +1,22 @@
 # -*- coding: utf-8 -*-
+import gc
+import os
+from . import _io as io
 from . import _unittest as unittest
+from .common import MkdtempTestCase
 from datatest import DataTestCase
 from datatest import ValidationError
 from datatest import Missing
 
+from datatest import runner
 from datatest.runner import DataTestResult
+from datatest.runner import DataTestRunner
 from datatest.runner import skip
 from datatest.runner import mandatory
 from datatest.runner import _sort_key
+from datatest.runner import _WatchSuite
+from datatest._query.query import Selector
+from datatest._query.query import _reload_selectors
 
 
 class TestDataTestResult(unittest.TestCase):
@@ -81,3 +90,172 @@ class TestOrdering(unittest.TestCase):
         mandatory_line_no = reference_line_no + 7
         _, line_no = _sort_key(mandatory_case)
         self.assertEqual(mandatory_line_no, line_no)
+
+    def test_sort_key_no_code_object(self):
+        class CallableTest(object):
+            def __call__(self):
+                pass
+
+        class SampleCase(unittest.TestCase):
+            def test_reference(self):  # <- This line number used as reference.
+                pass                         # +1
+                                             # +2
+            test_callable = CallableTest()   # +3
+
+        _, reference_line_no = _sort_key(SampleCase('test_reference'))
+        _, line_no = _sort_key(SampleCase('test_callable'))
+        self.assertEqual(reference_line_no + 3, line_no)
+
+    def test_sort_key_shared_name(self):
+        """Classes with attributes of the same name should each use
+        the line number from their own class body.
+        """
+        class CallableTest(object):
+            def __call__(self):
+                pass
+
+        class FirstCase(unittest.TestCase):
+            def test_reference(self):  # <- This line number used as reference.
+                pass                         # +1
+            test_shared = CallableTest()     # +2
+
+        class SecondCase(unittest.TestCase):  # +4
+            def test_other(self):            # +5
+                pass                         # +6
+                                             # +7
+            test_shared = CallableTest()     # +8
+
+        _, reference_line_no = _sort_key(FirstCase('test_reference'))
+        _, line_no = _sort_key(FirstCase('test_shared'))
+        self.assertEqual(reference_line_no + 2, line_no)
+        _, line_no = _sort_key(SecondCase('test_shared'))
+        self.assertEqual(reference_line_no + 8, line_no)
+
+
+class TestWatch(MkdtempTestCase):
+    def setUp(self):
+        super(TestWatch, self).setUp()
+        with open('a.csv', 'w') as fh:
+            fh.write('A\n1\n2\n')
+        with open('b.csv', 'w') as fh:
+            fh.write('B\nx\n')
+
+    def test_reload_selectors(self):
+        select_a = Selector('a.csv')
+        select_a.create_index('A')
+        select_b = Selector('b.csv')
+        select_b_table = select_b._table
+
+        with open('a.csv', 'w') as fh:
+            fh.write('A\n1\n2\n3\n')
+        reloaded, not_reloaded, failed = _reload_selectors([os.path.abspath('a.csv')])
+
+        self.assertEqual(reloaded, [select_a])
+        self.assertEqual(not_reloaded, [])
+        self.assertEqual(failed, [])
+        self.assertEqual(select_a('A').fetch(), ['1', '2', '3'])
+        self.assertEqual(select_a._indexes, [('A',)])
+        self.assertEqual(repr(select_a), "<Selector 'a.csv'>")
+        self.assertEqual(select_b._table, select_b_table)  # <- Not reloaded.
+
+    def test_reload_failure(self):
+        """A failed reload should keep the Selector's previous data."""
+        select_a = Selector('a.csv')
+        select_a.create_index('A')
+        table = select_a._table
+
+        os.remove('a.csv')
+        reloaded, not_reloaded, failed = _reload_selectors([os.path.abspath('a.csv')])
+        self.assertEqual(reloaded, [])
+        self.assertEqual(len(failed), 1)
+        self.assertIs(failed[0][0], select_a)
+        self.assertIsInstance(failed[0][1], EnvironmentError)  # <- FileNotFoundError
+
+        self.assertEqual(select_a._table, table)
+        self.assertEqual(select_a('A').fetch(), ['1', '2'])
+        self.assertEqual(len(select_a._loads), 1)
+        self.assertEqual(select_a._indexes, [('A',)])
+
+        with open('a.csv', 'w') as fh:  # <- Reloads once file is restored.
+            fh.write('A\n3\n')
+        reloaded, _, failed = _reload_selectors([os.path.abspath('a.csv')])
+        self.assertEqual((reloaded, failed), ([select_a], []))
+        self.assertEqual(select_a('A').fetch(), ['3'])
+
+        del select_a, failed  # Remove Selector from _file_selectors (the
+        gc.collect()          # exception's traceback made a ref cycle).
+
+    def test_watch_reload_failure(self):
+        """Watch mode should report a failed reload and keep polling."""
+        class SampleCase(DataTestCase):
+            @classmethod
+            def setUpClass(cls):
+                cls.select = Selector('a.csv')
+
+            def test_a(self):
+                self.assertValid(self.select('A'), lambda x: x.isdigit())
+
+        def remove_file():
+            os.remove('a.csv')
+
+        def restore_file():
+            with open('a.csv', 'w') as fh:
+                fh.write('A\n1\n2\n3\nx\n')  # <- Makes test fail.
+
+        def interrupt():
+            raise KeyboardInterrupt
+
+        steps = [remove_file, restore_file, interrupt]
+
+        class FakeTime(object):
+            @staticmethod
+            def sleep(interval):
+                steps.pop(0)()
+
+        stream = io.StringIO()
+        original_time = runner.time
+        runner.time = FakeTime
+        try:
+            suite = unittest.TestSuite([SampleCase('test_a')])
+            result = DataTestRunner(stream=stream).watch(suite)
+        finally:
+            runner.time = original_time
+
+        self.assertEqual(steps, [])
+        self.assertIn("Unable to reload <Selector 'a.csv'>", stream.getvalue())
+        self.assertEqual(len(result.failures), 1, 'should re-run after restore')
+
+    def test_watch_suite(self):
+        calls = []
+
+        class SampleCase(DataTestCase):
+            @classmethod
+            def setUpClass(cls):
+                calls.append('setUpClass')
+                cls.select = Selector('a.csv')
+
+            @classmethod
+            def tearDownClass(cls):
+                calls.append('tearDownClass')
+
+            def test_a(self):
+                self.assertValid(self.select('A'), lambda x: x.isdigit())
+
+            def test_b(self):
+                self.assertValid(Selector('b.csv')('B'), 'x')
+
+        test_a = SampleCase('test_a')
+        test_b = SampleCase('test_b')
+        suite = _WatchSuite([test_a, test_b])
+        result = suite(DataTestResult())
+        self.assertTrue(result.wasSuccessful())
+        self.assertEqual(suite.inputs[test_a], set([os.path.abspath('a.csv')]))
+        self.assertEqual(suite.inputs[test_b], set([os.path.abspath('b.csv')]))
+
+        suite.tests = [test_a]
+        result = suite(DataTestResult())
+        self.assertEqual(result.testsRun, 1)
+        self.assertEqual(calls, ['setUpClass'])  # <- Fixture kept.
+
+        self.assertEqual(suite.close(), [])
+        self.assertEqual(calls, ['setUpClass', 'tearDownClass'])
@@ -43,6 +43,26 @@ class TestGetArgLengths(unittest.TestCase):
                 _utils._get_arg_lengths(max)
 
 
+class TestSafesortKey(unittest.TestCase):
+    def test_mixed_types(self):
+        text = b'abc'.decode('ascii')  # <- Unicode in Python 2.
+        values = [(1, 'b'), text, None, 2.5, 'a', 1]
+        values = sorted(values, key=_utils._safesort_key)
+        self.assertEqual(values, [None, 1, 2.5, 'a', text, (1, 'b')])
+
+    def test_unicode_is_text(self):
+        """In Python 2, unicode values must be sorted as text. If they
+        were treated as iterables, single-character strings would be
+        split into themselves without end.
+        """
+        text = b'a'.decode('ascii')
+        self.assertEqual(_utils._safesort_key(text), (2, text))
+
+        values = [b'b'.decode('ascii'), (text,), 'c', text]
+        values = sorted(values, key=_utils._safesort_key)
+        self.assertEqual(values, [text, b'b'.decode('ascii'), 'c', (text,)])
+
+
 class TestExpectsMultipleParams(unittest.TestCase):
     def test_zero(self):
         def userfunc():
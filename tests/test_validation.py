@@ -1,7 +1,9 @@
 """Tests for validation and comparison functions."""
+import datetime
 import re
 import textwrap
 from . import _unittest as unittest
+from .common import MkdtempTestCase
 from datatest._utils import exhaustible
 
 from datatest.difference import BaseDifference
@@ -11,6 +13,7 @@ from datatest.difference import Invalid
 from datatest.difference import Deviation
 from datatest.difference import NOTFOUND
 
+from datatest import validation
 from datatest.validation import _require_sequence
 from datatest.validation import _require_set
 from datatest.validation import _require_predicate
@@ -20,12 +23,21 @@ from datatest.validation import _apply_mapping_requirement
 from datatest.validation import _normalize_data
 from datatest.validation import _normalize_requirement
 from datatest.validation import _get_invalid_info
+from datatest.validation import _get_sql_comparison
+from datatest.validation import _merge_sorted_items
+from datatest.validation import _is_sorted_mapping_query
 from datatest.validation import ValidationError
+from datatest.validation import _DifferenceStore
+from datatest.validation import _iter_sorted
+from datatest._compatibility.decimal import Decimal
 from datatest.validation import valid
 from datatest.validation import validate
+from datatest.validation import validate_schema
+from datatest.validation import _get_schema_invalid_info
 
 from datatest._query.query import DictItems
 from datatest._query.query import Result
+from datatest._query.query import Selector
 
 try:
     import pandas
@@ -580,6 +592,32 @@ class TestApplyMappingRequirement(unittest.TestCase):
         result = _apply_mapping_requirement(empty, nonempty)
         self.assertEqual(dict(result), {'a': [Missing('x')]})
 
+    def test_shared_predicate_compiled_once(self):
+        calls = []
+        original = validation.get_predicate
+        def get_predicate(obj):
+            calls.append(obj)
+            return original(obj)
+
+        regex = re.compile('^[a-z]$')
+        pred = (int, regex)
+        data = {'a': (1, 'x'), 'b': [(2, 'y'), (3, 'Z')], 'c': (4, 'Z')}
+        requirement = {'a': pred, 'b': pred, 'c': pred, 'd': pred}
+
+        validation.get_predicate = get_predicate
+        try:
+            result = dict(_apply_mapping_requirement(data, requirement))
+        finally:
+            validation.get_predicate = original
+
+        self.assertEqual(calls, [pred])
+        expected = {
+            'b': [Invalid((3, 'Z'))],
+            'c': Invalid((4, 'Z'), expected=pred),
+            'd': Missing(pred),
+        }
+        self.assertEqual(result, expected)
+
 
 class TestDataRequirementNormalization(unittest.TestCase):
     def test_normalize_data(self):
@@ -767,6 +805,215 @@ class TestGetDifferenceInfo(unittest.TestCase):
         self.assertEqual(list(diffs), [Missing('y')])
 
 
+class TestSqlComparison(unittest.TestCase):
+    """Selector queries are compared inside SQLite when possible,
+    these results must match the normal Python behavior.
+    """
+    def setUp(self):
+        self.select = Selector([
+            ['A', 'B', 'C'],
+            ['x', 'foo', '1'],
+            ['x', 'bar', '2'],
+            ['y', 'foo', '3'],
+            ['z', 'baz', '4'],
+            ['z', 'baz', '5'],
+        ])
+
+    def assertSameInfo(self, query, requirement):
+        python_query = query.map(lambda x: x)  # Step disables SQL handling.
+        sql_info = _get_invalid_info(query, requirement)
+        python_info = _get_invalid_info(python_query, requirement)
+        if python_info is None:
+            self.assertIsNone(sql_info)
+            return  # <- EXIT!
+
+        self.assertEqual(sql_info[0], python_info[0])
+        sql_diffs, python_diffs = sql_info[1], python_info[1]
+        if isinstance(python_diffs, DictItems):
+            self.assertEqual(dict(sql_diffs), dict(python_diffs))
+        else:
+            self.assertEqual(sorted(sql_diffs, key=repr), sorted(python_diffs, key=repr))
+
+    def test_get_sql_comparison(self):
+        query = self.select('B')
+        self.assertIsNotNone(_get_sql_comparison(query, set(['foo'])))
+        self.assertIsNone(_get_sql_comparison(query.distinct(), set(['foo'])))
+        self.assertIsNone(_get_sql_comparison(query, set([re.compile('f')])))
+        self.assertIsNone(_get_sql_comparison(query, set([True])))
+        self.assertIsNone(_get_sql_comparison(query, 'foo'))
+
+        query = self.select({'A': 'B'})
+        self.assertIsNotNone(_get_sql_comparison(query, {'x': 'foo'}))
+        self.assertIsNone(_get_sql_comparison(query, {'x': set(['foo'])}))
+        self.assertIsNone(_get_sql_comparison(query, set(['foo'])))
+
+    def test_set_requirement(self):
+        self.assertSameInfo(self.select('B'), set(['foo', 'bar', 'baz']))
+        self.assertSameInfo(self.select('B'), set(['foo', 'qux']))
+        self.assertSameInfo(self.select({'B'}), set(['foo', 'qux']))
+        self.assertSameInfo(self.select('B', A='x'), set(['foo', 'baz']))
+        self.assertSameInfo(self.select(('A', 'B')), set([('x', 'foo'), ('q', 'q')]))
+
+        msg, diffs = _get_invalid_info(self.select('B'), set(['foo', 'qux']))
+        expected = [Extra('bar'), Extra('baz'), Missing('qux')]
+        self.assertEqual(sorted(diffs, key=repr), expected)
+
+    def test_mapping_requirement(self):
+        requirement = {'x': 'foo', 'y': 'foo', 'z': 'baz'}
+        self.assertSameInfo(self.select({'A': 'B'}), requirement)
+
+        requirement = {'x': 'foo', 'z': 'qux', 'q': 'foo'}
+        self.assertSameInfo(self.select({'A': 'B'}), requirement)
+        self.assertSameInfo(self.select({'A': 'B'}, C=['1', '2']), requirement)
+
+        requirement = {'x': 1, 'y': '3', 'q': 5}  # Numbers vs strings.
+        self.assertSameInfo(self.select({'A': 'C'}), requirement)
+
+        requirement = {('x', 'foo'): '1', ('z', 'baz'): '9', ('q', 'q'): 'q'}
+        self.assertSameInfo(self.select({('A', 'B'): 'C'}), requirement)
+
+        msg, diffs = _get_invalid_info(self.select({'A': 'B'}), {'x': 'foo', 'q': 'foo'})
+        expected = {
+            'x': [Invalid('bar')],
+            'y': [Extra('foo')],
+            'z': [Extra('baz'), Extra('baz')],
+            'q': Missing('foo'),
+        }
+        self.assertEqual(dict(diffs), expected)
+
+
+class TestSortedMerge(unittest.TestCase):
+    def test_merge_sorted_items(self):
+        data = iter([('a', 1), ('b', 2), ('d', 4)])
+        requirement = iter([('a', 1), ('c', 3), ('d', 5), ('e', 6)])
+        result = list(_merge_sorted_items(data, requirement))
+        expected = [
+            ('a', 1, 1),
+            ('b', 2, NOTFOUND),
+            ('c', NOTFOUND, 3),
+            ('d', 4, 5),
+            ('e', NOTFOUND, 6),
+        ]
+        self.assertEqual(result, expected)
+
+    def test_merge_mixed_types(self):
+        """Keys should use SQLite's sort order (NULL, numbers, text)."""
+        data = iter([(None, 'x'), (1, 'x'), ('1', 'x')])
+        requirement = iter([(1.0, 'y'), ('1', 'y'), ('a', 'y')])
+        result = list(_merge_sorted_items(data, requirement))
+        expected = [
+            (None, 'x', NOTFOUND),
+            (1, 'x', 'y'),
+            ('1', 'x', 'y'),
+            ('a', NOTFOUND, 'y'),
+        ]
+        self.assertEqual(result, expected)
+
+    def test_query_requirement(self):
+        select1 = Selector([['A', 'B'], ['x', 1], ['y', 2], ['y', 3], ['z', 4]])
+        select2 = Selector([['A', 'B'], ['x', 1], ['y', 4], ['q', 5], ['z', 4]])
+        query1 = select1({'A': 'B'}).sum()
+        query2 = select2({'A': 'B'}).sum()
+        self.assertTrue(_is_sorted_mapping_query(query1))
+        self.assertTrue(_is_sorted_mapping_query(query2))
+
+        msg, diffs = _get_invalid_info(query1, query2)
+        self.assertEqual(msg, 'does not satisfy mapping requirement')
+        expected = {'y': Deviation(+1, 4), 'q': Deviation(-5, 5)}
+        self.assertEqual(dict(diffs), expected)
+
+        self.assertIsNone(_get_invalid_info(query1, select1({'A': 'B'}).sum()))
+
+
+class TestSchemaValidation(unittest.TestCase):
+    def setUp(self):
+        self.rows = [
+            {'A': 'x', 'B': '1', 'C': '5'},
+            {'A': 'y', 'B': '2', 'C': '1'},
+            {'A': 'q', 'B': 'b', 'C': '4'},
+        ]
+
+    def test_valid(self):
+        schema = {'A': set(['x', 'y', 'q']), 'B': re.compile('^[a-z0-9]$')}
+        self.assertIsNone(_get_schema_invalid_info(self.rows, schema))
+
+    def test_differences_by_field(self):
+        schema = {
+            'A': set(['x', 'y', 'z']),
+            'B': re.compile('^[0-9]$'),
+            'C': ['5', '1', '4'],
+        }
+        msg, diffs = _get_schema_invalid_info(self.rows, schema)
+        self.assertEqual(msg, 'does not satisfy schema requirement')
+        expected = {
+            'A': [Missing('z'), Extra('q')],
+            'B': [Invalid('b')],
+        }
+        self.assertEqual(diffs, expected)
+
+    def test_sequence_requirement(self):
+        schema = {'A': ['x', 'z', 'q']}
+        msg, diffs = _get_schema_invalid_info(self.rows, schema)
+        self.assertEqual(diffs, {('A', (1, 2)): [Invalid('y', 'z')]})
+
+        schema = {'A': ['x', 'q'], 'B': ['0', '1', '2', 'b']}
+        msg, diffs = _get_schema_invalid_info(self.rows, schema)
+        expected = {
+            ('A', (1, 2)): [Extra('y')],
+            ('B', (0, 0)): [Missing('0')],
+        }
+        self.assertEqual(diffs, expected)
+
+    def test_unicode_field_names(self):
+        try:
+            text = unicode  # `unicode` removed in Python 3.0
+        except NameError:
+            text = str
+        ab, cd, x, y, z = text('AB'), text('CD'), text('x'), text('y'), text('z')
+
+        rows = [{ab: x, cd: text('1')}, {ab: y, cd: text('b')}]
+        schema = {ab: set([x, y]), cd: re.compile('^[0-9]$')}
+        msg, diffs = _get_schema_invalid_info(rows, schema)
+        self.assertEqual(diffs, {cd: [Invalid(text('b'))]})
+
+        schema = {ab: [x, z]}  # <- Text sequence is not a string.
+        msg, diffs = _get_schema_invalid_info(rows, schema)
+        self.assertEqual(diffs, {(ab, (1, 2)): [Invalid(y, z)]})
+
+    def test_multiple_fields(self):
+        def ordered(row):
+            low, high = row
+            return low <= high
+
+        schema = {('B', 'C'): ordered}
+        msg, diffs = _get_schema_invalid_info(self.rows, schema)
+        self.assertEqual(diffs, {('B', 'C'): [Invalid(('2', '1')), Invalid(('b', '4'))]})
+
+    def test_selector(self):
+        select = Selector([['A', 'B'], ['x', '1'], ['y', '2'], ['z', 'b']])
+        schema = {'A': set(['x', 'y', 'z']), 'B': re.compile('^[0-9]$')}
+        msg, diffs = _get_schema_invalid_info(select, schema)
+        self.assertEqual(diffs, {'B': [Invalid('b')]})
+
+        with self.assertRaises(LookupError):
+            _get_schema_invalid_info(select, {'D': 'x'})
+
+    def test_bad_schema(self):
+        with self.assertRaises(TypeError):
+            _get_schema_invalid_info(self.rows, set(['A']))
+
+        with self.assertRaises(TypeError):
+            _get_schema_invalid_info(self.rows, {'A': {'x': 1}})
+
+    def test_validate_schema(self):
+        self.assertIsNone(validate_schema(self.rows, {'A': str}))
+
+        with self.assertRaises(ValidationError) as cm:
+            validate_schema(self.rows, {'A': 'x'}, msg='bad A')
+        self.assertEqual(cm.exception.description, 'bad A')
+        self.assertEqual(cm.exception.differences, {'A': [Invalid('y'), Invalid('q')]})
+
+
 # FOR TESTING: A minimal subclass of BaseDifference.
 # BaseDifference itself should not be instantiated
 # directly.
@@ -776,6 +1023,22 @@ class MinimalDifference(BaseDifference):
         return BaseDifference.args.fget(self)
 
 
+class TestIterSorted(unittest.TestCase):
+    def test_same_as_sorted(self):
+        values = [5, 3, 9, 1, 3, 7, 0, 3]
+        key = lambda x: x % 4  # <- Has ties, order must be stable.
+        self.assertEqual(list(_iter_sorted(values, key)), sorted(values, key=key))
+
+    def test_lazy(self):
+        keys_made = []
+        def key(x):
+            keys_made.append(x)
+            return x
+        iterator = _iter_sorted([3, 1, 2], key)
+        self.assertEqual(keys_made, [])
+        self.assertEqual(next(iterator), 1)
+
+
 class TestValidationError(unittest.TestCase):
     def test_error_list(self):
         error_list = [MinimalDifference('A'), MinimalDifference('B')]
@@ -789,6 +1052,35 @@ class TestValidationError(unittest.TestCase):
 
         err = ValidationError(error_iter)
         self.assertEqual(err.differences, error_list, 'iterable should be converted to list')
+        self.assertIsInstance(err.differences, list)
+
+    def test_error_iter_store(self):
+        """Exhaustible iterators should be loaded into a compact store
+        that is converted to a list when the differences are accessed.
+        """
+        diffs = [Missing('A'), Extra('B'), Invalid('C'), Invalid('D', 'E'),
+                 Deviation(-1, 3), MinimalDifference('F')]
+
+        err = ValidationError(iter(diffs))
+        store = err._get_differences()
+        self.assertIsInstance(store, _DifferenceStore)
+        self.assertEqual(len(store), 6)
+        self.assertEqual(list(store), diffs)
+        self.assertEqual(store[3], Invalid('D', 'E'))
+        self.assertEqual(store[-1], MinimalDifference('F'))
+        self.assertEqual(store[1:3], [Extra('B'), Invalid('C')])
+        self.assertEqual(store, diffs)
+        self.assertEqual(diffs, store)
+        self.assertNotEqual(store, diffs[:-1])
+        self.assertEqual(repr(store), repr(diffs))
+        self.assertEqual(str(err).splitlines()[0], '6 differences: [')
+        self.assertIs(err._get_differences(), store, 'formatting keeps store')
+
+        differences = err.differences
+        self.assertIsInstance(differences, list)
+        self.assertEqual(differences, diffs)
+        differences.append(Missing('G'))
+        self.assertIs(err.differences, differences, 'should keep the same list')
 
     def test_error_dict(self):
         error_dict = {'a': MinimalDifference('A'), 'b': MinimalDifference('B')}
@@ -803,6 +1095,31 @@ class TestValidationError(unittest.TestCase):
         err = ValidationError(error_iteritems)
         self.assertEqual(err.differences, error_dict)
 
+    def test_error_items_store(self):
+        """Mapping items should be kept in a compact store that is
+        loaded into a dictionary when the differences are needed.
+        """
+        items = DictItems(iter([
+            ('a', [Invalid('x'), Deviation(-1, 3)]),
+            ('b', [Missing('y')]),  # <- List of one difference.
+            ('c', Extra('z')),
+        ]))
+        err = ValidationError(items)
+        pending = err._pending
+        self.assertIsInstance(pending._store, _DifferenceStore)
+        self.assertEqual(len(pending), 4)
+
+        expected = {
+            'a': [Invalid('x'), Deviation(-1, 3)],
+            'b': [Missing('y')],
+            'c': Extra('z'),
+        }
+        self.assertEqual(err.differences, expected)
+        self.assertIsNone(err._pending)
+
+        with self.assertRaises(ValueError):
+            ValidationError(DictItems(iter([])))
+
     def test_single_diff(self):
         single_diff = MinimalDifference('A')
         err = ValidationError(single_diff)
@@ -971,6 +1288,58 @@ class TestValidationError(unittest.TestCase):
         truncation_plus_notice = textwrap.dedent(truncation_plus_notice).strip()
         self.assertEqual(str(err), truncation_plus_notice)
 
+    def test_str_truncation_order(self):
+        """Truncated output should use the same order as full output."""
+        values = [3, 'b', None, (1, 'x'), 2.5, 'a', (1, 2), True, 0, 'b']
+        err = ValidationError([MinimalDifference(x) for x in values])
+        full_lines = str(err).splitlines()
+
+        err._should_truncate = lambda line_count, char_count: line_count > 5
+        truncated_lines = str(err).splitlines()
+        self.assertEqual(truncated_lines[0], '10 differences: [')
+        self.assertEqual(truncated_lines[1:6], full_lines[1:6])
+        self.assertEqual(truncated_lines[6], '    ...')
+
+    def test_str_cached(self):
+        calls = []
+        def should_truncate(line_count, char_count):
+            calls.append(line_count)
+            return line_count > 1
+
+        err = ValidationError(iter([MinimalDifference('A'), MinimalDifference('B')]))
+        err._should_truncate = should_truncate
+        first = str(err)
+        self.assertEqual(str(err), first)
+        self.assertEqual(calls, [1, 2], msg='second call should use cache')
+
+        err._truncation_notice = 'Message truncated.'  # <- Changed setting.
+        self.assertNotEqual(str(err), first)
+
+        with self.assertRaises(ValidationError) as cm:
+            validate([1, 2, 3], set([1]))
+        self.assertTrue(cm.exception._owned, 'errors from validate() are cached')
+
+    def test_str_not_cached_when_mutable(self):
+        """Containers that other code can change in place are not
+        cached (a change might not alter their length).
+        """
+        differences = [Missing(1), Missing(2)]
+        err = ValidationError(differences)  # <- Caller holds the list.
+        first = str(err)
+        differences[0] = Missing(9)
+        self.assertNotEqual(str(err), first)
+
+        err = ValidationError(iter([Missing(1), Missing(2)]))
+        first = str(err)
+        err.differences[0] = Missing(9)  # <- Attribute hands out the list.
+        self.assertNotEqual(str(err), first)
+
+        mapping = {'a': Missing(1)}
+        err = ValidationError(getattr(mapping, 'iteritems', mapping.items)())
+        first = str(err)
+        err.differences['a'] = Missing(9)
+        self.assertNotEqual(str(err), first)
+
     def test_repr(self):
         err = ValidationError([MinimalDifference('A')])  # <- No description.
         expected = "ValidationError([MinimalDifference('A')])"
@@ -1013,6 +1382,73 @@ class TestValidationError(unittest.TestCase):
         self.assertEqual(err.args, ([MinimalDifference('A')], None))
 
 
+class TestValidationErrorDump(MkdtempTestCase):
+    def test_list(self):
+        diffs = [
+            Missing('A'),
+            Extra(('B', 2)),
+            Invalid(Decimal('1.5'), expected=datetime.date(2020, 1, 31)),
+            Deviation(-1.5, 3),
+            MinimalDifference(set(['x']), [1, None]),
+        ]
+        ValidationError(diffs, 'my description').dump('diffs.jsonl')
+
+        err = ValidationError.load('diffs.jsonl')
+        self.assertEqual(err.differences, diffs)
+        self.assertEqual(err.description, 'my description')
+
+    def test_mapping_and_gzip(self):
+        diffs = {
+            'A': Missing(1),
+            ('B', 2): [Invalid('x'), Invalid(datetime.datetime(2020, 1, 31, 12, 30))],
+        }
+        ValidationError(diffs).dump('diffs.jsonl.gz')
+
+        with open('diffs.jsonl.gz', 'rb') as fh:
+            self.assertEqual(fh.read(2), b'\x1f\x8b')  # <- Gzip magic number.
+
+        err = ValidationError.load('diffs.jsonl.gz')
+        self.assertEqual(err.differences, diffs)
+        self.assertIsNone(err.description)
+
+    def test_unencodable_value(self):
+        """Objects without an encoding are saved as repr strings."""
+        ValidationError([Invalid(object)]).dump('diffs.jsonl')
+        err = ValidationError.load('diffs.jsonl')
+        self.assertEqual(err.differences, [Invalid(repr(object))])
+
+    def test_load_is_lazy(self):
+        ValidationError([Missing('A'), Extra('B')]).dump('diffs.jsonl')
+        err = ValidationError.load('diffs.jsonl')
+        self.assertIsNotNone(err._pending, msg='not read until needed')
+        self.assertEqual(err.differences, [Missing('A'), Extra('B')])
+
+    def test_unknown_difference_type(self):
+        """Loading must not import modules or call other objects."""
+        with open('diffs.jsonl', 'w') as fh:
+            fh.write('{"format":"datatest-differences","version":1,'
+                     '"description":null,"mapping":false}\n')
+            fh.write('["os.system","echo unsafe"]\n')
+
+        with self.assertRaises(ValueError):
+            ValidationError.load('diffs.jsonl').differences
+
+        with open('diffs.jsonl', 'w') as fh:
+            fh.write('{"format":"datatest-differences","version":1,'
+                     '"description":null,"mapping":false}\n')
+            fh.write('["no_such_module.Missing","A"]\n')
+
+        with self.assertRaises(ValueError):
+            ValidationError.load('diffs.jsonl').differences
+
+    def test_not_a_differences_file(self):
+        with open('other.jsonl', 'w') as fh:
+            fh.write('{"a": 1}\n')
+
+        with self.assertRaises(ValueError):
+            ValidationError.load('other.jsonl')
+
+
 class TestValidationIntegration(unittest.TestCase):
     def test_valid(self):
         a = set([1, 2, 3])